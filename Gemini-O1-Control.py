@@ -12,8 +12,8 @@ from loguru import logger
 import argparse
 
 from thinking import ProblemSolver, WorkflowStage, APICallError
-from utils_file import RateLimiter
-from config_file import API_KEY, get_model_name, RATE_LIMIT
+from gemini_o1.utils.rate_limiter import GEMINI_ENDPOINT, configure_gemini_limits, rate_limiter
+from config_file import API_KEY, get_model_name
 
 import requests
 import re
@@ -24,10 +24,13 @@ from collections import deque
 class GeminiAPIClient:
     """Handles API interactions with the Gemini service."""
     def __init__(self, api_key: str, model_type: str = "normal"):
-        model = get_model_name(model_type)
-        self.endpoint = f"https://generativelanguage.googleapis.com/v1/models/{model}:generateContent"
+        self.model = get_model_name(model_type)
+        self.endpoint = f"https://generativelanguage.googleapis.com/v1/models/{self.model}:generateContent"
         self.api_key = api_key
-        self.rate_limiter = RateLimiter(max_calls=RATE_LIMIT["max_calls"], period=RATE_LIMIT["period"])
+        # Share the quota with every other Gemini caller in this process
+        if GEMINI_ENDPOINT not in rate_limiter.limiters:
+            configure_gemini_limits(rate_limiter)
+        self.rate_limiter = rate_limiter
 
     def encode_image_base64(self, image_path):
         """Encode an image to base64."""
@@ -37,7 +40,7 @@ class GeminiAPIClient:
 
     def call_gemini(self, text_prompt: str, image_path: str = None) -> str:
         """Make an API call to Gemini service with text and optionally an image."""
-        self.rate_limiter.wait()
+        self.rate_limiter.wait_for_token_blocking(GEMINI_ENDPOINT, model=self.model)
         
         # Prepare request parts
         parts = [{"text": text_prompt}]
@@ -66,10 +69,12 @@ class GeminiAPIClient:
             )
             
             if response.status_code == 429:
+                self.rate_limiter.record_call(GEMINI_ENDPOINT, False, 429, model=self.model)
                 logger.warning("Received 429 Too Many Requests. Sleeping for 60 seconds.")
                 time.sleep(60)
                 return self.call_gemini(text_prompt, image_path)  # Retry after sleep
                 
+            self.rate_limiter.record_call(GEMINI_ENDPOINT, response.ok, response.status_code, model=self.model)
             response.raise_for_status()
             gemini_response = response.json()["candidates"][0]["content"]["parts"][0]["text"].strip()
             logger.info(f"Gemini response: '{gemini_response}'")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for StructuredLogFormatter.
+
+Formats records with message sizes seen in practice, from short status lines
+to full prompts and responses, and reports records per second for the
+current formatter and for the previous one, which built a fresh dictionary,
+timestamp and stdlib JSON encoding for every record. Both must produce the
+same JSON apart from the timestamp's formatting.
+
+Usage:
+    python benchmarks/log_formatter_benchmark.py [--records 20000]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List
+
+# Add parent directory to path so the package can be imported from a checkout
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from gemini_o1.utils.logging_config import HAS_ORJSON, StructuredLogFormatter
+
+# (label, message characters, whether the record carries extra data)
+PAYLOADS = [
+    ("status line", 80, False),
+    ("metrics", 60, True),
+    ("prompt 2KB", 2_000, False),
+    ("response 16KB", 16_000, False),
+    ("synthesis 64KB", 64_000, False),
+]
+
+
+class LegacyStructuredLogFormatter(logging.Formatter):
+    """The previous StructuredLogFormatter, kept here for comparison."""
+
+    def __init__(self, include_request_id: bool = True):
+        super().__init__()
+        self.include_request_id = include_request_id
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_data = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "name": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno
+        }
+        if self.include_request_id and hasattr(record, 'request_id'):
+            log_data["request_id"] = record.request_id
+        if record.exc_info:
+            log_data["exception"] = {
+                "type": record.exc_info[0].__name__,
+                "message": str(record.exc_info[1]),
+                "traceback": self.formatException(record.exc_info)
+            }
+        if hasattr(record, 'data') and isinstance(record.data, dict):
+            log_data.update(record.data)
+        return json.dumps(log_data)
+
+
+def make_records(count: int, size: int, with_data: bool) -> List[logging.LogRecord]:
+    """Create log records like those logged while handling requests."""
+    text = ("The writer drafted a section on rate limiting, with examples. \n" * (size // 64 + 1))[:size]
+    records = []
+    for i in range(count):
+        record = logging.LogRecord(
+            "gemini_o1.communication.response", logging.INFO, "response.py", 120 + i % 5,
+            "Instance writer responded: %s", (text,), None
+        )
+        record.funcName = "_record_response"
+        record.request_id = "4f1c2a9e-5b7d-4e0a-9c1b-2d3e4f5a6b7c"
+        if with_data:
+            record.data = {"synthesis_input_tokens": 1200 + i, "current_outputs": 3, "earlier_rounds": 2}
+        records.append(record)
+    return records
+
+
+def records_per_second(formatter: logging.Formatter, records: List[logging.LogRecord]) -> float:
+    """Format every record and get the throughput."""
+    start = time.perf_counter()
+    for record in records:
+        formatter.format(record)
+    return len(records) / (time.perf_counter() - start)
+
+
+def same_output(legacy: str, current: str) -> bool:
+    """Check two formatted records hold the same fields, ignoring the timestamp and span."""
+    legacy_fields, current_fields = json.loads(legacy), json.loads(current)
+    for fields in (legacy_fields, current_fields):
+        fields.pop("timestamp")
+        fields.pop("span_id", None)
+    return legacy_fields == current_fields
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=20000)
+    args = parser.parse_args()
+
+    legacy, current = LegacyStructuredLogFormatter(), StructuredLogFormatter()
+    print(f"{args.records} records per payload, orjson {'installed' if HAS_ORJSON else 'not installed'}\n")
+    print(f"{'payload':<16} {'legacy rec/s':>13} {'current rec/s':>14} {'speedup':>8}  result")
+
+    ok = True
+    for label, size, with_data in PAYLOADS:
+        # Scale down the number of huge records to keep the run short
+        count = max(args.records * 2_000 // max(size, 2_000), 100)
+        records = make_records(count, size, with_data)
+        correct = same_output(legacy.format(records[0]), current.format(records[0]))
+        legacy_rate = records_per_second(legacy, records)
+        current_rate = records_per_second(current, records)
+        print(
+            f"{label:<16} {legacy_rate:>13,.0f} {current_rate:>14,.0f} "
+            f"{current_rate / legacy_rate:>7.2f}x  {'ok' if correct else 'output differs'}"
+        )
+        ok = ok and correct
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
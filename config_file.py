@@ -20,6 +20,9 @@ RATE_LIMIT = {
     "period": 60  # in seconds
 }
 
+# Seconds a web request may take before it is cancelled
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", 300))
+
 # Logging Configuration
 LOG_CONFIG = {
     "level": logging.INFO,
@@ -2,8 +2,13 @@
 Handlers for processing different command types.
 """
 
+import asyncio
 import logging
-from typing import Dict, List, Any, Tuple
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
+
+from ..utils.config import config
+from ..communication.events import event_stage
+from .scheduler import ScheduledTask, TaskScheduler
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +33,25 @@ class CommandHandler:
         Args:
             commands: List of command dictionaries
             
+        Returns:
+            Result dictionary with actions taken, responses, and new instances
+        """
+        async def command_stream():
+            for command in commands:
+                yield command
+                
+        return await self.handle_command_stream(command_stream())
+        
+    async def handle_command_stream(self, commands: AsyncIterator[Dict[str, Any]]) -> Dict:
+        """
+        Process commands as they arrive from an async source.
+        
+        Each command is dispatched as soon as it is received, so work can start
+        while later commands are still being produced.
+        
+        Args:
+            commands: Async iterator of command dictionaries
+            
         Returns:
             Result dictionary with actions taken, responses, and new instances
         """
@@ -44,21 +68,39 @@ class CommandHandler:
         # Track outputs from nodes for context in later commands
         node_outputs = []
         
-        # Process each command in sequence
-        for command in commands:
-            cmd_type = command.get('type')
-            if cmd_type == 'ANALYZE':
-                self._handle_analyze(command, result)
-            elif cmd_type == 'CREATE':
-                await self._handle_create(command, result)
-            elif cmd_type == 'TO':
-                await self._handle_to(command, result, node_outputs)
-            elif cmd_type == 'CONNECT':
-                await self._handle_connect(command, result)
-            elif cmd_type == 'MESSAGE':
-                await self._handle_message(command, result)
-            elif cmd_type == 'SYNTHESIZE':
-                await self._handle_synthesize(result, node_outputs)
+        # TO commands run as a dependency graph; independent tasks run concurrently
+        scheduler = TaskScheduler(
+            max_concurrency=config.get("MAX_PARALLEL_TASKS", 4),
+            infer_dependencies=config.get("INFER_TASK_DEPENDENCIES", True)
+        )
+        
+        # Process each command in order
+        try:
+            async for command in commands:
+                cmd_type = command.get('type')
+                if cmd_type == 'TO':
+                    self._handle_to(command, scheduler)
+                    continue
+                
+                # Every other command except ANALYZE observes the effects of all earlier tasks
+                if cmd_type != 'ANALYZE':
+                    await self._collect_to_results(scheduler, result, node_outputs)
+                    
+                if cmd_type == 'ANALYZE':
+                    self._handle_analyze(command, result)
+                elif cmd_type == 'CREATE':
+                    await self._handle_create(command, result)
+                elif cmd_type == 'CONNECT':
+                    await self._handle_connect(command, result)
+                elif cmd_type == 'MESSAGE':
+                    await self._handle_message(command, result)
+                elif cmd_type == 'SYNTHESIZE':
+                    await self._handle_synthesize(result, node_outputs)
+                    
+            await self._collect_to_results(scheduler, result, node_outputs)
+        except BaseException:
+            scheduler.cancel()
+            raise
                 
         # Connect all instances to each other for full mesh communication
         for inst_id in self.network.instances:
@@ -74,36 +116,28 @@ class CommandHandler:
         result["actions_taken"].append(f"Analyzed task: {analysis}")
         
     async def _handle_create(self, command: Dict[str, Any], result: Dict) -> None:
-        """Handle CREATE command."""
-        create_lines = command.get('lines', [])
-        
-        for create_line in create_lines:
-            parts = [part.strip() for part in create_line.split('|')]
-            
-            if len(parts) == 3:
-                role_desc, model_type, initial_prompt = parts
-            elif len(parts) == 2:
-                role_desc = parts[0]
-                if parts[1].lower() in ["normal", "thinking"]:
-                    model_type = parts[1].lower()
-                    initial_prompt = ""
-                else:
-                    model_type = "normal"
-                    initial_prompt = parts[1]
-            else:
-                role_desc = create_line.strip()
-                model_type = "normal"
-                initial_prompt = ""
-                
-            instance_id = self.network.normalize_instance_id(role_desc)
+        """Handle CREATE command, creating all instances in the block concurrently."""
+        create_specs = [self._parse_create_line(line) for line in command.get('lines', [])]
+        if not create_specs:
+            return
             
-            new_instance = await self.network.create_instance(
-                role_description=role_desc,
-                model_type=model_type,
-                initial_prompt=initial_prompt,
-                instance_id=instance_id
-            )
+        semaphore = asyncio.Semaphore(config.get("MAX_PARALLEL_TASKS", 4))
+        
+        async def create(spec: Dict[str, str]):
+            async with semaphore:
+                return await self.network.create_instance(**spec)
+                
+        tasks = [asyncio.create_task(create(spec)) for spec in create_specs]
+        try:
+            new_instances = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            raise
             
+        # Report results in the order the CREATE lines were given
+        for new_instance in new_instances:
             result["new_instances"].append({
                 "id": new_instance.instance_id,
                 "role": new_instance.role
@@ -111,8 +145,34 @@ class CommandHandler:
             
             result["actions_taken"].append(f"Created new instance: {new_instance.role}")
             
-    async def _handle_to(self, command: Dict[str, Any], result: Dict, node_outputs: List[Tuple[str, str]]) -> None:
-        """Handle TO command."""
+    def _parse_create_line(self, create_line: str) -> Dict[str, str]:
+        """Parse a single CREATE line into create_instance keyword arguments."""
+        parts = [part.strip() for part in create_line.split('|')]
+        
+        if len(parts) == 3:
+            role_desc, model_type, initial_prompt = parts
+        elif len(parts) == 2:
+            role_desc = parts[0]
+            if parts[1].lower() in ["normal", "thinking"]:
+                model_type = parts[1].lower()
+                initial_prompt = ""
+            else:
+                model_type = "normal"
+                initial_prompt = parts[1]
+        else:
+            role_desc = create_line.strip()
+            model_type = "normal"
+            initial_prompt = ""
+            
+        return {
+            "role_description": role_desc,
+            "model_type": model_type,
+            "initial_prompt": initial_prompt,
+            "instance_id": self.network.normalize_instance_id(role_desc)
+        }
+            
+    def _handle_to(self, command: Dict[str, Any], scheduler: TaskScheduler) -> None:
+        """Handle TO command by scheduling it for execution."""
         instance_id = command.get('instance_id')
         prompt = command.get('prompt')
         
@@ -120,9 +180,16 @@ class CommandHandler:
             logger.warning(f"Missing instance_id or prompt in TO command")
             return
             
-        # Add context from previous outputs if available
+        scheduler.submit(command, self._execute_to)
+        
+    async def _execute_to(self, scheduled: ScheduledTask) -> Optional[str]:
+        """Send a scheduled TO command to its instance, chaining outputs it depends on."""
+        instance_id = scheduled.instance_id
+        prompt = scheduled.command.get('prompt')
+        
+        # Add context from the outputs this task depends on
         previous_outputs_text = "\n".join(
-            [f"{id}: {output}" for id, output in node_outputs]
+            [f"{ancestor.instance_id}: {ancestor.output}" for ancestor in scheduled.ancestors() if ancestor.output]
         )
         
         if previous_outputs_text:
@@ -130,18 +197,28 @@ class CommandHandler:
         else:
             instance_prompt = prompt
             
-        if instance_id in self.network.instances:
-            instance_response = await self.network.get_instance_response(
+        if instance_id not in self.network.instances:
+            logger.warning(f"Instance {instance_id} not found for TO command.")
+            return None
+            
+        with event_stage("task"):
+            return await self.network.get_instance_response(
                 self.network.instances[instance_id],
                 instance_prompt
             )
-            
-            if instance_response:
-                result["responses"][instance_id] = instance_response
-                node_outputs.append((instance_id, instance_response))
-                result["actions_taken"].append(f"Got response from instance {instance_id}")
-        else:
-            logger.warning(f"Instance {instance_id} not found for TO command.")
+        
+    async def _collect_to_results(
+        self, 
+        scheduler: TaskScheduler, 
+        result: Dict, 
+        node_outputs: List[Tuple[str, str]]
+    ) -> None:
+        """Wait for outstanding TO commands and record their responses in command order."""
+        for scheduled in await scheduler.drain():
+            if scheduled.output:
+                result["responses"][scheduled.instance_id] = scheduled.output
+                node_outputs.append((scheduled.instance_id, scheduled.output))
+                result["actions_taken"].append(f"Got response from instance {scheduled.instance_id}")
             
     async def _handle_connect(self, command: Dict[str, Any], result: Dict) -> None:
         """Handle CONNECT command."""
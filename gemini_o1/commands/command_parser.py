@@ -3,7 +3,8 @@ Command parsing for Gemini network mother node commands.
 """
 
 import logging
-from typing import Dict, List, Any, Tuple
+import re
+from typing import Dict, List, Any, Iterator, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +17,12 @@ class CommandParser:
         'ANALYZE', 'CREATE', 'TO', 'CONNECT', 'MESSAGE', 'SYNTHESIZE'
     ]
     
+    # TO <instance_id> [after <id>, <id>]: <prompt>
+    TO_WITH_DEPENDENCIES = re.compile(
+        r'^(?P<instance_id>[^\[:]+?)\s*\[\s*(?:after|depends on)\s*:?\s*(?P<depends_on>[^\]]*)\]\s*:(?P<prompt>.*)$',
+        re.IGNORECASE
+    )
+    
     def __init__(self, network):
         """
         Initialize the command parser.
@@ -35,8 +42,19 @@ class CommandParser:
         Returns:
             List of command dictionaries with type and parameters
         """
-        commands = []
         lines = response.strip().split('\n')
+        return [command for command, _ in self._iter_commands(lines) if command]
+    
+    def _iter_commands(self, lines: List[str]) -> Iterator[Tuple[Optional[Dict[str, Any]], int]]:
+        """
+        Walk the response lines and yield each command found.
+        
+        Args:
+            lines: List of response lines
+            
+        Yields:
+            Tuples of (command_dict or None if invalid, index of the line after the command)
+        """
         i = 0
         
         while i < len(lines):
@@ -50,14 +68,11 @@ class CommandParser:
             for cmd_type in self.COMMAND_TYPES:
                 if line.startswith(f'{cmd_type}:') or (cmd_type == 'TO' and line.startswith('TO ')):
                     command, next_i = self._extract_command(lines, i, cmd_type)
-                    if command:
-                        commands.append(command)
+                    yield command, next_i
                     i = next_i
                     break
             else:
                 i += 1
-                
-        return commands
     
     def _extract_command(self, lines: List[str], start_idx: int, cmd_type: str) -> Tuple[Dict[str, Any], int]:
         """
@@ -99,12 +114,24 @@ class CommandParser:
             
         elif cmd_type == 'TO':
             cmd = line[len('TO '):].strip()
-            if ':' in cmd:
+            match = self.TO_WITH_DEPENDENCIES.match(cmd)
+            if match:
+                return {
+                    'type': 'TO',
+                    'instance_id': self.network.normalize_instance_id(match.group('instance_id').strip()),
+                    'prompt': match.group('prompt').strip(),
+                    'depends_on': [
+                        self.network.normalize_instance_id(dep.strip())
+                        for dep in match.group('depends_on').split(',') if dep.strip()
+                    ]
+                }, i
+            elif ':' in cmd:
                 instance_id, prompt = cmd.split(':', 1)
                 return {
                     'type': 'TO', 
                     'instance_id': self.network.normalize_instance_id(instance_id.strip()),
-                    'prompt': prompt.strip()
+                    'prompt': prompt.strip(),
+                    'depends_on': []
                 }, i
             else:
                 logger.warning(f"Invalid TO command format: {cmd}")
@@ -141,4 +168,68 @@ class CommandParser:
         elif cmd_type == 'SYNTHESIZE':
             return {'type': 'SYNTHESIZE'}, i
             
-        return None, i
\ No newline at end of file
+        return None, i
+
+
+class StreamingCommandParser:
+    """
+    Incrementally parses commands from a mother node response as it streams in.
+    
+    Commands are emitted as soon as they are complete: single-line commands once
+    their line ends, and CREATE blocks once the next command starts. The commands
+    emitted over a whole stream are identical to parse_commands on the full text.
+    """
+    
+    def __init__(self, parser: CommandParser):
+        """
+        Initialize the streaming parser.
+        
+        Args:
+            parser: The CommandParser whose parsing rules to apply
+        """
+        self.parser = parser
+        self.buffer = ""
+        self.consumed = 0
+        
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Add streamed text and return any commands it completed.
+        
+        Args:
+            text: The next chunk of response text
+            
+        Returns:
+            List of newly completed command dictionaries
+        """
+        self.buffer += text
+        complete_text = self.buffer[:self.buffer.rfind('\n') + 1]
+        if not complete_text:
+            return []
+        return self._take_commands(complete_text.split('\n')[:-1], final=False)
+        
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Finish the stream and return the remaining commands.
+        
+        Returns:
+            List of command dictionaries not yet emitted
+        """
+        return self._take_commands(self.buffer.strip().split('\n'), final=True)
+        
+    def _take_commands(self, lines: List[str], final: bool) -> List[Dict[str, Any]]:
+        """Parse the given lines and return completed commands not emitted before."""
+        commands = []
+        
+        for index, (command, next_i) in enumerate(self.parser._iter_commands(lines)):
+            if index < self.consumed:
+                continue
+            
+            # A CREATE block is only complete once the next command has started
+            if not final and command and command['type'] == 'CREATE' and next_i >= len(lines):
+                break
+                
+            self.consumed = index + 1
+            if command:
+                commands.append(command)
+                
+        return commands
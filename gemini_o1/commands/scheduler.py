@@ -0,0 +1,190 @@
+"""
+Dependency-aware scheduling of TO commands.
+"""
+
+import asyncio
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScheduledTask:
+    """
+    A TO command scheduled for execution together with its dependencies.
+    """
+    index: int
+    command: Dict[str, Any]
+    dependencies: List['ScheduledTask'] = field(default_factory=list)
+    task: Optional[asyncio.Task] = None
+    output: Optional[str] = None
+
+    @property
+    def instance_id(self) -> str:
+        """The ID of the instance this task is addressed to."""
+        return self.command.get('instance_id')
+
+    def ancestors(self) -> List['ScheduledTask']:
+        """
+        Get every task this one depends on, directly or transitively.
+
+        Returns:
+            The ancestor tasks in submission order
+        """
+        seen = {}
+        stack = list(self.dependencies)
+        while stack:
+            dependency = stack.pop()
+            if dependency.index not in seen:
+                seen[dependency.index] = dependency
+                stack.extend(dependency.dependencies)
+        return [seen[index] for index in sorted(seen)]
+
+
+class TaskScheduler:
+    """
+    Runs TO commands as a dependency graph with a bounded fan-out.
+
+    A submitted command starts as soon as the tasks it depends on have finished,
+    so independent specialists work concurrently while chained tasks still see
+    the outputs they rely on. Dependencies are taken from the command's explicit
+    ``depends_on`` list, from earlier tasks addressed to the same instance, and
+    (optionally) from mentions of other instance IDs in the task prompt.
+    """
+
+    def __init__(self, max_concurrency: int = 4, infer_dependencies: bool = True):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrency: Maximum number of tasks executing at once
+            infer_dependencies: Whether to infer dependencies from prompt mentions
+        """
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.infer_dependencies = infer_dependencies
+        self.tasks: List[ScheduledTask] = []
+        self.pending: List[ScheduledTask] = []
+
+    @staticmethod
+    def _mentions(prompt: str, instance_id: str) -> bool:
+        """Check whether a prompt refers to an instance by its ID."""
+        variants = {instance_id, instance_id.replace('-', ' '), instance_id.replace('-', '_')}
+        pattern = r'(?<![\w-])(?:' + '|'.join(re.escape(v) for v in variants) + r')(?![\w-])'
+        return re.search(pattern, prompt, re.IGNORECASE) is not None
+
+    def resolve_dependencies(self, command: Dict[str, Any]) -> List[ScheduledTask]:
+        """
+        Find the already submitted tasks a command depends on.
+
+        Args:
+            command: The TO command dictionary
+
+        Returns:
+            List of tasks that must finish before the command runs
+        """
+        # Only the most recent task for each instance is relevant
+        latest: Dict[str, ScheduledTask] = {}
+        for scheduled in self.tasks:
+            latest[scheduled.instance_id] = scheduled
+
+        instance_id = command.get('instance_id')
+        dependency_ids = [instance_id]
+        dependency_ids.extend(command.get('depends_on', []))
+
+        if self.infer_dependencies:
+            prompt = command.get('prompt', '')
+            dependency_ids.extend(
+                other_id for other_id in latest
+                if other_id != instance_id and self._mentions(prompt, other_id)
+            )
+
+        dependencies = []
+        for dependency_id in dependency_ids:
+            dependency = latest.get(dependency_id)
+            if dependency and dependency not in dependencies:
+                dependencies.append(dependency)
+
+        for dependency_id in command.get('depends_on', []):
+            if dependency_id not in latest:
+                logger.debug(f"Ignoring dependency on {dependency_id}: no earlier task for it")
+
+        return dependencies
+
+    def submit(
+        self,
+        command: Dict[str, Any],
+        execute: Callable[[ScheduledTask], Awaitable[Optional[str]]]
+    ) -> ScheduledTask:
+        """
+        Schedule a TO command for execution.
+
+        Args:
+            command: The TO command dictionary
+            execute: Coroutine function that runs the task and returns its output
+
+        Returns:
+            The scheduled task
+        """
+        scheduled = ScheduledTask(
+            index=len(self.tasks),
+            command=command,
+            dependencies=self.resolve_dependencies(command)
+        )
+        scheduled.task = asyncio.create_task(self._run(scheduled, execute))
+
+        self.tasks.append(scheduled)
+        self.pending.append(scheduled)
+
+        logger.debug(
+            f"Scheduled task {scheduled.index} for {scheduled.instance_id} "
+            f"after {[dependency.index for dependency in scheduled.dependencies]}"
+        )
+        return scheduled
+
+    async def _run(
+        self,
+        scheduled: ScheduledTask,
+        execute: Callable[[ScheduledTask], Awaitable[Optional[str]]]
+    ) -> Optional[str]:
+        """Wait for a task's dependencies, then execute it within the fan-out limit."""
+        if scheduled.dependencies:
+            await asyncio.gather(*(dependency.task for dependency in scheduled.dependencies))
+
+        async with self.semaphore:
+            scheduled.output = await execute(scheduled)
+
+        return scheduled.output
+
+    async def drain(self) -> List[ScheduledTask]:
+        """
+        Wait for every task submitted since the last drain.
+
+        Returns:
+            The finished tasks in submission order
+
+        Raises:
+            Exception: The first error raised by a task; remaining tasks are cancelled
+        """
+        pending, self.pending = self.pending, []
+        if not pending:
+            return []
+
+        try:
+            await asyncio.gather(*(scheduled.task for scheduled in pending))
+        except BaseException:
+            for scheduled in pending:
+                if not scheduled.task.done():
+                    scheduled.task.cancel()
+            raise
+
+        return pending
+
+    def cancel(self) -> None:
+        """Cancel every task that has not finished yet."""
+        for scheduled in self.pending:
+            if not scheduled.task.done():
+                scheduled.task.cancel()
+        self.pending = []
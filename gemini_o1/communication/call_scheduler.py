@@ -0,0 +1,234 @@
+"""
+Fair-share and priority scheduling of Gemini calls.
+
+Calls are admitted to the rate limiter through priority lanes: a waiting
+interactive call always goes before default calls, which go before
+background calls. Within a lane, sessions share admissions by weighted fair
+queuing, so one request with many specialists can't starve another user's.
+
+The session and lane of a call are taken from the current context, and
+asyncio tasks inherit them from the code that created them.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+
+# Lanes, from highest to lowest priority
+INTERACTIVE = "interactive"
+DEFAULT = "default"
+BACKGROUND = "background"
+LANES = (INTERACTIVE, DEFAULT, BACKGROUND)
+
+DEFAULT_SESSION = "default"
+
+# Drop finish tags of idle sessions once this many are tracked
+MAX_TRACKED_SESSIONS = 1000
+
+_session: contextvars.ContextVar[str] = contextvars.ContextVar("call_session", default=DEFAULT_SESSION)
+_lane: contextvars.ContextVar[str] = contextvars.ContextVar("call_lane", default=DEFAULT)
+
+
+@contextmanager
+def scheduling(session: Optional[str] = None, lane: Optional[str] = None) -> Iterator[None]:
+    """
+    Set the session and/or lane of Gemini calls made within the block.
+
+    Args:
+        session: Session the calls are charged to
+        lane: Lane the calls are queued in
+
+    Raises:
+        ValueError: If the lane is unknown
+    """
+    if lane is not None and lane not in LANES:
+        raise ValueError(f"Unknown lane: {lane}")
+
+    tokens: List[Tuple[contextvars.ContextVar, contextvars.Token]] = []
+    if session is not None:
+        tokens.append((_session, _session.set(session)))
+    if lane is not None:
+        tokens.append((_lane, _lane.set(lane)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def current_session() -> str:
+    """Get the session of calls made in the current context."""
+    return _session.get()
+
+
+def current_lane() -> str:
+    """Get the lane of calls made in the current context."""
+    return _lane.get()
+
+
+class _LaneStats:
+    """Admission counts and queueing delays of one lane."""
+
+    def __init__(self):
+        self.admitted = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent_waits: Deque[float] = deque(maxlen=200)
+
+    def record(self, wait: float) -> None:
+        self.admitted += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.recent_waits.append(wait)
+
+
+class CallScheduler:
+    """
+    Orders Gemini calls by lane priority and fair share between sessions.
+
+    At most max_active calls hold an admission at once; the rest queue. The
+    next admission goes to the highest-priority lane with a waiting call, and
+    within the lane to the call with the smallest finish tag (start-time fair
+    queuing), where each call of a session advances the session's tag by
+    1 / weight.
+    """
+
+    def __init__(self, max_active: int = 1, weights: Optional[Dict[str, float]] = None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_active: Number of calls admitted at once
+            weights: Share weights by session (default 1)
+        """
+        if max_active <= 0:
+            raise ValueError("max_active must be positive")
+
+        self.max_active = max_active
+        self.weights: Dict[str, float] = dict(weights or {})
+        self.active = 0
+        self._queues: Dict[str, List[Tuple[float, int, asyncio.Future, float, float]]] = {lane: [] for lane in LANES}
+        self._virtual_time: Dict[str, float] = {lane: 0.0 for lane in LANES}
+        self._finish_tags: Dict[Tuple[str, str], float] = {}
+        self._sequence = itertools.count()
+        self._stats: Dict[str, _LaneStats] = {lane: _LaneStats() for lane in LANES}
+
+    def set_weight(self, session: str, weight: float) -> None:
+        """
+        Set the share weight of a session.
+
+        Args:
+            session: The session
+            weight: Relative share of admissions within a lane
+        """
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        self.weights[session] = weight
+
+    @asynccontextmanager
+    async def admission(self, lane: Optional[str] = None, session: Optional[str] = None) -> AsyncIterator[None]:
+        """
+        Wait for this call's turn and hold the admission for the block.
+
+        Args:
+            lane: Lane to queue in, defaulting to the current context's
+            session: Session to charge, defaulting to the current context's
+        """
+        await self._acquire(lane or current_lane(), session or current_session())
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _tag(self, lane: str, session: str) -> Tuple[float, float]:
+        """Get the start and finish tags of a new call."""
+        key = (lane, session)
+        start = max(self._virtual_time[lane], self._finish_tags.get(key, 0.0))
+        finish = start + 1.0 / self.weights.get(session, 1.0)
+        self._finish_tags[key] = finish
+        return start, finish
+
+    async def _acquire(self, lane: str, session: str) -> None:
+        if lane not in self._queues:
+            raise ValueError(f"Unknown lane: {lane}")
+
+        start, finish = self._tag(lane, session)
+        if self.active < self.max_active and not any(self._queues.values()):
+            self.active += 1
+            self._virtual_time[lane] = start
+            self._stats[lane].record(0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues[lane]
+        heapq.heappush(queue, (finish, next(self._sequence), future, time.time(), start))
+        self._stats[lane].max_depth = max(self._stats[lane].max_depth, len(queue))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller gave up, so pass the admission on
+                self._release()
+            else:
+                future.cancel()
+                self._discard_cancelled(lane)
+            raise
+
+    def _discard_cancelled(self, lane: str) -> None:
+        """Remove cancelled entries from a lane's queue."""
+        queue = self._queues[lane]
+        queue[:] = [entry for entry in queue if not entry[2].cancelled()]
+        heapq.heapify(queue)
+
+    def _release(self) -> None:
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit waiting calls while there is room."""
+        while self.active < self.max_active:
+            lane = next((lane for lane in LANES if self._queues[lane]), None)
+            if lane is None:
+                break
+
+            _, _, future, enqueued_at, start = heapq.heappop(self._queues[lane])
+            if future.cancelled():
+                continue
+
+            self.active += 1
+            self._virtual_time[lane] = start
+            self._stats[lane].record(time.time() - enqueued_at)
+            future.set_result(None)
+
+        if len(self._finish_tags) > MAX_TRACKED_SESSIONS:
+            # Sessions whose tags the virtual time has passed would start fresh anyway
+            self._finish_tags = {
+                key: tag for key, tag in self._finish_tags.items() if tag > self._virtual_time[key[0]]
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get queue depth and wait time metrics for each lane.
+
+        Returns:
+            Dictionary with the number of active calls and per-lane metrics
+        """
+        lanes = {}
+        for lane in LANES:
+            stats = self._stats[lane]
+            waits = sorted(stats.recent_waits)
+            lanes[lane] = {
+                "queue_depth": sum(1 for entry in self._queues[lane] if not entry[2].cancelled()),
+                "max_queue_depth": stats.max_depth,
+                "admitted": stats.admitted,
+                "avg_wait": stats.total_wait / stats.admitted if stats.admitted else 0.0,
+                "p95_wait": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                "max_wait": stats.max_wait
+            }
+        return {"active": self.active, "max_active": self.max_active, "lanes": lanes}
@@ -0,0 +1,218 @@
+"""
+Circuit breakers that stop calls to a failing Gemini model.
+
+After a run of server errors a model's breaker opens and calls to it fail at
+once instead of each paying the full retry ladder. Once the reset timeout has
+passed, the breaker lets a trial call through: if it succeeds the breaker
+closes again, and if it fails the breaker stays open for another timeout.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..utils.config import config
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because its model's breaker is open."""
+
+    def __init__(self, model_name: str, retry_in: float):
+        super().__init__(f"Circuit breaker for {model_name} is open, retry in {retry_in:.1f}s")
+        self.model_name = model_name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Closed, open and half-open states for calls to one model.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+        """
+        Initialize the breaker.
+
+        Args:
+            name: Name of what the breaker protects, for logs and stats
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before a trial call
+            half_open_max_calls: Trial calls allowed at once while half-open
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_calls = 0
+        self.times_opened = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def _retry_in(self, now: float) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - now) if self.opened_at is not None else 0.0
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a call may go ahead, taking a trial slot if half-open.
+
+        Returns:
+            True if the call may go ahead
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and self._retry_in(now) <= 0:
+                self.state = HALF_OPEN
+                self.trial_calls = 0
+                logger.info(f"Circuit breaker for {self.name} is half-open, trying a call")
+
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self.trial_calls < self.half_open_max_calls:
+                self.trial_calls += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def would_allow(self) -> bool:
+        """
+        Check whether a call would be allowed, without taking a trial slot.
+
+        Returns:
+            True if the breaker is closed or has a trial slot free
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self._retry_in(time.monotonic()) > 0:
+                return False
+            # Half-open, or open with a trial call due
+            trial_calls = self.trial_calls if self.state == HALF_OPEN else 0
+            return trial_calls < self.half_open_max_calls
+
+    def is_open(self) -> bool:
+        """
+        Check whether calls are being refused, without taking a trial slot.
+
+        Returns:
+            True while the breaker is open and its reset timeout hasn't passed
+        """
+        with self._lock:
+            return self.state == OPEN and self._retry_in(time.monotonic()) > 0
+
+    def retry_in(self) -> float:
+        """
+        Get the time until the breaker lets a trial call through.
+
+        Returns:
+            Seconds left, 0 if calls are allowed
+        """
+        with self._lock:
+            return self._retry_in(time.monotonic()) if self.state == OPEN else 0.0
+
+    def record_success(self) -> None:
+        """Record a successful call, closing the breaker."""
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit breaker for {self.name} closed")
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self.trial_calls = 0
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the breaker after too many."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.trial_calls = 0
+                self.times_opened += 1
+                logger.warning(
+                    f"Circuit breaker for {self.name} opened after {self.failures} failures",
+                    extra={"data": {"model": self.name, "failures": self.failures}}
+                )
+
+    def release(self) -> None:
+        """Give back a trial slot for a call that ended without a verdict."""
+        with self._lock:
+            if self.state == HALF_OPEN and self.trial_calls > 0:
+                self.trial_calls -= 1
+
+    def get_state(self) -> Dict[str, Any]:
+        """
+        Get the breaker's state and counters.
+
+        Returns:
+            Dictionary with the state, failures and rejected calls
+        """
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "retry_in": round(self._retry_in(now), 2) if self.state == OPEN else 0.0
+            }
+
+
+class CircuitBreakerRegistry:
+    """
+    One circuit breaker per model, created on first use.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize the registry.
+
+        Args:
+            failure_threshold: Consecutive failures that open a breaker
+            reset_timeout: Seconds a breaker stays open before a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str) -> CircuitBreaker:
+        """
+        Get the breaker for a model.
+
+        Args:
+            model_name: The model
+
+        Returns:
+            The model's circuit breaker
+        """
+        with self._lock:
+            if model_name not in self.breakers:
+                self.breakers[model_name] = CircuitBreaker(model_name, self.failure_threshold, self.reset_timeout)
+            return self.breakers[model_name]
+
+    def get_states(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the state of every breaker.
+
+        Returns:
+            Dictionary mapping model names to breaker states
+        """
+        with self._lock:
+            breakers = list(self.breakers.values())
+        return {breaker.name: breaker.get_state() for breaker in breakers}
+
+
+# Breakers are shared by every network in the process, like the rate limiter
+circuit_breakers = CircuitBreakerRegistry(
+    failure_threshold=config.get("CIRCUIT_BREAKER_FAILURES", 5),
+    reset_timeout=config.get("CIRCUIT_BREAKER_RESET", 30.0)
+)
@@ -0,0 +1,193 @@
+"""
+Token-budgeted assembly of instance prompt context.
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from ..utils.tokens import estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# Pieces are only truncated if at least this many tokens of them would fit
+MIN_TRUNCATED_TOKENS = 32
+
+PREVIOUS_OUTPUTS_HEADER = "Previous outputs:\n{context}\n\nTask:\n{prompt}"
+OTHER_OUTPUTS_HEADER = "Outputs from other instances:\n{context}\n\nTask:\n{prompt}"
+HEADER_TOKENS = estimate_tokens(PREVIOUS_OUTPUTS_HEADER.format(context="", prompt="")) + \
+    estimate_tokens(OTHER_OUTPUTS_HEADER.format(context="", prompt=""))
+
+
+def _terms(text: str) -> set:
+    """Get the set of lowercase words of three or more letters in a text."""
+    return set(re.findall(r"[a-z0-9]{3,}", text.lower()))
+
+
+@dataclass
+class ContextPiece:
+    """
+    A candidate piece of context for a prompt.
+    """
+    source: str
+    text: str
+    order: int
+    score: float = 0.0
+    own: bool = False
+
+
+@dataclass
+class BuiltContext:
+    """
+    The result of assembling a prompt within a token budget.
+    """
+    prompt: str
+    budget: int
+    used_tokens: int = 0
+    dropped_tokens: int = 0
+    included: List[str] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+    truncated: List[str] = field(default_factory=list)
+
+    def get_stats(self) -> Dict:
+        """
+        Get a summary of how the context was assembled.
+
+        Returns:
+            Dictionary with budget and token counts
+        """
+        return {
+            "budget": self.budget,
+            "used_tokens": self.used_tokens,
+            "dropped_tokens": self.dropped_tokens,
+            "pieces_included": len(self.included),
+            "pieces_truncated": len(self.truncated),
+            "pieces_dropped": len(self.dropped)
+        }
+
+
+class ContextBuilder:
+    """
+    Assembles the context sent with an instance prompt within a token budget.
+
+    Candidates are the instance's own previous outputs and the latest output
+    of every other instance. The instance's most recent output is always
+    considered first; the rest are ranked by relevance to the task (shared
+    terms, or the other instance being mentioned by ID) and then recency.
+    Pieces are added until the budget is spent, the next piece is truncated
+    if enough room is left, and everything else is dropped.
+    """
+
+    def __init__(self, default_budget: int = 8000, model_budgets: Optional[Dict[str, int]] = None):
+        """
+        Initialize the context builder.
+
+        Args:
+            default_budget: Token budget for models without their own budget
+            model_budgets: Token budgets by model name
+        """
+        self.default_budget = default_budget
+        self.model_budgets = model_budgets or {}
+
+    def budget_for(self, model_name: str) -> int:
+        """
+        Get the token budget for a model.
+
+        Args:
+            model_name: The Gemini model name
+
+        Returns:
+            The token budget
+        """
+        return self.model_budgets.get(model_name, self.default_budget)
+
+    def _rank(self, prompt: str, own_outputs: List[str], other_outputs: Dict[str, str]) -> List[ContextPiece]:
+        """Order the candidate pieces by priority."""
+        query_terms = _terms(prompt)
+        lowered_prompt = prompt.lower()
+        count = max(len(own_outputs), 1)
+
+        def relevance(text: str) -> float:
+            if not query_terms:
+                return 0.0
+            return len(_terms(text) & query_terms) / len(query_terms)
+
+        pieces = []
+        for index, text in enumerate(own_outputs):
+            # Recency runs from 0 (oldest) to 1 (newest) and counts half as much as relevance
+            recency = (index + 1) / count
+            pieces.append(ContextPiece("self", text, index, relevance(text) + 0.5 * recency, own=True))
+
+        for index, (instance_id, text) in enumerate(other_outputs.items()):
+            mentioned = instance_id.lower() in lowered_prompt
+            pieces.append(ContextPiece(instance_id, text, index, relevance(text) + (1.0 if mentioned else 0.0)))
+
+        if own_outputs:
+            # Continuity matters most: the latest own output goes first
+            latest = pieces[len(own_outputs) - 1]
+            rest = [piece for piece in pieces if piece is not latest]
+            return [latest] + sorted(rest, key=lambda piece: piece.score, reverse=True)
+        return sorted(pieces, key=lambda piece: piece.score, reverse=True)
+
+    def build(
+        self,
+        prompt: str,
+        model_name: str,
+        own_outputs: List[str],
+        other_outputs: Dict[str, str]
+    ) -> BuiltContext:
+        """
+        Build the prompt with as much relevant context as the budget allows.
+
+        Args:
+            prompt: The task prompt
+            model_name: The model the prompt is for
+            own_outputs: The instance's previous outputs, oldest first
+            other_outputs: The latest output of each other instance
+
+        Returns:
+            The assembled prompt and a report of what was kept and dropped
+        """
+        budget = self.budget_for(model_name)
+        result = BuiltContext(prompt=prompt, budget=budget)
+        # Reserve room for the section headers wrapped around the context
+        remaining = budget - estimate_tokens(prompt) - HEADER_TOKENS
+
+        selected: List[ContextPiece] = []
+        for piece in self._rank(prompt, own_outputs, other_outputs):
+            # Account for the label and line break around each piece
+            overhead = 1 if piece.own else estimate_tokens(f"{piece.source}: ") + 1
+            tokens = estimate_tokens(piece.text) + overhead
+
+            if tokens <= remaining:
+                selected.append(piece)
+                remaining -= tokens
+                result.included.append(piece.source)
+            elif remaining - overhead >= MIN_TRUNCATED_TOKENS:
+                text = truncate_to_tokens(piece.text, remaining - overhead)
+                result.dropped_tokens += estimate_tokens(piece.text) - estimate_tokens(text)
+                selected.append(ContextPiece(piece.source, text, piece.order, piece.score, piece.own))
+                remaining = 0
+                result.included.append(piece.source)
+                result.truncated.append(piece.source)
+            else:
+                result.dropped_tokens += estimate_tokens(piece.text)
+                result.dropped.append(piece.source)
+
+        final_prompt = prompt
+
+        # Keep the original layout: own outputs, then other instances, in their original order
+        own = sorted((piece for piece in selected if piece.own), key=lambda piece: piece.order)
+        if own:
+            previous_outputs_text = "\n".join(piece.text for piece in own)
+            final_prompt = PREVIOUS_OUTPUTS_HEADER.format(context=previous_outputs_text, prompt=final_prompt)
+
+        others = sorted((piece for piece in selected if not piece.own), key=lambda piece: piece.order)
+        if others:
+            other_outputs_text = "\n".join(f"{piece.source}: {piece.text}" for piece in others)
+            final_prompt = OTHER_OUTPUTS_HEADER.format(context=other_outputs_text, prompt=final_prompt)
+
+        result.prompt = final_prompt
+        result.used_tokens = estimate_tokens(final_prompt)
+        return result
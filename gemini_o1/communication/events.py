@@ -0,0 +1,87 @@
+"""
+Progress events emitted while the network handles a request.
+
+Events are delivered to the sink registered for the current context, so
+concurrent requests each receive only their own events. When no sink is
+registered, emitting an event is a no-op.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+EventSink = Callable[[Dict[str, Any]], None]
+
+# Event types
+INSTANCE_CREATED = "instance_created"
+TASK_STARTED = "task_started"
+PARTIAL = "partial"
+TASK_COMPLETED = "task_completed"
+SYNTHESIS = "synthesis"
+DONE = "done"
+ERROR = "error"
+
+_event_sink: contextvars.ContextVar[Optional[EventSink]] = contextvars.ContextVar(
+    "event_sink", default=None
+)
+_event_stage: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "event_stage", default="task"
+)
+
+
+def set_event_sink(sink: Optional[EventSink]) -> contextvars.Token:
+    """
+    Register the event sink for the current context.
+
+    Args:
+        sink: Callable receiving event dictionaries, or None to disable events
+
+    Returns:
+        Token that restores the previous sink when passed to reset_event_sink
+    """
+    return _event_sink.set(sink)
+
+
+def reset_event_sink(token: contextvars.Token) -> None:
+    """
+    Restore the event sink that was active before set_event_sink.
+
+    Args:
+        token: The token returned by set_event_sink
+    """
+    _event_sink.reset(token)
+
+
+@contextmanager
+def event_stage(stage: str) -> Iterator[None]:
+    """
+    Tag events emitted within the block with a processing stage.
+
+    Args:
+        stage: The stage name, e.g. "planning", "task" or "synthesis"
+    """
+    token = _event_stage.set(stage)
+    try:
+        yield
+    finally:
+        _event_stage.reset(token)
+
+
+def is_streaming() -> bool:
+    """Check whether anyone is listening for events in the current context."""
+    return _event_sink.get() is not None
+
+
+def emit_event(event_type: str, **data: Any) -> None:
+    """
+    Send an event to the current context's sink, if any.
+
+    Args:
+        event_type: The type of event
+        **data: Event payload fields
+    """
+    sink = _event_sink.get()
+    if sink is None:
+        return
+    sink({"type": event_type, "stage": _event_stage.get(), "timestamp": time.time(), **data})
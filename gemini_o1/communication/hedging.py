@@ -0,0 +1,122 @@
+"""
+Hedged Gemini calls for cutting tail latency.
+
+A call that hasn't returned by its model's p95 latency gets a duplicate, and
+whichever finishes first wins. Hedges only go out with spare quota and are
+capped at a fraction of all calls, so they can't crowd out regular traffic.
+"""
+
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """
+    Recent call latencies per model.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """
+        Initialize the tracker.
+
+        Args:
+            window: Number of recent latencies kept per model
+            min_samples: Latencies needed before percentiles are reported
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._latencies: Dict[str, Deque[float]] = {}
+
+    def record(self, model_name: str, seconds: float) -> None:
+        """
+        Record the latency of a call.
+
+        Args:
+            model_name: The model called
+            seconds: How long the call took
+        """
+        if model_name not in self._latencies:
+            self._latencies[model_name] = deque(maxlen=self.window)
+        self._latencies[model_name].append(seconds)
+
+    def percentile(self, model_name: str, fraction: float = 0.95) -> Optional[float]:
+        """
+        Get a latency percentile for a model.
+
+        Args:
+            model_name: The model
+            fraction: The percentile as a fraction, e.g. 0.95
+
+        Returns:
+            The latency in seconds, or None if too few calls were recorded
+        """
+        latencies = self._latencies.get(model_name)
+        if not latencies or len(latencies) < self.min_samples:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class HedgeBudget:
+    """
+    Caps hedges at a fraction of the calls made over a sliding window.
+    """
+
+    def __init__(self, fraction: float = 0.1, window: float = 60.0):
+        """
+        Initialize the budget.
+
+        Args:
+            fraction: Most hedges allowed per call
+            window: Seconds over which calls and hedges are counted
+        """
+        self.fraction = fraction
+        self.window = window
+        self._calls: Deque[float] = deque()
+        self._hedges: Deque[float] = deque()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+
+    def _trim(self, now: float) -> None:
+        for times in (self._calls, self._hedges):
+            while times and now - times[0] > self.window:
+                times.popleft()
+
+    def record_call(self) -> None:
+        """Count a regular call."""
+        now = time.time()
+        self._trim(now)
+        self._calls.append(now)
+
+    def allows_hedge(self) -> bool:
+        """
+        Check whether another hedge fits within the budget.
+
+        Returns:
+            True if a hedge may go out
+        """
+        now = time.time()
+        self._trim(now)
+        if len(self._hedges) + 1 > self.fraction * len(self._calls):
+            self.rejected += 1
+            return False
+        return True
+
+    def record_hedge(self) -> None:
+        """Count a hedge that went out."""
+        self._hedges.append(time.time())
+        self.hedges += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get hedging statistics.
+
+        Returns:
+            Dictionary with hedge, win and rejection counts
+        """
+        return {"hedges": self.hedges, "hedge_wins": self.hedge_wins, "rejected": self.rejected}
@@ -0,0 +1,93 @@
+"""
+Caching of configured Gemini model objects.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import google.generativeai as genai
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCache:
+    """
+    Bounded LRU cache of GenerativeModel objects.
+
+    Models are keyed by model name and system instruction, so every instance
+    using the same model and role prompt shares one configured client. The
+    least recently used model is evicted once the cache is full.
+    """
+
+    def __init__(self, max_size: int = 32):
+        """
+        Initialize the model cache.
+
+        Args:
+            max_size: Maximum number of models to keep
+        """
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+
+        self.max_size = max_size
+        self._models: "OrderedDict[Tuple[str, Optional[str]], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_name: str, system_instruction: Optional[str] = None):
+        """
+        Get the model for a model name and system instruction, creating it if needed.
+
+        Args:
+            model_name: The Gemini model name
+            system_instruction: The system instruction, if any
+
+        Returns:
+            The GenerativeModel
+        """
+        key = (model_name, system_instruction or None)
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return model
+
+            self.misses += 1
+            model = genai.GenerativeModel(model_name, system_instruction=key[1])
+            self._models[key] = model
+
+            if len(self._models) > self.max_size:
+                (evicted_name, _), _ = self._models.popitem(last=False)
+                self.evictions += 1
+                logger.debug(f"Evicted cached model {evicted_name}")
+
+        return model
+
+    def clear(self) -> None:
+        """Remove all cached models."""
+        with self._lock:
+            self._models.clear()
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get cache usage statistics.
+
+        Returns:
+            Dictionary with size, hit, miss and eviction counts
+        """
+        return {
+            "size": len(self._models),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
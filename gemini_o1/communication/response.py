@@ -2,13 +2,27 @@
 Response handling and generation logic.
 """
 
+import asyncio
 import logging
-from typing import Dict, List, Optional, Tuple
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
-import google.generativeai as genai
 from google.api_core.exceptions import ResourceExhausted
 
-from ..utils.retry import retry_on_exception
+from ..utils.config import config
+from ..utils.deadline import run_with_deadline
+from .call_scheduler import CallScheduler
+from .circuit_breaker import CircuitOpenError, circuit_breakers
+from .events import PARTIAL, emit_event, is_streaming
+from .hedging import HedgeBudget, LatencyTracker
+from .model_cache import ModelCache
+from .response_cache import create_response_cache, make_cache_key
+from .context import ContextBuilder
+from ..utils.payload_logging import PROMPT, RESPONSE, log_payload
+from ..utils.rate_limiter import GEMINI_ENDPOINT, retry_after_from_exception
+from ..utils.retry import RETRYABLE_EXCEPTIONS, gemini_retry_policy
+from ..utils.tokens import estimate_tokens
 from ..models.instance import GeminiInstance
 
 logger = logging.getLogger(__name__)
@@ -27,6 +41,45 @@ class ResponseGenerator:
         """
         self.network = network
         
+        # Bound the number of Gemini calls in flight at once
+        self.max_concurrency = config.get("API_MAX_CONCURRENCY", 8)
+        self.call_semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        # Calls enter the rate limiter by lane priority and fair share between sessions
+        self.scheduler = CallScheduler(config.get("SCHEDULER_CONCURRENCY", 1))
+        
+        # Optionally duplicate calls that run past their model's p95 latency
+        self.hedging = config.get("HEDGE_REQUESTS", False)
+        self.latency_tracker = LatencyTracker(min_samples=config.get("HEDGE_MIN_SAMPLES", 20))
+        self.hedge_budget = HedgeBudget(config.get("HEDGE_QUOTA_FRACTION", 0.1))
+        
+        # Calls to a model that keeps failing are refused until it recovers,
+        # and thinking instances can use the default model meanwhile
+        self.circuit_breakers = circuit_breakers
+        self.breaker_fallback = config.get("CIRCUIT_BREAKER_FALLBACK", True)
+        
+        # Failed model calls are retried under one shared policy, and each
+        # API call is cancelled if it runs too long
+        self.retry_policy = gemini_retry_policy
+        self.call_timeout = config.get("GEMINI_CALL_TIMEOUT", 60.0) or None
+        
+        # Models are shared by every instance with the same model and role prompt
+        self.model_cache = ModelCache(config.get("MODEL_CACHE_SIZE", 32))
+        
+        # Prompt context is assembled within a per-model token budget
+        self.context_builder = ContextBuilder(
+            default_budget=config.get("CONTEXT_TOKEN_BUDGET", 8000),
+            model_budgets=config.get_int_mapping("CONTEXT_TOKEN_BUDGETS")
+        )
+        
+        # Optional cache of responses to byte-identical requests
+        self.response_cache = create_response_cache(
+            config.get("RESPONSE_CACHE_BACKEND", "none"),
+            max_size=config.get("RESPONSE_CACHE_SIZE", 256),
+            ttl=config.get("RESPONSE_CACHE_TTL", 3600),
+            path=config.get("RESPONSE_CACHE_PATH", "~/.cache/gemini_o1/responses.db")
+        )
+        
     def validate_message(self, message: str) -> str:
         """
         Validate a message before sending to the API.
@@ -48,6 +101,9 @@ class ResponseGenerator:
         """
         Build context for the instance response.
         
+        Previous outputs of the instance and the latest outputs of other
+        instances are added within the model's context token budget.
+        
         Args:
             instance: The GeminiInstance
             prompt: The original prompt
@@ -55,40 +111,29 @@ class ResponseGenerator:
         Returns:
             The prompt with added context
         """
-        final_prompt = prompt
+        other_outputs = {
+            inst_id: inst.outputs[-1]
+            for inst_id, inst in self.network.instances.items()
+            if inst_id != instance.instance_id and inst.outputs
+        }
         
-        # Add message context if available
-        messages = []
-        try:
-            # Messages will be retrieved asynchronously later
-            # This is just preparation for the async call
-            pass
-        except Exception as e:
-            logger.error(f"Error getting messages for instance {instance.name}: {e}")
-            
-        # Add previous outputs context if available
-        if instance.outputs:
-            previous_outputs_text = "\n".join(instance.outputs)
-            final_prompt = f"Previous outputs:\n{previous_outputs_text}\n\nTask:\n{final_prompt}"
-            
-        # Add context from other instances if available
-        other_outputs = []
-        for inst_id, inst in self.network.instances.items():
-            if inst_id != instance.instance_id and inst.outputs:
-                other_outputs.append(f"{inst_id}: {inst.outputs[-1]}")
+        context = self.context_builder.build(prompt, instance.model_name, instance.outputs, other_outputs)
         
-        if other_outputs:
-            other_outputs_text = "\n".join(other_outputs)
-            final_prompt = f"Outputs from other instances:\n{other_outputs_text}\n\nTask:\n{final_prompt}"
+        if context.dropped_tokens:
+            logger.info(
+                f"Context for instance {instance.name} dropped {context.dropped_tokens} tokens "
+                f"to fit the {context.budget} token budget",
+                extra={"data": context.get_stats()}
+            )
             
-        return final_prompt
+        return context.prompt
         
-    @retry_on_exception()
     async def get_instance_response(
         self, 
         instance: GeminiInstance, 
         prompt: str,
-        is_system: bool = False
+        is_system: bool = False,
+        include_context: bool = True
     ) -> str:
         """
         Get a response from an instance.
@@ -97,13 +142,344 @@ class ResponseGenerator:
             instance: The GeminiInstance
             prompt: The prompt to send
             is_system: Whether this is a system prompt
+            include_context: Whether to add previous outputs as context
+            
+        Returns:
+            The response text
+            
+        Raises:
+            Exception: If there is an error generating the response
+        """
+        # The prompt takes the instance's pending messages, so it is prepared
+        # once and only the model call is retried
+        prompt = await self._prepare_prompt(instance, prompt, include_context)
+        
+        cache_key = self._get_cache_key(instance, prompt)
+        cached = self._get_cached_response(instance, cache_key, is_system)
+        if cached is not None:
+            self._record_response(instance, cached, is_system)
+            return cached
+        
+        try:
+            model_name, response_text = await self.retry_policy.call(
+                self._call_instance_model, instance, prompt, is_system
+            )
+        except Exception as e:
+            logger.error(f"Error from instance {instance.name}: {e}")
+            raise
+            
+        # A fallback model's answer is cached under that model, not the instance's
+        self._cache_response(self._get_cache_key(instance, prompt, model_name), response_text)
+        self._record_response(instance, response_text, is_system)
+        return response_text
+        
+    async def _call_instance_model(
+        self, 
+        instance: GeminiInstance, 
+        prompt: str, 
+        is_system: bool = False
+    ) -> Tuple[str, str]:
+        """
+        Make one attempt at generating an instance's response.
+        
+        Args:
+            instance: The GeminiInstance
+            prompt: The prepared prompt
+            is_system: Whether this is a system prompt
+            
+        Returns:
+            Tuple of (model called, response text)
+        """
+        model_name = self._select_model(instance)
+        model, full_prompt = self._build_request(instance, prompt, model_name)
+        
+        try:
+            prompt_tokens = self._estimate_request_tokens(instance, full_prompt)
+            async with self._rate_limited_call(model_name, prompt_tokens) as usage:
+                return model_name, await self._generate_text(
+                    instance, model, full_prompt, is_system, usage, model_name
+                )
+        except ResourceExhausted as e:
+            logger.error(f"Resource exhausted error: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Error generating content: {e}")
+            raise
+        
+    async def generate_text(
+        self, 
+        model_name: str, 
+        prompt: str,
+        system_instruction: Optional[str] = None
+    ) -> str:
+        """
+        Generate text outside of any instance conversation.
+        
+        Used for housekeeping calls such as summaries, which should not touch
+        instance history or context.
+        
+        Args:
+            model_name: The Gemini model name
+            prompt: The prompt to send
+            system_instruction: Optional system instruction for the model
             
         Returns:
             The response text
+        """
+        model = self.model_cache.get(model_name, system_instruction)
+        prompt = self.validate_message(prompt)
+        prompt_tokens = estimate_tokens(prompt) + estimate_tokens(system_instruction or "")
+        async with self._rate_limited_call(model_name, prompt_tokens) as usage:
+            response = await self._generate_content(model, prompt)
+            self._read_usage(usage, response)
+        return response.text
+        
+    async def stream_instance_response(
+        self, 
+        instance: GeminiInstance, 
+        prompt: str,
+        is_system: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response from an instance as it is generated.
+        
+        The full response is added to the instance history once the stream
+        completes, exactly as get_instance_response would.
+        
+        Args:
+            instance: The GeminiInstance
+            prompt: The prompt to send
+            is_system: Whether this is a system prompt
+            
+        Yields:
+            Chunks of response text
             
         Raises:
             Exception: If there is an error generating the response
         """
+        prompt = await self._prepare_prompt(instance, prompt)
+        
+        cache_key = self._get_cache_key(instance, prompt)
+        cached = self._get_cached_response(instance, cache_key, is_system)
+        if cached is not None:
+            yield cached
+            self._record_response(instance, cached, is_system)
+            return
+        
+        chunks = []
+        try:
+            model_name, usage, response, call = await self.retry_policy.call(
+                self._open_instance_stream, instance, prompt
+            )
+            async with call:
+                async for chunk in response:
+                    self._read_usage(usage, chunk)
+                    text = self._get_chunk_text(chunk)
+                    if text:
+                        chunks.append(text)
+                        if not is_system:
+                            emit_event(PARTIAL, instance_id=instance.instance_id, role=instance.role, text=text)
+                        yield text
+        except Exception as e:
+            logger.error(f"Error streaming from instance {instance.name}: {e}")
+            raise
+                
+        response_text = "".join(chunks)
+        self._cache_response(self._get_cache_key(instance, prompt, model_name), response_text)
+        self._record_response(instance, response_text, is_system)
+        
+    async def _open_instance_stream(
+        self, 
+        instance: GeminiInstance, 
+        prompt: str
+    ) -> Tuple[str, Dict[str, Optional[int]], Any, AsyncExitStack]:
+        """
+        Make one attempt at opening an instance's response stream.
+        
+        The attempt waits for quota and a concurrency slot like any other
+        call, and keeps them until the returned stack is closed, so reading
+        the stream counts as part of the same rate-limited call.
+        
+        Args:
+            instance: The GeminiInstance
+            prompt: The prepared prompt
+            
+        Returns:
+            Tuple of (model called, usage dictionary, response chunks, stack
+            to close once the stream has been read)
+        """
+        model_name = self._select_model(instance)
+        model, full_prompt = self._build_request(instance, prompt, model_name)
+        prompt_tokens = self._estimate_request_tokens(instance, full_prompt)
+        
+        call = AsyncExitStack()
+        usage = await call.enter_async_context(self._rate_limited_call(model_name, prompt_tokens))
+        try:
+            await call.enter_async_context(self.call_semaphore)
+            response = await self._open_stream(model, full_prompt)
+        except BaseException as e:
+            # Record the failed attempt and free its slot before any retry
+            await call.__aexit__(type(e), e, e.__traceback__)
+            raise
+        return model_name, usage, response, call
+        
+    @asynccontextmanager
+    async def _rate_limited_call(self, model_name: str, prompt_tokens: int = 0):
+        """
+        Wait for quota for a Gemini call and record how the call went.
+        
+        Every Gemini call goes through the shared rate limiter, so the
+        endpoint and per-model quotas hold across all call sites and the
+        recorded calls reflect real traffic. The scheduler decides which
+        waiting call goes to the limiter next. The estimated prompt tokens are
+        charged up front and corrected with the usage the API reports, which
+        callers store in the yielded dictionary. Calls to a model whose
+        circuit breaker is open are refused before they wait for quota.
+        
+        Args:
+            model_name: The model being called
+            prompt_tokens: Estimated tokens of the prompt and system instruction
+            
+        Yields:
+            Dictionary whose "total_tokens" is filled in from the response
+            
+        Raises:
+            CircuitOpenError: If the model's circuit breaker is open
+        """
+        rate_limiter = self.network.rate_limiter
+        breaker = self.circuit_breakers.get(model_name)
+        if not breaker.allow_request():
+            raise CircuitOpenError(model_name, breaker.retry_in())
+            
+        try:
+            async with self.scheduler.admission():
+                delay = await rate_limiter.wait_for_token(GEMINI_ENDPOINT, model=model_name, prompt_tokens=prompt_tokens)
+        except BaseException:
+            breaker.release()
+            raise
+        if delay > 0.1:
+            logger.info(f"Rate limited {model_name}: waited {delay:.2f}s")
+            
+        usage: Dict[str, Optional[int]] = {"total_tokens": None}
+        try:
+            yield usage
+        except ResourceExhausted as e:
+            # Running out of quota says nothing about the model's health
+            breaker.release()
+            rate_limiter.record_call(
+                GEMINI_ENDPOINT, False, 429,
+                model=model_name, tokens=prompt_tokens, retry_after=retry_after_from_exception(e)
+            )
+            raise
+        except Exception as e:
+            # Server errors and calls that ran past GEMINI_CALL_TIMEOUT count
+            # against the model
+            if isinstance(e, RETRYABLE_EXCEPTIONS):
+                breaker.record_failure()
+            else:
+                breaker.release()
+            rate_limiter.record_call(GEMINI_ENDPOINT, False, model=model_name, tokens=prompt_tokens)
+            raise
+        except BaseException:
+            # Cancelled from outside, e.g. at the request deadline or by a
+            # winning hedge, which says nothing about the model
+            breaker.release()
+            raise
+            
+        breaker.record_success()
+        tokens = usage["total_tokens"]
+        if tokens is not None:
+            rate_limiter.reconcile_tokens(GEMINI_ENDPOINT, prompt_tokens, tokens, model=model_name)
+        rate_limiter.record_call(GEMINI_ENDPOINT, True, model=model_name, tokens=tokens or prompt_tokens)
+        
+    @staticmethod
+    def _read_usage(usage: Optional[Dict[str, Optional[int]]], response) -> None:
+        """Store the total token count reported with a response or stream chunk."""
+        metadata = getattr(response, "usage_metadata", None)
+        total = getattr(metadata, "total_token_count", None)
+        if usage is not None and isinstance(total, int) and total > 0:
+            usage["total_tokens"] = total
+            
+    def _estimate_request_tokens(self, instance: GeminiInstance, prompt: str) -> int:
+        """Estimate the input tokens of a call, including the system instruction."""
+        system_prompt = self._get_system_prompt_for_role(instance.role) or ""
+        return estimate_tokens(prompt) + estimate_tokens(system_prompt)
+        
+    def _record_response(self, instance: GeminiInstance, response_text: str, is_system: bool) -> None:
+        """Log a response and add it to the instance history."""
+        log_payload(logger, RESPONSE, f"Instance {instance.name} ({instance.role}) responded", response_text)
+        
+        if not is_system:
+            instance.add_to_history(response_text)
+            
+    def _get_cache_key(
+        self, 
+        instance: GeminiInstance, 
+        prompt: str, 
+        model_name: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Get the response cache key for an instance call.
+        
+        Args:
+            instance: The GeminiInstance
+            prompt: The final prompt
+            model_name: The model called, if not the instance's own
+            
+        Returns:
+            The cache key, or None if response caching is disabled
+        """
+        if self.response_cache is None:
+            return None
+        system_prompt = self._get_system_prompt_for_role(instance.role)
+        return make_cache_key(model_name or instance.model_name, system_prompt, prompt)
+        
+    def _get_cached_response(
+        self, 
+        instance: GeminiInstance, 
+        cache_key: Optional[str],
+        is_system: bool
+    ) -> Optional[str]:
+        """
+        Look up a cached response, emitting it as a partial event on a hit.
+        
+        Args:
+            instance: The GeminiInstance
+            cache_key: The cache key, or None if caching is disabled
+            is_system: Whether this is a system prompt
+            
+        Returns:
+            The cached response text, or None on a miss
+        """
+        if cache_key is None:
+            return None
+            
+        cached = self.response_cache.get(cache_key)
+        if cached is None:
+            return None
+            
+        logger.debug(f"Response cache hit for instance {instance.name}")
+        if not is_system:
+            emit_event(PARTIAL, instance_id=instance.instance_id, role=instance.role, text=cached)
+        return cached
+        
+    def _cache_response(self, cache_key: Optional[str], response_text: str) -> None:
+        """Store a response in the cache, skipping empty responses."""
+        if cache_key is not None and response_text:
+            self.response_cache.set(cache_key, response_text)
+            
+    async def _prepare_prompt(self, instance: GeminiInstance, prompt: str, include_context: bool = True) -> str:
+        """
+        Add message and state context to a prompt and validate it.
+        
+        Args:
+            instance: The GeminiInstance
+            prompt: The original prompt
+            include_context: Whether to add previous outputs as context
+            
+        Returns:
+            The final prompt to send
+        """
         # Add context from messages received by this instance
         messages = await instance.receive_messages()
         if messages:
@@ -111,46 +487,237 @@ class ResponseGenerator:
             prompt = f"Context from other instances:\n{context}\n\nTask:\n{prompt}"
             
         # Add context from current state
-        prompt = self._build_context(instance, prompt)
+        if include_context:
+            prompt = self._build_context(instance, prompt)
         
         # Validate the final prompt
         prompt = self.validate_message(prompt)
-        logger.info(f"\nInstance {instance.name} ({instance.role}) received:\n{prompt}\n")
-        print(f"{instance.name} ({instance.role}): {prompt}")
+        log_payload(logger, PROMPT, f"Instance {instance.name} ({instance.role}) received", prompt)
         
-        # Wait for rate limiting
-        await self.network.rate_limiter.async_wait()
-        response_text = ""
+        return prompt
         
-        try:
-            model = genai.GenerativeModel(instance.model_name)
+    def _build_request(
+        self, 
+        instance: GeminiInstance, 
+        prompt: str, 
+        model_name: Optional[str] = None
+    ) -> Tuple[Any, str]:
+        """
+        Get the model and prompt for an instance call.
+        
+        The role's system prompt is passed to the model as its system
+        instruction rather than being prepended to every prompt.
+        
+        Args:
+            instance: The GeminiInstance
+            prompt: The final prompt
+            model_name: Model to call instead of the instance's own
             
-            # Set system prompt based on role
-            system_prompt = self._get_system_prompt_for_role(instance.role)
+        Returns:
+            Tuple of (model, prompt)
+        """
+        system_prompt = self._get_system_prompt_for_role(instance.role)
+        model = self.model_cache.get(model_name or instance.model_name, system_prompt)
+        
+        return model, prompt
+        
+    def _select_model(self, instance: GeminiInstance) -> str:
+        """
+        Get the model to call for an instance.
+        
+        While the thinking model's circuit breaker would refuse a call, which
+        includes while its trial call is in flight, thinking instances fall
+        back to the default model if fallback is enabled.
+        
+        Args:
+            instance: The GeminiInstance
             
-            try:
-                full_prompt = f"{system_prompt}\n\nUser: {prompt}" if system_prompt else prompt
-                response = model.generate_content(full_prompt)
-                response_text = response.text
-                
-                logger.info(f"Instance {instance.name} responded:\n{response_text}\n")
-                print(f"{instance.name} ({instance.role}): {response_text}")
-                
-                if not is_system:
-                    instance.add_to_history(response_text)
+        Returns:
+            The model name
+        """
+        model_name = instance.model_name
+        if not self.breaker_fallback or model_name != config.get_model_name("thinking"):
+            return model_name
+            
+        fallback = config.get_model_name("default")
+        if fallback != model_name and not self.circuit_breakers.get(model_name).would_allow():
+            logger.warning(f"{model_name} is unavailable, instance {instance.name} falls back to {fallback}")
+            return fallback
+        return model_name
+        
+    async def _generate_text(
+        self, 
+        instance: GeminiInstance, 
+        model, 
+        prompt: str,
+        is_system: bool = False,
+        usage: Optional[Dict[str, Optional[int]]] = None,
+        model_name: Optional[str] = None
+    ) -> str:
+        """
+        Generate the response text for an instance call.
+        
+        When someone is listening for progress events, the response is streamed
+        and each chunk is emitted as a partial event as soon as it arrives.
+        
+        Args:
+            instance: The GeminiInstance
+            model: The GenerativeModel to call
+            prompt: The full prompt to send
+            is_system: Whether this is a system prompt
+            usage: Optional dictionary to store the reported token usage in
+            model_name: The model called, if not the instance's own
+            
+        Returns:
+            The response text
+        """
+        if is_system or not is_streaming():
+            response = await self._generate_hedged(instance, model, prompt, model_name)
+            self._read_usage(usage, response)
+            return response.text
+            
+        chunks = []
+        async with self.call_semaphore:
+            response = await run_with_deadline(model.generate_content_async(prompt, stream=True), self.call_timeout)
+            async for chunk in response:
+                self._read_usage(usage, chunk)
+                text = self._get_chunk_text(chunk)
+                if text:
+                    chunks.append(text)
+                    emit_event(PARTIAL, instance_id=instance.instance_id, role=instance.role, text=text)
                     
-            except ResourceExhausted as e:
-                logger.error(f"Resource exhausted error: {e}")
-                raise
-            except Exception as e:
-                logger.error(f"Error generating content: {e}")
-                raise
-                
-        except Exception as e:
-            logger.error(f"Error from instance {instance.name}: {e}")
-            raise
+        return "".join(chunks)
+        
+    async def _generate_content(self, model, prompt: str):
+        """
+        Call the Gemini API without blocking the event loop.
+        
+        Uses the client's native async call path so other instances can keep
+        their requests in flight while this one waits. The call is cancelled
+        after GEMINI_CALL_TIMEOUT; waiting for quota beforehand is bounded
+        only by the request's deadline.
+        
+        Args:
+            model: The GenerativeModel to call
+            prompt: The full prompt to send
             
-        return response_text
+        Returns:
+            The API response
+            
+        Raises:
+            asyncio.TimeoutError: If the call took longer than GEMINI_CALL_TIMEOUT
+        """
+        async with self.call_semaphore:
+            return await run_with_deadline(model.generate_content_async(prompt), self.call_timeout)
+            
+    async def _generate_hedged(self, instance: GeminiInstance, model, prompt: str, model_name: Optional[str] = None):
+        """
+        Call the Gemini API, hedging the call if it runs long.
+        
+        With hedging enabled, a call still running after its model's p95
+        latency gets a duplicate if the hedge budget and the rate limiter
+        have room for it. The first successful response wins and the other
+        call is cancelled.
+        
+        Args:
+            instance: The GeminiInstance
+            model: The GenerativeModel to call
+            prompt: The full prompt to send
+            model_name: The model called, if not the instance's own
+            
+        Returns:
+            The API response
+        """
+        model_name = model_name or instance.model_name
+        self.hedge_budget.record_call()
+        primary = asyncio.ensure_future(self._timed_content(model_name, model, prompt))
+        tasks = [primary]
+        
+        try:
+            hedge_after = self.latency_tracker.percentile(model_name) if self.hedging else None
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done and self._try_hedge(instance, prompt, model_name):
+                    logger.info(f"Hedging call of instance {instance.name} after {hedge_after:.2f}s")
+                    tasks.append(asyncio.ensure_future(self._timed_content(model_name, model, prompt)))
+                    
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                failed = None
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_budget.hedge_wins += 1
+                        return task.result()
+                    failed = task
+                if not pending:
+                    return failed.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                    
+    def _try_hedge(self, instance: GeminiInstance, prompt: str, model_name: str) -> bool:
+        """Take quota for a hedge if the budget and the rate limiter have room."""
+        if not self.hedge_budget.allows_hedge():
+            return False
+        prompt_tokens = self._estimate_request_tokens(instance, prompt)
+        if not self.network.rate_limiter.try_acquire(
+            GEMINI_ENDPOINT, model=model_name, prompt_tokens=prompt_tokens
+        ):
+            self.hedge_budget.rejected += 1
+            return False
+        self.hedge_budget.record_hedge()
+        return True
+        
+    async def _timed_content(self, model_name: str, model, prompt: str):
+        """Call the Gemini API and record how long the call took if it completed."""
+        started = time.monotonic()
+        response = await self._generate_content(model, prompt)
+        # Cancelled and failed calls are left out, as their truncated
+        # durations would pull the percentiles down
+        self.latency_tracker.record(model_name, time.monotonic() - started)
+        return response
+        
+    def get_hedging_stats(self) -> Dict[str, Any]:
+        """
+        Get hedging statistics.
+        
+        Returns:
+            Dictionary with hedge counts and whether hedging is enabled
+        """
+        return {"enabled": self.hedging, **self.hedge_budget.get_stats()}
+        
+    def get_circuit_breaker_stats(self) -> Dict[str, Any]:
+        """
+        Get the state of each model's circuit breaker.
+        
+        Returns:
+            Dictionary mapping model names to breaker states
+        """
+        return self.circuit_breakers.get_states()
+        
+    async def _open_stream(self, model, prompt: str):
+        """
+        Start a streaming Gemini API call.
+        
+        Args:
+            model: The GenerativeModel to call
+            prompt: The full prompt to send
+            
+        Returns:
+            An async iterable of response chunks
+        """
+        return await run_with_deadline(model.generate_content_async(prompt, stream=True), self.call_timeout)
+        
+    @staticmethod
+    def _get_chunk_text(chunk) -> str:
+        """Get the text of a streamed chunk, ignoring chunks without text parts."""
+        try:
+            return chunk.text
+        except ValueError:
+            return ""
         
     def _get_system_prompt_for_role(self, role: str) -> Optional[str]:
         """
@@ -0,0 +1,249 @@
+"""
+Caching of instance responses for identical requests.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(
+    model_name: str,
+    system_prompt: Optional[str],
+    prompt: str,
+    generation_config: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Build the cache key for a model call.
+
+    Args:
+        model_name: The Gemini model name
+        system_prompt: The system instruction sent with the call
+        prompt: The final prompt
+        generation_config: Generation settings sent with the call, if any
+
+    Returns:
+        A hex digest identifying the request
+    """
+    payload = json.dumps(
+        [model_name, system_prompt or "", prompt, generation_config or {}],
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryResponseCache:
+    """
+    In-memory response cache with LRU and TTL eviction.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 3600):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of responses to keep
+            ttl: Seconds a response stays valid (0 to never expire)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get a cached response.
+
+        Args:
+            key: The cache key
+
+        Returns:
+            The cached response, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry[1]):
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Store a response.
+
+        Args:
+            key: The cache key
+            value: The response text
+        """
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all cached responses."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache usage statistics.
+
+        Returns:
+            Dictionary with backend, size, hit, miss and eviction counts
+        """
+        return {
+            "backend": "memory",
+            "size": len(self),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class SQLiteResponseCache(MemoryResponseCache):
+    """
+    Response cache persisted in a SQLite database.
+
+    Responses survive restarts and can be shared by processes using the same
+    database file. Least recently used entries are evicted beyond max_size.
+    """
+
+    def __init__(self, path: str, max_size: int = 256, ttl: float = 3600):
+        """
+        Initialize the cache.
+
+        Args:
+            path: Path to the SQLite database file
+            max_size: Maximum number of responses to keep
+            ttl: Seconds a response stays valid (0 to never expire)
+        """
+        super().__init__(max_size=max_size, ttl=ttl)
+        self.path = os.path.expanduser(path)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None and self._is_expired(row[1]):
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.evictions += 1
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            evicted = self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,)
+            ).rowcount
+            self.evictions += max(evicted, 0)
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats["backend"] = "sqlite"
+        stats["path"] = self.path
+        return stats
+
+
+def create_response_cache(
+    backend: str,
+    max_size: int = 256,
+    ttl: float = 3600,
+    path: str = "~/.cache/gemini_o1/responses.db"
+) -> Optional[MemoryResponseCache]:
+    """
+    Create a response cache for the configured backend.
+
+    Args:
+        backend: "memory", "sqlite", or "none" to disable caching
+        max_size: Maximum number of responses to keep
+        ttl: Seconds a response stays valid (0 to never expire)
+        path: Database path for the sqlite backend
+
+    Returns:
+        The response cache, or None if caching is disabled
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    backend = (backend or "none").lower()
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return MemoryResponseCache(max_size=max_size, ttl=ttl)
+    if backend == "sqlite":
+        return SQLiteResponseCache(path, max_size=max_size, ttl=ttl)
+    raise ValueError(f"Unknown response cache backend: {backend}")
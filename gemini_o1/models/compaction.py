@@ -0,0 +1,232 @@
+"""
+Rolling compaction of instance history.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from .instance import GeminiInstance
+from ..utils.tokens import estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+Summarizer = Callable[[GeminiInstance, str], Awaitable[str]]
+
+SUMMARY_PROMPT = """Summarize the earlier work of a {role} below so it can replace the full transcript.
+Keep decisions, facts, results and open questions. Be concise.
+
+{transcript}"""
+
+
+class TranscriptArchive:
+    """
+    Cold storage for history entries removed by compaction.
+
+    Each instance's raw transcript is appended to its own JSON Lines file.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initialize the archive.
+
+        Args:
+            directory: Directory holding the transcript files
+        """
+        self.directory = os.path.expanduser(directory)
+
+    def path_for(self, instance_id: str) -> str:
+        """
+        Get the transcript file for an instance.
+
+        Args:
+            instance_id: The instance ID
+
+        Returns:
+            Path to the instance's transcript file
+        """
+        safe_id = re.sub(r"[^\w.-]", "_", instance_id)
+        return os.path.join(self.directory, f"{safe_id}.jsonl")
+
+    def append(self, instance_id: str, entries: List[Dict[str, str]]) -> None:
+        """
+        Append history entries to an instance's transcript.
+
+        Args:
+            instance_id: The instance ID
+            entries: The history entries to store
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        archived_at = time.time()
+        with open(self.path_for(instance_id), "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps({"archived_at": archived_at, **entry}) + "\n")
+
+    def load(self, instance_id: str) -> List[Dict[str, str]]:
+        """
+        Read an instance's archived transcript.
+
+        Args:
+            instance_id: The instance ID
+
+        Returns:
+            The archived entries, oldest first
+        """
+        path = self.path_for(instance_id)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+def extractive_summary(entries: List[Dict[str, str]], max_tokens: int) -> str:
+    """
+    Summarize history entries by keeping the opening of each one.
+
+    Args:
+        entries: The history entries to summarize
+        max_tokens: Token budget for the whole summary
+
+    Returns:
+        The summary text
+    """
+    if not entries:
+        return ""
+
+    per_entry = max(max_tokens // len(entries), 8)
+    lines = []
+    for entry in entries:
+        text = " ".join(entry.get("text", "").split())
+        lines.append(f"- {truncate_to_tokens(text, per_entry)}")
+    return truncate_to_tokens("\n".join(lines), max_tokens)
+
+
+class HistoryCompactor:
+    """
+    Replaces old instance history with a summary once it grows too large.
+
+    When an instance's history exceeds the token threshold, every entry but
+    the most recent few is summarized, archived in cold storage, and replaced
+    by the summary. Compaction runs in the background so it never delays the
+    response that triggered it.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 6000,
+        keep_recent: int = 4,
+        summary_tokens: int = 500,
+        archive: Optional[TranscriptArchive] = None,
+        summarizer: Optional[Summarizer] = None
+    ):
+        """
+        Initialize the compactor.
+
+        Args:
+            max_tokens: History size in tokens that triggers compaction (0 disables it)
+            keep_recent: Number of recent entries kept verbatim
+            summary_tokens: Token budget for the summary
+            archive: Cold storage for the replaced entries, if any
+            summarizer: Coroutine function producing a summary from a transcript;
+                falls back to an extractive summary when missing or failing
+        """
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.summary_tokens = summary_tokens
+        self.archive = archive
+        self.summarizer = summarizer
+        self._in_progress: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def needs_compaction(self, instance: GeminiInstance) -> bool:
+        """
+        Check whether an instance's history is over the threshold.
+
+        Args:
+            instance: The instance to check
+
+        Returns:
+            True if the history should be compacted
+        """
+        if self.max_tokens <= 0 or len(instance.history) <= self.keep_recent + 1:
+            return False
+        size = sum(estimate_tokens(entry.get("text", "")) for entry in instance.history)
+        return size > self.max_tokens
+
+    def schedule(self, instance: GeminiInstance) -> Optional[asyncio.Task]:
+        """
+        Start compacting an instance in the background if it needs it.
+
+        Args:
+            instance: The instance to check
+
+        Returns:
+            The compaction task, or None if no compaction was started
+        """
+        if instance.instance_id in self._in_progress or not self.needs_compaction(instance):
+            return None
+
+        self._in_progress.add(instance.instance_id)
+        task = asyncio.create_task(self._compact_in_background(instance))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _compact_in_background(self, instance: GeminiInstance) -> None:
+        try:
+            await self.compact(instance)
+        except Exception as e:
+            logger.error(f"Error compacting history of instance {instance.instance_id}: {e}")
+        finally:
+            self._in_progress.discard(instance.instance_id)
+
+    async def compact(self, instance: GeminiInstance) -> int:
+        """
+        Summarize and replace all but the most recent history entries.
+
+        Args:
+            instance: The instance to compact
+
+        Returns:
+            Number of history entries replaced
+        """
+        count = len(instance.history) - self.keep_recent
+        if count <= 1:
+            return 0
+
+        entries = list(instance.history[:count])
+        summary = await self._summarize(instance, entries)
+
+        if self.archive:
+            # Summaries are already derived data; only archive raw turns
+            raw_entries = [entry for entry in entries if entry.get("role") != "summary"]
+            await asyncio.to_thread(self.archive.append, instance.instance_id, raw_entries)
+
+        removed = instance.compact(count, summary)
+        before = sum(estimate_tokens(entry.get("text", "")) for entry in removed)
+        logger.info(
+            f"Compacted {len(removed)} history entries of instance {instance.instance_id}",
+            extra={"data": {"tokens_before": before, "tokens_after": estimate_tokens(summary)}}
+        )
+        return len(removed)
+
+    async def _summarize(self, instance: GeminiInstance, entries: List[Dict[str, str]]) -> str:
+        """Summarize entries with the summarizer, falling back to an extractive summary."""
+        if self.summarizer:
+            transcript = "\n\n".join(entry.get("text", "") for entry in entries)
+            try:
+                summary = await self.summarizer(instance, transcript)
+                if summary and summary.strip():
+                    return truncate_to_tokens(summary.strip(), self.summary_tokens)
+            except Exception as e:
+                logger.warning(f"Falling back to extractive summary for {instance.instance_id}: {e}")
+        return extractive_summary(entries, self.summary_tokens)
+
+    async def wait(self) -> None:
+        """Wait for all running compactions to finish."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
@@ -31,6 +31,8 @@ class GeminiInstance:
     connected_instances: Dict[str, 'GeminiInstance'] = field(default_factory=dict)
     task_completed: bool = field(default=False)
     outputs: List[str] = field(default_factory=list)
+    summary: str = field(default="")
+    compacted_turns: int = field(default=0)
     
     def __post_init__(self):
         """Initialize instance after creation."""
@@ -79,6 +81,33 @@ class GeminiInstance:
             self.outputs.append(text)
             self.task_completed = True
 
+    def compact(self, count: int, summary: str) -> List[Dict[str, str]]:
+        """
+        Replace the oldest history entries with a summary.
+        
+        The summary becomes the first history entry and output, so context
+        building and synthesis see it in place of the turns it replaces.
+        Entries added after the summary was started are left untouched.
+        
+        Args:
+            count: Number of leading history entries to replace
+            summary: Summary of the replaced entries
+            
+        Returns:
+            The replaced history entries
+        """
+        removed = self.history[:count]
+        if not removed:
+            return []
+            
+        # Outputs mirror the history entries one to one
+        summary_entry = {"role": "summary", "text": summary}
+        self.history[:count] = [summary_entry]
+        self.outputs[:count] = [summary]
+        self.summary = summary
+        self.compacted_turns += sum(1 for entry in removed if entry.get("role") != "summary")
+        return removed
+
     def get_status(self) -> Dict:
         """
         Get the current status of this instance.
@@ -94,5 +123,6 @@ class GeminiInstance:
             "created_at": self.created_at,
             "task_completed": self.task_completed,
             "message_count": len(self.history),
+            "compacted_turns": self.compacted_turns,
             "connected_to": list(self.connected_instances.keys())
         }
\ No newline at end of file
@@ -2,20 +2,30 @@
 Core GeminiNetwork implementation for managing AI instances.
 """
 
+import asyncio
 import logging
 import time
-from typing import Dict, List, Optional, Tuple, Any
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Any
 
 import google.generativeai as genai
 
 from ..models.instance import GeminiInstance
-from ..utils.retry import retry_on_exception
+from ..models.compaction import SUMMARY_PROMPT, HistoryCompactor, TranscriptArchive
 from ..utils.prompts import PromptManager
 from ..utils.config import config
-from ..utils.logging_config import logging_config, PerformanceTracker
-from ..commands.command_parser import CommandParser
+from ..utils.logging_config import logging_config, log_span, request_context, PerformanceTracker
+from ..utils.rate_limiter import GEMINI_ENDPOINT, configure_gemini_limits, rate_limiter
+from ..utils.deadline import DeadlineExceeded, deadline, run_with_deadline
+from ..utils.payload_logging import COMMAND, COMMAND_RESULT, USER_INPUT, log_payload
+from ..utils.tokens import estimate_tokens, truncate_to_tokens
+from ..commands.command_parser import CommandParser, StreamingCommandParser
 from ..commands.command_handlers import CommandHandler
 from ..communication.response import ResponseGenerator
+from ..communication.call_scheduler import BACKGROUND, INTERACTIVE, scheduling
+from ..communication.events import (
+    DONE, INSTANCE_CREATED, SYNTHESIS, TASK_COMPLETED, TASK_STARTED,
+    emit_event, event_stage, reset_event_sink, set_event_sink
+)
 
 # Set up logger with request tracking
 logger = logging_config.get_logger(__name__)
@@ -28,20 +38,24 @@ class GeminiNetwork:
     specialized AI instances that collaborate on tasks.
     """
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, stream_commands: Optional[bool] = None):
         """
         Initialize the Gemini Network.
         
         Args:
             api_key: The Gemini API key (optional, will use environment if not provided)
+            stream_commands: Whether to run mother node commands while its response
+                is still streaming in (optional, defaults to the STREAM_COMMANDS setting)
         """
         # Use provided API key or get from config
         self.api_key = api_key or config["GEMINI_API_KEY"]
         if not self.api_key:
             raise ValueError("API key cannot be empty")
+            
+        if stream_commands is None:
+            stream_commands = config.get("STREAM_COMMANDS", False)
+        self.stream_commands = stream_commands
         
-        # Generate a unique request ID for this network instance
-        logging_config.set_request_id()
         logger.info("Initializing Gemini Network")
         
         # Setup components
@@ -58,14 +72,26 @@ class GeminiNetwork:
         self.mother_node: Optional[GeminiInstance] = None
         self.instance_counter = 0
         
-        # Setup rate limiter
-        from utils_file import RateLimiter
-        rate_limit_config = config.get_rate_limit_config()
-        self.rate_limiter = RateLimiter(
-            max_calls=rate_limit_config["max_calls"], 
-            period=rate_limit_config["period"]
+        # Setup history compaction
+        archive_dir = config.get("TRANSCRIPT_ARCHIVE_DIR", "")
+        self.history_compactor = HistoryCompactor(
+            max_tokens=config.get("HISTORY_COMPACTION_TOKENS", 6000),
+            keep_recent=config.get("HISTORY_KEEP_RECENT", 4),
+            summary_tokens=config.get("HISTORY_SUMMARY_TOKENS", 500),
+            archive=TranscriptArchive(archive_dir) if archive_dir else None,
+            summarizer=self._summarize_history if config.get("HISTORY_SUMMARY_MODE", "extractive") == "model" else None
         )
         
+        # Running summary of earlier synthesis rounds
+        self.synthesis_rounds: List[str] = []
+        self.synthesis_summary_tokens = config.get("SYNTHESIS_SUMMARY_TOKENS", 500)
+        self.last_synthesis_stats: Dict[str, int] = {}
+        
+        # Every Gemini call goes through the shared rate limiter
+        if GEMINI_ENDPOINT not in rate_limiter.limiters:
+            configure_gemini_limits(rate_limiter)
+        self.rate_limiter = rate_limiter
+        
     def normalize_instance_id(self, identifier: str) -> str:
         """
         Normalize an instance ID to a consistent format.
@@ -78,7 +104,6 @@ class GeminiNetwork:
         """
         return identifier.replace(" ", "-").lower()
     
-    @retry_on_exception()
     async def _initialize_mother_node(self):
         """
         Initialize the mother node (scrum master).
@@ -150,10 +175,6 @@ class GeminiNetwork:
             
         instance_id = self.normalize_instance_id(instance_id)
         
-        # Create the instance with a unique ID within the request context
-        instance_request_id = f"{logging_config.request_id}-{instance_id}"
-        logging_config.set_request_id(instance_request_id)
-        
         instance = GeminiInstance(
             name=name,
             role=role_description,
@@ -164,20 +185,46 @@ class GeminiNetwork:
 
         perf.checkpoint("instance_created")
         
-        if initial_prompt:
-            await self.get_instance_response(instance, initial_prompt, is_system=True)
-            perf.checkpoint("initial_prompt_sent")
-        
+        # Register the instance before the initial prompt so concurrent creations
+        # see it and pick distinct default names
+        previous_instance = self.instances.get(instance.instance_id)
         self.instances[instance.instance_id] = instance
         
-        # Restore the previous request ID
-        logging_config.set_request_id()
+        if initial_prompt:
+            try:
+                await self.get_instance_response(instance, initial_prompt, is_system=True)
+            except Exception:
+                if self.instances.get(instance.instance_id) is instance:
+                    if previous_instance is not None:
+                        self.instances[instance.instance_id] = previous_instance
+                    else:
+                        del self.instances[instance.instance_id]
+                raise
+            perf.checkpoint("initial_prompt_sent")
         
         logger.info(f"Instance created: {instance_id} with role {role_description}")
+        emit_event(INSTANCE_CREATED, instance_id=instance_id, name=name, role=role_description, model=model_name)
         perf.stop()
         
         return instance
         
+    async def _summarize_history(self, instance: GeminiInstance, transcript: str) -> str:
+        """
+        Summarize an instance's earlier work with the instance's model.
+        
+        Args:
+            instance: The instance whose history is being compacted
+            transcript: The history entries to summarize
+            
+        Returns:
+            The summary text
+        """
+        budget = self.response_generator.context_builder.budget_for(instance.model_name)
+        prompt = SUMMARY_PROMPT.format(role=instance.role, transcript=truncate_to_tokens(transcript, budget))
+        # Housekeeping must not hold up calls someone is waiting for
+        with scheduling(lane=BACKGROUND):
+            return await self.response_generator.generate_text(instance.model_name, prompt)
+        
     async def cleanup_old_instances(self, max_age_hours: float = 1.0) -> int:
         """
         Remove instances that haven't been used for a while.
@@ -206,7 +253,9 @@ class GeminiNetwork:
         self, 
         instance: GeminiInstance, 
         prompt: str,
-        is_system: bool = False
+        is_system: bool = False,
+        include_context: bool = True,
+        report_completion: bool = True
     ) -> str:
         """
         Get a response from an instance.
@@ -215,37 +264,100 @@ class GeminiNetwork:
             instance: The instance to query
             prompt: The prompt to send
             is_system: Whether this is a system message
+            include_context: Whether to add previous outputs as context
+            report_completion: Whether to emit a task completed event for the response
             
         Returns:
             The response text
         """
-        # Set the request ID to include the instance ID
-        instance_request_id = f"{logging_config.request_id}-{instance.instance_id}"
-        logging_config.set_request_id(instance_request_id)
+        # Log the call under a span of the current request
+        with log_span(instance.instance_id):
+            logger.info(f"Getting response from instance {instance.instance_id}")
+            perf = PerformanceTracker(logger, "instance_response", self._instance_labels(instance))
+            perf.start()
+        
+            if not is_system:
+                emit_event(TASK_STARTED, instance_id=instance.instance_id, role=instance.role)
+        
+            try:
+                response = await self.response_generator.get_instance_response(
+                    instance,
+                    prompt,
+                    is_system,
+                    include_context
+                )
+            
+                perf.stop()
+            
+                if not is_system:
+                    if report_completion:
+                        emit_event(TASK_COMPLETED, instance_id=instance.instance_id, role=instance.role, text=response)
+                    self.history_compactor.schedule(instance)
+            
+                return response
+            except Exception as e:
+                logger.error(f"Error getting response from instance {instance.instance_id}: {e}")
+                raise
+        
+    def _instance_labels(self, instance: GeminiInstance) -> Dict[str, str]:
+        """
+        Get bounded metric labels for an instance.
+        
+        Instance IDs are collapsed into whether the instance is the mother
+        node or a specialist, so the number of series stays small.
+        
+        Args:
+            instance: The instance
+            
+        Returns:
+            Labels for the instance's timings
+        """
+        kind = "mother" if instance is self.mother_node else "specialist"
+        return {"instance": kind, "model": instance.model_name}
         
-        logger.info(f"Getting response from instance {instance.instance_id}")
-        perf = PerformanceTracker(logger, f"instance_response_{instance.instance_id}")
+    async def stream_instance_response(
+        self, 
+        instance: GeminiInstance, 
+        prompt: str,
+        is_system: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response from an instance as it is generated.
+        
+        Args:
+            instance: The instance to query
+            prompt: The prompt to send
+            is_system: Whether this is a system message
+            
+        Yields:
+            Chunks of response text
+        """
+        logger.info(f"Streaming response from instance {instance.instance_id}")
+        perf = PerformanceTracker(logger, "instance_stream", self._instance_labels(instance))
         perf.start()
         
+        if not is_system:
+            emit_event(TASK_STARTED, instance_id=instance.instance_id, role=instance.role)
+            
+        chunks = []
         try:
-            response = await self.response_generator.get_instance_response(
+            async for chunk in self.response_generator.stream_instance_response(
                 instance,
                 prompt,
                 is_system
-            )
-            
+            ):
+                if not chunks:
+                    perf.checkpoint("first_chunk")
+                chunks.append(chunk)
+                yield chunk
+                
             perf.stop()
             
-            # Restore the previous request ID
-            logging_config.set_request_id()
-            
-            return response
+            if not is_system:
+                emit_event(TASK_COMPLETED, instance_id=instance.instance_id, role=instance.role, text="".join(chunks))
+                self.history_compactor.schedule(instance)
         except Exception as e:
-            logger.error(f"Error getting response from instance {instance.instance_id}: {e}")
-            
-            # Restore the previous request ID even on error
-            logging_config.set_request_id()
-            
+            logger.error(f"Error streaming response from instance {instance.instance_id}: {e}")
             raise
         
     async def connect_instances(self, instance1_id: str, instance2_id: str) -> bool:
@@ -295,8 +407,7 @@ class GeminiNetwork:
         perf.start()
         
         # Log the command to help with debugging
-        logger.debug(f"Mother node command: {response}")
-        print(f"Mother Node: {response}")
+        log_payload(logger, COMMAND, "Mother node command", response)
         
         # Parse commands from the response
         commands = self.command_parser.parse_commands(response)
@@ -308,11 +419,64 @@ class GeminiNetwork:
         
         # Log the results for debugging
         logger.info(f"Mother node command processing complete: {len(commands)} commands processed")
-        logger.debug(f"Command processing result: {result}")
+        log_payload(logger, COMMAND_RESULT, "Command processing result", result, logging.DEBUG)
         
         perf.stop()
         return result
     
+    async def process_mother_node_stream(self, chunks: AsyncIterator[str]) -> Tuple[str, Dict]:
+        """
+        Process commands from the mother node while its response streams in.
+        
+        Each command is dispatched as soon as it has been fully received. SYNTHESIZE
+        (and anything after it) waits for the end of the stream, so the mother node
+        sees its complete plan in its history exactly as in the batch path.
+        
+        Args:
+            chunks: Async iterator of mother node response text
+            
+        Returns:
+            Tuple of (full mother node response, result dictionary)
+        """
+        logger.info("Processing streamed mother node commands")
+        perf = PerformanceTracker(logger, "process_mother_node_stream")
+        perf.start()
+        
+        parser = StreamingCommandParser(self.command_parser)
+        response_parts = []
+        command_count = 0
+        
+        async def commands():
+            nonlocal command_count
+            held_back = []
+            
+            async for chunk in chunks:
+                response_parts.append(chunk)
+                for command in parser.feed(chunk):
+                    command_count += 1
+                    if held_back or command['type'] == 'SYNTHESIZE':
+                        held_back.append(command)
+                    else:
+                        yield command
+                        
+            perf.checkpoint("stream_complete")
+            
+            remaining = parser.close()
+            command_count += len(remaining)
+            for command in held_back + remaining:
+                yield command
+                
+        result = await self.command_handler.handle_command_stream(commands())
+        perf.checkpoint("commands_processed")
+        
+        response = "".join(response_parts)
+        log_payload(logger, COMMAND, "Mother node command", response)
+        logger.info(f"Mother node command processing complete: {command_count} commands processed")
+        log_payload(logger, COMMAND_RESULT, "Command processing result", result, logging.DEBUG)
+        
+        perf.stop()
+        return response, result
+    
     async def synthesize_with_mother_node(self, node_outputs: List[Tuple[str, str]]) -> str:
         """
         Synthesize outputs from multiple instances using the mother node.
@@ -327,35 +491,70 @@ class GeminiNetwork:
         perf = PerformanceTracker(logger, "synthesize_with_mother_node")
         perf.start()
         
-        all_outputs = []
-        for instance in self.instances.values():
-            all_outputs.extend(instance.outputs)
+        # Only this round's outputs are sent; earlier rounds are represented by a running summary
+        outputs_text = "\n\n".join(f"{instance_id}: {output}" for instance_id, output in node_outputs if output)
         
         # If there are no outputs, provide a detailed description of the interface
-        if not all_outputs:
+        if not outputs_text:
             has_image_content = any("image" in output[1].lower() for output in node_outputs if len(output) > 1)
             
             outputs_text = self._get_default_response(has_image_content)
-        else:
-            outputs_text = "\n".join(all_outputs)
+            
+        if self.synthesis_rounds:
+            earlier_rounds = "\n".join(f"- {digest}" for digest in self.synthesis_rounds)
+            outputs_text = f"Summary of earlier rounds:\n{earlier_rounds}\n\nCurrent outputs:\n{outputs_text}"
         
         # Send the synthesis prompt to the mother node
-        mother_prompt = self.prompt_manager.get_prompt('Synthesis Prompt', '').format(outputs_text=outputs_text)
+        synthesis_prompt = self.prompt_manager.get_prompt('Synthesis Prompt', '')
+        if "{outputs_text}" in synthesis_prompt:
+            mother_prompt = synthesis_prompt.format(outputs_text=outputs_text)
+        else:
+            mother_prompt = f"{synthesis_prompt}\n\nOutputs to synthesize:\n{outputs_text}"
+            
+        self.last_synthesis_stats = {
+            "synthesis_input_tokens": estimate_tokens(mother_prompt),
+            "synthesis_input_chars": len(mother_prompt),
+            "current_outputs": len(node_outputs),
+            "earlier_rounds": len(self.synthesis_rounds)
+        }
+        logger.info("Synthesis input metrics", extra={"data": self.last_synthesis_stats})
         
         perf.checkpoint("prompt_prepared")
         
-        # Make sure we're using the mother node's request ID context
-        mother_request_id = f"{logging_config.request_id}-mother"
-        logging_config.set_request_id(mother_request_id)
-        
-        response = await self.get_instance_response(self.mother_node, mother_prompt)
-        
-        # Restore the previous request ID
-        logging_config.set_request_id()
+        # The user is waiting on synthesis, so it goes ahead of other calls
+        with event_stage("synthesis"), scheduling(lane=INTERACTIVE):
+            # The prompt already carries everything synthesis needs, and the
+            # synthesis event below reports the response in place of task completion
+            response = await self.get_instance_response(
+                self.mother_node, mother_prompt, include_context=False, report_completion=False
+            )
+            emit_event(SYNTHESIS, instance_id=self.mother_node.instance_id, text=response)
+            
+        self._add_synthesis_round(response)
         
         perf.stop()
         return response
     
+    def _add_synthesis_round(self, response: str) -> None:
+        """
+        Fold a synthesized response into the running summary of earlier rounds.
+        
+        Each round is kept as a short digest, and the oldest digests are dropped
+        once the summary exceeds its token budget.
+        
+        Args:
+            response: The synthesized response
+        """
+        if not response:
+            return
+            
+        digest = truncate_to_tokens(" ".join(response.split()), max(self.synthesis_summary_tokens // 4, 16))
+        self.synthesis_rounds.append(digest)
+        
+        while len(self.synthesis_rounds) > 1 and \
+                sum(estimate_tokens(digest) for digest in self.synthesis_rounds) > self.synthesis_summary_tokens:
+            self.synthesis_rounds.pop(0)
+    
     def _get_default_response(self, has_image_content: bool) -> str:
         """Get a default response description when no outputs are available."""
         if has_image_content:
@@ -403,19 +602,41 @@ class GeminiNetwork:
                - System status showing "Online" and update time
             """
     
-    async def handle_user_input(self, user_input: str) -> str:
+    async def handle_user_input(self, user_input: str, timeout: Optional[float] = None) -> str:
         """
         Handle user input and coordinate processing through the network.
         
+        The request's deadline applies to every Gemini call it makes. Once it
+        passes, outstanding calls are cancelled so they stop using quota.
+        
         Args:
             user_input: The user's input text
+            timeout: Seconds the request may take, defaulting to REQUEST_TIMEOUT
             
         Returns:
             The response to the user
         """
-        # Generate a new request ID for this user interaction
-        logging_config.set_request_id()
+        if timeout is None:
+            timeout = config.get("REQUEST_TIMEOUT", 300.0) or None
+            
+        # Everything logged while handling this input shares one request ID
+        with deadline(timeout), request_context():
+            try:
+                return await run_with_deadline(self._process_user_input(user_input))
+            except DeadlineExceeded:
+                logger.warning(f"Request did not finish within {timeout}s and was cancelled")
+                return "Sorry, your request took too long to process. Please try again."
+                
+    async def _process_user_input(self, user_input: str) -> str:
+        """
+        Run user input through the mother node and its specialists.
         
+        Args:
+            user_input: The user's input text
+            
+        Returns:
+            The response to the user
+        """
         logger.info(f"Handling user input: {user_input[:50]}{'...' if len(user_input) > 50 else ''}")
         perf = PerformanceTracker(logger, "handle_user_input")
         perf.start()
@@ -426,8 +647,8 @@ class GeminiNetwork:
         if user_input.lower() in ['exit', 'quit']:
             return "Goodbye! Thank you for using the system."
 
-        # Log the full input for debugging (might contain sensitive info, so debug level)
-        logger.debug(f"Full user input: {user_input}")
+        # Log the input for debugging (might contain sensitive info, so debug level)
+        log_payload(logger, USER_INPUT, "Full user input", user_input, logging.DEBUG)
         
         # Get context from previous interactions
         last_context = ""
@@ -449,6 +670,7 @@ class GeminiNetwork:
            - normal: Standard model for basic tasks
            - thinking: Enhanced model for complex reasoning
         3. TO: Assign specific tasks to instances (format: TO instance-id: detailed task)
+           If a task needs another instance's output, say so: TO instance-id [after other-id]: detailed task
         4. SYNTHESIZE: At the end
 
         Current team: {[f"{id}: {inst.role}" for id, inst in self.instances.items()]}
@@ -458,6 +680,7 @@ class GeminiNetwork:
         - Each command must be on its own line
         - Keep responses focused and actionable
         - Always delegate tasks using TO commands
+        - Tasks without [after ...] run in parallel, so only add it when the output is really needed
         - Specify model_type in CREATE commands
         - End with SYNTHESIZE
         """
@@ -465,16 +688,27 @@ class GeminiNetwork:
         perf.checkpoint("prompt_prepared")
         
         try:
-            # Get the mother node's analysis and commands
-            mother_response = await self.get_instance_response(self.mother_node, mother_prompt)
-            if not mother_response:
-                logger.warning("No response from mother node. Retrying...")
-                return "Sorry, I'm unable to process your request at this time."
-            
-            perf.checkpoint("mother_node_response")
-            
-            # Process the mother node's commands
-            results = await self.process_mother_node_command(mother_response)
+            if self.stream_commands:
+                # Run the mother node's commands while it is still generating them
+                with event_stage("planning"):
+                    mother_response, results = await self.process_mother_node_stream(
+                        self.stream_instance_response(self.mother_node, mother_prompt)
+                    )
+                if not mother_response:
+                    logger.warning("No response from mother node. Retrying...")
+                    return "Sorry, I'm unable to process your request at this time."
+            else:
+                # Get the mother node's analysis and commands
+                with event_stage("planning"):
+                    mother_response = await self.get_instance_response(self.mother_node, mother_prompt)
+                if not mother_response:
+                    logger.warning("No response from mother node. Retrying...")
+                    return "Sorry, I'm unable to process your request at this time."
+                
+                perf.checkpoint("mother_node_response")
+                
+                # Process the mother node's commands
+                results = await self.process_mother_node_command(mother_response)
             
             perf.checkpoint("commands_processed")
             
@@ -509,10 +743,50 @@ class GeminiNetwork:
                 
             return final_response
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error during mother node communication: {e}")
             return "Sorry, I'm unable to process your request at this time."
     
+    async def stream_user_input(self, user_input: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Handle user input while streaming progress events as they happen.
+        
+        Yields instance creation, task start and completion, partial response
+        text and synthesis events, followed by a final "done" event carrying
+        the same response handle_user_input would return. Closing the iterator
+        early cancels the request.
+        
+        Args:
+            user_input: The user's input text
+            
+        Yields:
+            Event dictionaries with a "type" field
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        
+        # The task copies the current context, so only it sees this sink
+        token = set_event_sink(events.put_nowait)
+        try:
+            task = asyncio.create_task(self.handle_user_input(user_input))
+        finally:
+            reset_event_sink(token)
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+                
+            response = await task
+            yield {"type": DONE, "stage": "done", "timestamp": time.time(), "response": response}
+        finally:
+            if not task.done():
+                task.cancel()
+    
     async def list_instances(self) -> Dict:
         """
         Get information about all active instances.
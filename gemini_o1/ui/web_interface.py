@@ -15,15 +15,20 @@ from threading import Thread
 from queue import Queue
 from typing import Dict, Any, List
 
-from flask import Flask, request, jsonify, send_from_directory, Response
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
 from ..models.network import GeminiNetwork
+from ..communication.call_scheduler import scheduling
+from ..communication.events import ERROR
+from ..utils.config import config
 from ..utils.logging_config import logging_config
+from ..utils.metrics import metrics_registry
+from ..utils.payload_logging import payload_log_policy
 from ..utils.health_monitor import health_monitor
-from ..utils.rate_limiter import rate_limiter
+from ..utils.rate_limiter import configure_gemini_limits, rate_limiter
 
 # Configure logging
 logger = logging_config.get_logger(__name__)
@@ -56,6 +61,9 @@ class WebInterface:
         # Communication queue for bridging sync and async
         self.queue = Queue()
         self.results = {}
+        # Running tasks by result ID, so abandoned requests can be cancelled
+        self.pending_tasks: Dict[str, asyncio.Task] = {}
+        self.request_timeout = config.get("REQUEST_TIMEOUT", 300.0) or None
         
         # Set up event loop for async operations
         self.loop = asyncio.new_event_loop()
@@ -89,8 +97,23 @@ class WebInterface:
             if not data or 'message' not in data:
                 return jsonify({'error': 'No message provided'}), 400
                 
-            result_id = self._queue_task('handle_user_input', data['message'])
-            return jsonify({'response': self._wait_for_result(result_id)})
+            result_id = self._queue_task('handle_user_input', data['message'], self._session_id(data))
+            # The request cancels itself at its deadline; the margin covers queueing
+            timeout = self.request_timeout + 5 if self.request_timeout else None
+            return jsonify({'response': self._wait_for_result(result_id, timeout=timeout)})
+            
+        @self.app.route('/api/send_message/stream', methods=['POST'])
+        @self.limiter.limit("15 per minute")
+        def send_message_stream():
+            data = request.get_json()
+            if not data or 'message' not in data:
+                return jsonify({'error': 'No message provided'}), 400
+                
+            return Response(
+                stream_with_context(self._stream_events(data['message'], self._session_id(data))),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
             
         @self.app.route('/api/instance/<instance_id>', methods=['GET'])
         def get_instance_details(instance_id):
@@ -134,6 +157,8 @@ class WebInterface:
             metrics = {
                 'api_calls': rate_limiter.get_call_metrics(),
                 'system_resources': health_monitor._get_system_metrics(),
+                'logging': {**logging_config.get_stats(), 'payloads': payload_log_policy.get_stats()},
+                'latency': metrics_registry.snapshot(),
                 'network_stats': self._queue_task('get_network_stats'),
             }
             return jsonify(metrics)
@@ -150,6 +175,19 @@ class WebInterface:
         def ratelimit_handler(e):
             return jsonify({'error': f'Rate limit exceeded: {e.description}'}), 429
             
+    @staticmethod
+    def _session_id(data):
+        """
+        Get the session a request's Gemini calls are charged to.
+        
+        Args:
+            data: The request's JSON body
+            
+        Returns:
+            The client's session ID, or its address if it sent none
+        """
+        return str(data.get('session_id') or request.remote_addr or 'anonymous')
+        
     def _queue_task(self, task_name, *args):
         """
         Queue an async task to be executed.
@@ -167,24 +205,83 @@ class WebInterface:
         
     def _wait_for_result(self, result_id, timeout=30):
         """
-        Wait for a task result.
+        Wait for a task result, cancelling the task if it takes too long.
         
         Args:
             result_id: The ID of the task result
-            timeout: Maximum time to wait in seconds
+            timeout: Maximum time to wait in seconds, or None to wait indefinitely
             
         Returns:
             The task result
         """
         start_time = time.time()
-        while time.time() - start_time < timeout:
+        while timeout is None or time.time() - start_time < timeout:
             if result_id in self.results:
                 result = self.results[result_id]
                 del self.results[result_id]
                 return result
             time.sleep(0.1)
+            
+        # Nobody is waiting for the result any more, so stop spending quota on it
+        self.loop.call_soon_threadsafe(self._cancel_task, result_id)
         return {'error': 'Operation timed out'}
         
+    def _cancel_task(self, result_id):
+        """
+        Cancel a queued task if it is still running.
+        
+        Args:
+            result_id: The ID of the task result
+        """
+        task = self.pending_tasks.get(result_id)
+        if task and not task.done():
+            logger.warning(f"Cancelling abandoned task {result_id}")
+            task.cancel()
+        
+    def _stream_events(self, message, session_id=None):
+        """
+        Stream network events for a message as Server-Sent Events.
+        
+        Args:
+            message: The user's message
+            session_id: Session the request's Gemini calls are charged to
+            
+        Yields:
+            SSE-formatted event strings
+        """
+        events = Queue()
+        future = asyncio.run_coroutine_threadsafe(self._pump_events(message, events, session_id), self.loop)
+        
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    break
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            # Stop working on the request if the client went away
+            if not future.done():
+                future.cancel()
+                
+    async def _pump_events(self, message, events, session_id=None):
+        """
+        Forward events from the network to a thread-safe queue.
+        
+        Args:
+            message: The user's message
+            events: Queue receiving events, terminated by None
+            session_id: Session the request's Gemini calls are charged to
+        """
+        try:
+            with scheduling(session=session_id):
+                async for event in self.network.stream_user_input(message):
+                    events.put(event)
+        except Exception as e:
+            logger.error(f"Error streaming message: {e}")
+            events.put({'type': ERROR, 'error': str(e), 'timestamp': time.time()})
+        finally:
+            events.put(None)
+        
     def _run_async_loop(self):
         """Run the async event loop in a separate thread."""
         asyncio.set_event_loop(self.loop)
@@ -200,44 +297,66 @@ class WebInterface:
         health_monitor.start()
         
         while True:
-            try:
-                result_id, task_name, args = self.queue.get()
-                
-                if task_name == 'handle_user_input':
-                    result = await self.network.handle_user_input(*args)
-                elif task_name == 'list_instances':
-                    result = await self.network.list_instances()
-                elif task_name == 'get_instance_details':
-                    instance_id = args[0]
-                    if instance_id in self.network.instances:
-                        result = self.network.instances[instance_id].get_status()
-                    else:
-                        result = None
-                elif task_name == 'get_network_stats':
-                    result = {
-                        'instance_count': len(self.network.instances),
-                        'total_messages': sum(len(inst.history) for inst in self.network.instances.values()),
-                        'mother_node_status': 'active' if self.network.mother_node else 'inactive',
-                        'uptime': time.time() - self.network.mother_node.created_at if self.network.mother_node else 0
-                    }
-                elif task_name == 'clear_network':
-                    await self.network.cleanup_old_instances(max_age_hours=0)
-                    result = True
-                elif task_name == 'run_health_check':
-                    check_name = args[0]
-                    if check_name in health_monitor.checks:
-                        result = await health_monitor.checks[check_name].run()
-                    else:
-                        result = {'error': f'Health check {check_name} not found'}
+            # Wait for the next task without blocking the event loop, then run it
+            # concurrently so slow requests don't hold up the rest of the queue
+            result_id, task_name, args = await self.loop.run_in_executor(None, self.queue.get)
+            task = asyncio.create_task(self._run_task(result_id, task_name, args))
+            self.pending_tasks[result_id] = task
+            task.add_done_callback(lambda _, result_id=result_id: self.pending_tasks.pop(result_id, None))
+            
+    async def _run_task(self, result_id, task_name, args):
+        """
+        Execute a single queued task and store its result.
+        
+        Args:
+            result_id: The ID under which to store the result
+            task_name: The name of the task to execute
+            args: Arguments to pass to the task
+        """
+        try:
+            if task_name == 'handle_user_input':
+                message, session_id = args
+                with scheduling(session=session_id):
+                    result = await self.network.handle_user_input(message, timeout=self.request_timeout)
+            elif task_name == 'list_instances':
+                result = await self.network.list_instances()
+            elif task_name == 'get_instance_details':
+                instance_id = args[0]
+                if instance_id in self.network.instances:
+                    result = self.network.instances[instance_id].get_status()
                 else:
-                    result = {'error': f'Unknown task: {task_name}'}
-                    
-                self.results[result_id] = result
-                
-            except Exception as e:
-                logger.error(f"Error processing task {task_name}: {e}")
-                self.results[result_id] = {'error': str(e)}
+                    result = None
+            elif task_name == 'get_network_stats':
+                response_cache = self.network.response_generator.response_cache
+                result = {
+                    'instance_count': len(self.network.instances),
+                    'total_messages': sum(len(inst.history) for inst in self.network.instances.values()),
+                    'mother_node_status': 'active' if self.network.mother_node else 'inactive',
+                    'uptime': time.time() - self.network.mother_node.created_at if self.network.mother_node else 0,
+                    'response_cache': response_cache.get_stats() if response_cache else None,
+                    'last_synthesis': self.network.last_synthesis_stats,
+                    'scheduler': self.network.response_generator.scheduler.get_stats(),
+                    'hedging': self.network.response_generator.get_hedging_stats(),
+                    'circuit_breakers': self.network.response_generator.get_circuit_breaker_stats()
+                }
+            elif task_name == 'clear_network':
+                await self.network.cleanup_old_instances(max_age_hours=0)
+                result = True
+            elif task_name == 'run_health_check':
+                check_name = args[0]
+                if check_name in health_monitor.checks:
+                    result = await health_monitor.checks[check_name].run()
+                else:
+                    result = {'error': f'Health check {check_name} not found'}
+            else:
+                result = {'error': f'Unknown task: {task_name}'}
                 
+            self.results[result_id] = result
+            
+        except Exception as e:
+            logger.error(f"Error processing task {task_name}: {e}")
+            self.results[result_id] = {'error': str(e)}
+            
     def start(self):
         """Start the web interface."""
         self.app.run(host=self.host, port=self.port)
@@ -258,7 +377,7 @@ def run_web_interface():
     logger.info("Starting Gemini-O1 Web Interface")
     
     # Configure rate limiter
-    rate_limiter.configure_endpoint("gemini_api", 15, 1/4, 5)  # 15 calls per minute
+    configure_gemini_limits(rate_limiter)
     rate_limiter.configure_endpoint("embeddings_api", 60, 1, 3)  # 60 calls per minute
     
     web = WebInterface()
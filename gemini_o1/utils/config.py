@@ -37,14 +37,65 @@ class Config:
         "LOG_LEVEL": "INFO",
         "LOG_FILE": "app.log",
         "ENABLE_REQUEST_TRACKING": True,
+        "ASYNC_LOGGING": False,
+        "LOG_QUEUE_SIZE": 10000,
+        "LOG_OVERFLOW_POLICY": "drop_new",
+        "LOG_PAYLOAD_MAX_CHARS": 200,
+        "LOG_PAYLOAD_HASH": True,
+        "LOG_PAYLOAD_SAMPLE_RATES": "",
+        "LOG_FULL_PAYLOADS": False,
         
         # Rate limiting
         "RATE_LIMIT_MAX_CALLS": 15,
         "RATE_LIMIT_PERIOD": 60,
+        "MODEL_RATE_LIMITS": "",
+        "TOKEN_LIMIT_PER_MINUTE": 1000000,
+        "MODEL_TOKEN_LIMITS": "",
+        "ADAPTIVE_RATE_LIMIT": False,
+        "ADAPTIVE_RATE_CEILING": 2.0,
+        "RATE_LIMIT_BACKEND": "memory",
+        "RATE_LIMIT_DB_PATH": "~/.cache/gemini_o1/rate_limits.db",
+        "SCHEDULER_CONCURRENCY": 1,
+        "RETRY_MAX_ATTEMPTS": 5,
+        "RETRY_INITIAL_DELAY": 1.0,
+        "RETRY_MAX_DELAY": 20.0,
+        "RETRY_DEADLINE": 120.0,
+        "GEMINI_CALL_TIMEOUT": 60.0,
+        "REQUEST_TIMEOUT": 300.0,
+        "RETRY_BUDGET_RATIO": 0.2,
+        "HEDGE_REQUESTS": False,
+        "HEDGE_QUOTA_FRACTION": 0.1,
+        "HEDGE_MIN_SAMPLES": 20,
+        "CIRCUIT_BREAKER_FAILURES": 5,
+        "CIRCUIT_BREAKER_RESET": 30.0,
+        "CIRCUIT_BREAKER_FALLBACK": True,
+        
+        # Concurrency
+        "API_MAX_CONCURRENCY": 8,
+        "MAX_PARALLEL_TASKS": 4,
+        "INFER_TASK_DEPENDENCIES": True,
+        "STREAM_COMMANDS": False,
         
         # Model configuration
         "DEFAULT_MODEL": "gemini-1.5-flash",
         "THINKING_MODEL": "gemini-2.0-flash-thinking-exp",
+        "MODEL_CACHE_SIZE": 32,
+        "CONTEXT_TOKEN_BUDGET": 8000,
+        "CONTEXT_TOKEN_BUDGETS": "",
+        
+        # History compaction
+        "HISTORY_COMPACTION_TOKENS": 6000,
+        "HISTORY_KEEP_RECENT": 4,
+        "HISTORY_SUMMARY_TOKENS": 500,
+        "HISTORY_SUMMARY_MODE": "extractive",
+        "TRANSCRIPT_ARCHIVE_DIR": "~/.cache/gemini_o1/transcripts",
+        "SYNTHESIS_SUMMARY_TOKENS": 500,
+        
+        # Response caching
+        "RESPONSE_CACHE_BACKEND": "none",
+        "RESPONSE_CACHE_SIZE": 256,
+        "RESPONSE_CACHE_TTL": 3600,
+        "RESPONSE_CACHE_PATH": "~/.cache/gemini_o1/responses.db",
         
         # UI settings
         "WINDOW_TITLE": "Gemini Chat Interface",
@@ -60,8 +111,53 @@ class Config:
         "LOG_LEVEL": str,
         "LOG_FILE": str,
         "ENABLE_REQUEST_TRACKING": bool,
+        "ASYNC_LOGGING": bool,
+        "LOG_QUEUE_SIZE": int,
+        "LOG_OVERFLOW_POLICY": str,
+        "LOG_PAYLOAD_MAX_CHARS": int,
+        "LOG_PAYLOAD_HASH": bool,
+        "LOG_PAYLOAD_SAMPLE_RATES": str,
+        "LOG_FULL_PAYLOADS": bool,
         "RATE_LIMIT_MAX_CALLS": int,
         "RATE_LIMIT_PERIOD": int,
+        "MODEL_RATE_LIMITS": str,
+        "TOKEN_LIMIT_PER_MINUTE": int,
+        "MODEL_TOKEN_LIMITS": str,
+        "ADAPTIVE_RATE_LIMIT": bool,
+        "ADAPTIVE_RATE_CEILING": float,
+        "RATE_LIMIT_BACKEND": str,
+        "RATE_LIMIT_DB_PATH": str,
+        "SCHEDULER_CONCURRENCY": int,
+        "RETRY_MAX_ATTEMPTS": int,
+        "RETRY_INITIAL_DELAY": float,
+        "RETRY_MAX_DELAY": float,
+        "RETRY_DEADLINE": float,
+        "GEMINI_CALL_TIMEOUT": float,
+        "REQUEST_TIMEOUT": float,
+        "RETRY_BUDGET_RATIO": float,
+        "HEDGE_REQUESTS": bool,
+        "HEDGE_QUOTA_FRACTION": float,
+        "HEDGE_MIN_SAMPLES": int,
+        "CIRCUIT_BREAKER_FAILURES": int,
+        "CIRCUIT_BREAKER_RESET": float,
+        "CIRCUIT_BREAKER_FALLBACK": bool,
+        "API_MAX_CONCURRENCY": int,
+        "MAX_PARALLEL_TASKS": int,
+        "INFER_TASK_DEPENDENCIES": bool,
+        "STREAM_COMMANDS": bool,
+        "MODEL_CACHE_SIZE": int,
+        "CONTEXT_TOKEN_BUDGET": int,
+        "CONTEXT_TOKEN_BUDGETS": str,
+        "HISTORY_COMPACTION_TOKENS": int,
+        "HISTORY_KEEP_RECENT": int,
+        "HISTORY_SUMMARY_TOKENS": int,
+        "HISTORY_SUMMARY_MODE": str,
+        "TRANSCRIPT_ARCHIVE_DIR": str,
+        "SYNTHESIS_SUMMARY_TOKENS": int,
+        "RESPONSE_CACHE_BACKEND": str,
+        "RESPONSE_CACHE_SIZE": int,
+        "RESPONSE_CACHE_TTL": int,
+        "RESPONSE_CACHE_PATH": str,
         "DEFAULT_WIDTH": int,
         "DEFAULT_HEIGHT": int
     }
@@ -113,6 +209,51 @@ class Config:
         if self._config["RATE_LIMIT_PERIOD"] <= 0:
             raise ConfigurationError("RATE_LIMIT_PERIOD must be a positive integer")
             
+        if self._config["API_MAX_CONCURRENCY"] <= 0:
+            raise ConfigurationError("API_MAX_CONCURRENCY must be a positive integer")
+            
+        if self._config["MAX_PARALLEL_TASKS"] <= 0:
+            raise ConfigurationError("MAX_PARALLEL_TASKS must be a positive integer")
+            
+        if self._config["RETRY_MAX_ATTEMPTS"] <= 0:
+            raise ConfigurationError("RETRY_MAX_ATTEMPTS must be a positive integer")
+            
+        if not 0 <= self._config["HEDGE_QUOTA_FRACTION"] <= 1:
+            raise ConfigurationError("HEDGE_QUOTA_FRACTION must be between 0 and 1")
+            
+        if self._config["CIRCUIT_BREAKER_FAILURES"] <= 0:
+            raise ConfigurationError("CIRCUIT_BREAKER_FAILURES must be a positive integer")
+            
+        if self._config["SCHEDULER_CONCURRENCY"] <= 0:
+            raise ConfigurationError("SCHEDULER_CONCURRENCY must be a positive integer")
+            
+        if self._config["MODEL_CACHE_SIZE"] <= 0:
+            raise ConfigurationError("MODEL_CACHE_SIZE must be a positive integer")
+            
+        if self._config["CONTEXT_TOKEN_BUDGET"] <= 0:
+            raise ConfigurationError("CONTEXT_TOKEN_BUDGET must be a positive integer")
+            
+        if self._config["HISTORY_SUMMARY_MODE"] not in ("extractive", "model"):
+            raise ConfigurationError("HISTORY_SUMMARY_MODE must be either 'extractive' or 'model'")
+            
+        if self._config["LOG_QUEUE_SIZE"] <= 0:
+            raise ConfigurationError("LOG_QUEUE_SIZE must be a positive integer")
+            
+        if self._config["LOG_OVERFLOW_POLICY"].lower() not in ("drop_new", "drop_oldest", "block"):
+            raise ConfigurationError("LOG_OVERFLOW_POLICY must be one of: drop_new, drop_oldest, block")
+            
+        if self._config["LOG_PAYLOAD_MAX_CHARS"] < 0:
+            raise ConfigurationError("LOG_PAYLOAD_MAX_CHARS must not be negative")
+            
+        if self._config["RATE_LIMIT_BACKEND"].lower() not in ("memory", "sqlite"):
+            raise ConfigurationError("RATE_LIMIT_BACKEND must be one of: memory, sqlite")
+            
+        if self._config["RESPONSE_CACHE_BACKEND"].lower() not in ("none", "memory", "sqlite"):
+            raise ConfigurationError("RESPONSE_CACHE_BACKEND must be one of: none, memory, sqlite")
+            
+        if self._config["RESPONSE_CACHE_SIZE"] <= 0:
+            raise ConfigurationError("RESPONSE_CACHE_SIZE must be a positive integer")
+            
     def get(self, key: str, default: Any = None) -> Any:
         """
         Get a configuration value.
@@ -169,6 +310,43 @@ class Config:
             return self._config["THINKING_MODEL"]
         return self._config["DEFAULT_MODEL"]
         
+    def get_int_mapping(self, key: str) -> Dict[str, int]:
+        """
+        Get a setting holding comma separated ``name=value`` integer pairs.
+        
+        Args:
+            key: The configuration key
+            
+        Returns:
+            Dictionary mapping names to integer values
+        """
+        return self._get_mapping(key, int)
+        
+    def get_float_mapping(self, key: str) -> Dict[str, float]:
+        """
+        Get a setting holding comma separated ``name=value`` number pairs.
+        
+        Args:
+            key: The configuration key
+            
+        Returns:
+            Dictionary mapping names to float values
+        """
+        return self._get_mapping(key, float)
+        
+    def _get_mapping(self, key: str, value_type: type) -> Dict[str, Any]:
+        """Parse a setting holding comma separated ``name=value`` pairs."""
+        mapping = {}
+        for item in (self._config.get(key) or "").split(","):
+            if "=" not in item:
+                continue
+            name, value = item.split("=", 1)
+            try:
+                mapping[name.strip()] = value_type(value)
+            except ValueError:
+                logger.warning(f"Ignoring invalid value in {key} for {name.strip()}: {value}")
+        return mapping
+        
     def get_rate_limit_config(self) -> Dict[str, int]:
         """
         Get the rate limit configuration.
@@ -0,0 +1,86 @@
+"""
+Deadlines that flow from a request down to every call it makes.
+
+A deadline set with the deadline() context manager applies to everything
+awaited within it, including asyncio tasks created there, which inherit the
+context. Nested deadlines can only shorten the one in force.
+"""
+
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar('T')
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs past its deadline."""
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Require work within the block to finish within a number of seconds.
+
+    Args:
+        seconds: Time allowed from now, or None to keep the current deadline
+    """
+    if seconds is None:
+        yield
+        return
+
+    expires_at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires_at if current is None else min(current, expires_at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Get the time left before the current deadline.
+
+    Returns:
+        Seconds left (negative once passed), or None if there is no deadline
+    """
+    expires_at = _deadline.get()
+    return None if expires_at is None else expires_at - time.monotonic()
+
+
+async def run_with_deadline(awaitable: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    Await something, cancelling it at the current deadline or after a timeout.
+
+    Args:
+        awaitable: The coroutine or future to await
+        timeout: Optional limit for this call alone, in seconds
+
+    Returns:
+        The awaited result
+
+    Raises:
+        DeadlineExceeded: If the current deadline passed first
+        asyncio.TimeoutError: If the call's own timeout passed first
+    """
+    left = remaining()
+    if left is None and timeout is None:
+        return await awaitable
+
+    if left is not None and left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded("Request deadline exceeded")
+
+    limit = timeout if left is None else left if timeout is None else min(left, timeout)
+    try:
+        return await asyncio.wait_for(awaitable, limit)
+    except asyncio.TimeoutError:
+        if left is not None and remaining() <= 0:
+            raise DeadlineExceeded("Request deadline exceeded") from None
+        raise
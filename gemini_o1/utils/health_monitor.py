@@ -384,6 +384,30 @@ async def check_api_connectivity() -> Dict[str, Any]:
             "data": {"error": str(e)}
         }
         
+async def check_circuit_breakers() -> Dict[str, Any]:
+    """
+    Check whether any model's circuit breaker is refusing calls.
+    
+    Returns:
+        Health check result
+    """
+    from ..communication.circuit_breaker import CLOSED, circuit_breakers
+    
+    states = circuit_breakers.get_states()
+    tripped = sorted(model for model, state in states.items() if state["state"] != CLOSED)
+    if tripped:
+        return {
+            "status": HealthStatus.DEGRADED.value,
+            "message": f"Circuit breaker open for {', '.join(tripped)}",
+            "data": states
+        }
+        
+    return {
+        "status": HealthStatus.HEALTHY.value,
+        "message": "All model circuit breakers are closed",
+        "data": states
+    }
+        
 async def check_system_resources() -> Dict[str, Any]:
     """
     Check if system resources are sufficient.
@@ -433,6 +457,14 @@ api_check = HealthCheck(
     description="Checks connectivity to the Gemini API"
 )
 
+circuit_breaker_check = HealthCheck(
+    name="circuit_breakers",
+    check_type=CheckType.API,
+    check_fn=check_circuit_breakers,
+    interval_seconds=15,
+    description="Checks whether calls to any Gemini model are being refused"
+)
+
 system_check = HealthCheck(
     name="system_resources",
     check_type=CheckType.SYSTEM,
@@ -442,4 +474,5 @@ system_check = HealthCheck(
 )
 
 health_monitor.register_check(api_check)
+health_monitor.register_check(circuit_breaker_check)
 health_monitor.register_check(system_check)
\ No newline at end of file
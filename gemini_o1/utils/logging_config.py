@@ -3,16 +3,28 @@ Logging configuration for the Gemini-O1 application.
 
 This module provides structured logging with request ID tracking, 
 colored console output, and file output with rotation.
+
+Request and span IDs live in context variables, so concurrent requests and
+the specialist calls within them each log with their own IDs. Tasks created
+inside a request or span inherit its IDs.
 """
 
+import atexit
+import contextvars
+import copy
 import logging
 import logging.handlers
 import os
+import queue
+import threading
 import uuid
 import json
 import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, Optional, Any, Union
+from typing import Dict, Iterator, Optional, Any, Tuple, Union
+
+from .metrics import MetricsRegistry, metrics_registry
 
 # Try to import colorlog if available
 try:
@@ -21,8 +33,93 @@ try:
 except ImportError:
     HAS_COLORLOG = False
 
+# Use orjson for structured logs if available
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+if HAS_ORJSON:
+    def _encode_json(value: Any) -> str:
+        return orjson.dumps(value, default=str).decode()
+else:
+    _encode_json = json.JSONEncoder(default=str).encode
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+_span_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("span_id", default=None)
+
+
+def new_request_id() -> str:
+    """Generate a new request ID."""
+    return str(uuid.uuid4())
+
+
+def current_request_id() -> Optional[str]:
+    """Get the request ID of the current context, if any."""
+    return _request_id.get()
+
+
+def current_span_id() -> Optional[str]:
+    """Get the span ID of the current context, if any."""
+    return _span_id.get()
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Log everything within the block under one request ID.
+    
+    Args:
+        request_id: The request ID to use, or None to generate a new one
+        
+    Yields:
+        The request ID
+    """
+    request_id = request_id or new_request_id()
+    request_token = _request_id.set(request_id)
+    span_token = _span_id.set(None)
+    try:
+        yield request_id
+    finally:
+        _span_id.reset(span_token)
+        _request_id.reset(request_token)
+
+
+@contextmanager
+def log_span(name: str) -> Iterator[str]:
+    """
+    Log everything within the block under a span of the current request.
+    
+    Nested spans extend the enclosing span's ID, e.g. "mother/writer".
+    
+    Args:
+        name: Name of the span, such as an instance ID
+        
+    Yields:
+        The span ID
+    """
+    parent = _span_id.get()
+    span_id = f"{parent}/{name}" if parent else name
+    token = _span_id.set(span_id)
+    try:
+        yield span_id
+    finally:
+        _span_id.reset(token)
+
 class StructuredLogFormatter(logging.Formatter):
-    """JSON formatter for structured logging."""
+    """
+    JSON formatter for structured logging.
+    
+    Records are formatted on every log call, so the parts that repeat between
+    records are encoded once and reused: the fields describing where a record
+    was logged, and the timestamp up to the second. orjson is used to encode
+    the rest when it is installed.
+    """
+    
+    # Fields every record has; extra data may not replace them on the fast path
+    BASE_FIELDS = frozenset(("timestamp", "level", "name", "message", "module", "function", "line"))
+    MAX_CACHED_SITES = 1024
     
     def __init__(self, include_request_id: bool = True):
         """
@@ -33,6 +130,9 @@ class StructuredLogFormatter(logging.Formatter):
         """
         super().__init__()
         self.include_request_id = include_request_id
+        self._sites: Dict[tuple, Tuple[str, str]] = {}
+        self._second: Optional[int] = None
+        self._second_prefix = ""
         
     def format(self, record: logging.LogRecord) -> str:
         """
@@ -44,47 +144,178 @@ class StructuredLogFormatter(logging.Formatter):
         Returns:
             JSON-formatted log message
         """
-        log_data = {
-            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
-            "level": record.levelname,
-            "name": record.name,
-            "message": record.getMessage(),
-            "module": record.module,
-            "function": record.funcName,
-            "line": record.lineno
-        }
+        extra: Dict[str, Any] = {}
         
         # Add request ID if available and enabled
         if self.include_request_id and hasattr(record, 'request_id'):
-            log_data["request_id"] = record.request_id
+            extra["request_id"] = record.request_id
+            extra["span_id"] = getattr(record, 'span_id', None)
             
         # Add exception info if available
         if record.exc_info:
-            log_data["exception"] = {
+            extra["exception"] = {
                 "type": record.exc_info[0].__name__,
                 "message": str(record.exc_info[1]),
                 "traceback": self.formatException(record.exc_info)
             }
             
         # Add custom fields if available
-        if hasattr(record, 'data') and isinstance(record.data, dict):
-            log_data.update(record.data)
+        data = getattr(record, 'data', None)
+        if isinstance(data, dict):
+            if not self.BASE_FIELDS.isdisjoint(data):
+                return _encode_json({**self._base_fields(record), **extra, **data})
+            extra.update(data)
+            
+        head, tail = self._site_fields(record)
+        parts = ['{"timestamp":"', self._timestamp(record.created), head, _encode_json(record.getMessage()), tail]
+        if extra:
+            parts.append(",")
+            parts.append(_encode_json(extra)[1:])
+        else:
+            parts.append("}")
+        return "".join(parts)
+        
+    def _site_fields(self, record: logging.LogRecord) -> Tuple[str, str]:
+        """Get the encoded fields before and after the message for where a record was logged."""
+        key = (record.levelname, record.name, record.module, record.funcName, record.lineno)
+        fields = self._sites.get(key)
+        if fields is None:
+            if len(self._sites) >= self.MAX_CACHED_SITES:
+                self._sites.clear()
+            head = f'","level":{_encode_json(record.levelname)},"name":{_encode_json(record.name)},"message":'
+            tail = (
+                f',"module":{_encode_json(record.module)},"function":{_encode_json(record.funcName)},'
+                f'"line":{_encode_json(record.lineno)}'
+            )
+            fields = self._sites[key] = (head, tail)
+        return fields
+        
+    def _timestamp(self, created: float) -> str:
+        """Get the ISO timestamp of a record, reusing the date and time up to the second."""
+        second = int(created)
+        if second != self._second:
+            self._second_prefix = datetime.fromtimestamp(second).isoformat()
+            self._second = second
+        return f"{self._second_prefix}.{int((created - second) * 1000000):06d}"
+        
+    def _base_fields(self, record: logging.LogRecord) -> Dict[str, Any]:
+        return {
+            "timestamp": self._timestamp(record.created),
+            "level": record.levelname,
+            "name": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno
+        }
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that never blocks the logging thread on a full queue.
+    
+    Records are handed to a QueueListener that writes them from a background
+    thread. When the queue is full, the overflow policy decides what happens:
+    "drop_new" discards the incoming record, "drop_oldest" discards the oldest
+    queued record to make room, and "block" waits for room.
+    """
+    
+    POLICIES = ("drop_new", "drop_oldest", "block")
+    
+    def __init__(self, queue_size: int = 10000, overflow_policy: str = "drop_new"):
+        """
+        Initialize the handler with a bounded queue.
+        
+        Args:
+            queue_size: Most records waiting to be written
+            overflow_policy: One of "drop_new", "drop_oldest" or "block"
+        """
+        overflow_policy = overflow_policy.lower()
+        if overflow_policy not in self.POLICIES:
+            raise ValueError(f"Unknown log overflow policy: {overflow_policy}")
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.overflow_policy = overflow_policy
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Render the message now, as its arguments may change once queued.
+        
+        Unlike the base class, the exception info is kept so formatters in the
+        writer thread can still report it.
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+        
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Queue a record, applying the overflow policy if the queue is full."""
+        if self.overflow_policy == "block":
+            self.queue.put(record)
+            return
             
-        return json.dumps(log_data)
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            if self.overflow_policy == "drop_new":
+                self._count_dropped()
+                return
+                
+        # Make room by dropping the oldest record
+        while True:
+            try:
+                self.queue.get_nowait()
+                self._count_dropped()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                continue
+                
+    def _count_dropped(self) -> None:
+        with self._dropped_lock:
+            self.dropped += 1
+            
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get queue statistics.
+        
+        Returns:
+            Dictionary with the queued and dropped record counts
+        """
+        return {
+            "queued": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "overflow_policy": self.overflow_policy,
+            "dropped": self.dropped
+        }
+
 
 class LoggingConfig:
     """Configure logging for the application."""
     
     DEFAULT_FORMAT = '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
-    REQUEST_FORMAT = '%(asctime)s [%(levelname)s] [%(request_id)s] %(name)s: %(message)s'
+    REQUEST_FORMAT = '%(asctime)s [%(levelname)s] [%(request_id)s %(span_id)s] %(name)s: %(message)s'
     COLOR_FORMAT = '%(log_color)s%(asctime)s [%(levelname)s] %(name)s:%(reset)s %(message)s'
-    COLOR_REQUEST_FORMAT = '%(log_color)s%(asctime)s [%(levelname)s] [%(request_id)s] %(name)s:%(reset)s %(message)s'
+    COLOR_REQUEST_FORMAT = '%(log_color)s%(asctime)s [%(levelname)s] [%(request_id)s %(span_id)s] %(name)s:%(reset)s %(message)s'
     
     def __init__(self):
         """Initialize logging configuration."""
-        self.request_id = None
         self.loggers = {}
         self.structured_logging = False
+        self.queue_handler: Optional[BoundedQueueHandler] = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        
+    @property
+    def request_id(self) -> Optional[str]:
+        """The request ID of the current context."""
+        return _request_id.get()
         
     def setup_logging(
         self,
@@ -94,7 +325,8 @@ class LoggingConfig:
         enable_request_tracking: Optional[bool] = None,
         enable_structured_logging: bool = False,
         max_log_size_mb: int = 10,
-        backup_count: int = 5
+        backup_count: int = 5,
+        async_logging: Optional[bool] = None
     ) -> None:
         """
         Set up logging for the application.
@@ -107,6 +339,7 @@ class LoggingConfig:
             enable_structured_logging: Whether to use JSON structured logging
             max_log_size_mb: Maximum log file size in MB before rotation
             backup_count: Number of backup logs to keep
+            async_logging: Whether to write logs from a background thread (defaults to config value)
         """
         # Get config values
         from .config import config
@@ -121,6 +354,9 @@ class LoggingConfig:
         if enable_request_tracking is None:
             enable_request_tracking = config.get("ENABLE_REQUEST_TRACKING", True)
             
+        if async_logging is None:
+            async_logging = config.get("ASYNC_LOGGING", False)
+            
         self.structured_logging = enable_structured_logging
         
         # Choose the appropriate format
@@ -144,14 +380,16 @@ class LoggingConfig:
             file_handler = logging.handlers.RotatingFileHandler(
                 log_file,
                 maxBytes=max_log_size_mb * 1024 * 1024,
-                backupCount=backup_count
+                backupCount=backup_count,
+                encoding="utf-8"
             )
             file_handler.setFormatter(StructuredLogFormatter(enable_request_tracking))
         else:
             file_handler = logging.handlers.RotatingFileHandler(
                 log_file,
                 maxBytes=max_log_size_mb * 1024 * 1024,
-                backupCount=backup_count
+                backupCount=backup_count,
+                encoding="utf-8"
             )
             file_handler.setFormatter(logging.Formatter(log_format))
             
@@ -182,16 +420,51 @@ class LoggingConfig:
         root_logger.setLevel(level)
         
         # Remove existing handlers to avoid duplication
+        self.shutdown()
         for handler in root_logger.handlers[:]:
             root_logger.removeHandler(handler)
             
-        # Add our handlers
+        # In async mode the caller only queues records and a listener thread
+        # formats and writes them
+        if async_logging:
+            self.queue_handler = BoundedQueueHandler(
+                config.get("LOG_QUEUE_SIZE", 10000),
+                config.get("LOG_OVERFLOW_POLICY", "drop_new")
+            )
+            self.listener = logging.handlers.QueueListener(
+                self.queue_handler.queue, *handlers, respect_handler_level=True
+            )
+            self.listener.start()
+            handlers = [self.queue_handler]
+            
+        # Add our handlers, tagging records with the current request and span
+        # in the thread that logged them
         for handler in handlers:
+            if enable_request_tracking:
+                handler.addFilter(RequestContextFilter())
             root_logger.addHandler(handler)
             
-        # Create a new request ID if tracking is enabled
-        if enable_request_tracking:
-            self.request_id = str(uuid.uuid4())
+    def shutdown(self) -> None:
+        """Stop the async log writer, flushing the records still queued."""
+        if self.listener is not None:
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
+        if self.queue_handler is not None:
+            logging.getLogger().removeHandler(self.queue_handler)
+            self.queue_handler = None
+            
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get logging pipeline statistics.
+        
+        Returns:
+            Dictionary with whether logging is async and the queue's counters
+        """
+        if self.queue_handler is None:
+            return {"async": False}
+        return {"async": True, **self.queue_handler.get_stats()}
             
     def get_logger(self, name: str) -> logging.Logger:
         """
@@ -207,32 +480,20 @@ class LoggingConfig:
             return self.loggers[name]
             
         logger = logging.getLogger(name)
-        
-        # Add context filter for request ID if tracking is enabled
-        if self.request_id:
-            logger.addFilter(RequestContextFilter(self.request_id))
-            
         self.loggers[name] = logger
         return logger
         
     def set_request_id(self, request_id: Optional[str] = None) -> None:
         """
-        Set the request ID for the current context.
+        Set the request ID for the rest of the current context.
+        
+        Prefer request_context(), which restores the previous ID afterwards.
         
         Args:
             request_id: The request ID to use, or None to generate a new one
         """
-        self.request_id = request_id or str(uuid.uuid4())
-        
-        # Update existing loggers
-        for logger in self.loggers.values():
-            # Remove existing RequestContextFilters
-            for filter in logger.filters[:]:
-                if isinstance(filter, RequestContextFilter):
-                    logger.removeFilter(filter)
-            
-            # Add new RequestContextFilter
-            logger.addFilter(RequestContextFilter(self.request_id))
+        _request_id.set(request_id or new_request_id())
+        _span_id.set(None)
             
     def log_with_data(self, logger: logging.Logger, level: int, msg: str, data: Dict[str, Any]) -> None:
         """
@@ -261,37 +522,48 @@ class LoggingConfig:
 
 
 class RequestContextFilter(logging.Filter):
-    """Filter that adds request ID to log records."""
+    """Filter that adds the current request and span IDs to log records."""
     
-    def __init__(self, request_id: str):
-        """
-        Initialize the filter with a request ID.
-        
-        Args:
-            request_id: The request ID to add to log records
-        """
-        super().__init__()
-        self.request_id = request_id
-        
     def filter(self, record):
-        """Add request_id field to the log record."""
-        record.request_id = self.request_id
+        """Add request_id and span_id fields to the log record."""
+        # Records tagged in the thread that queued them keep their IDs
+        if not hasattr(record, 'request_id'):
+            record.request_id = _request_id.get() or "-"
+        if not hasattr(record, 'span_id'):
+            record.span_id = _span_id.get() or "-"
         return True
 
 
 class PerformanceTracker:
-    """Utility to track and log performance metrics."""
+    """
+    Utility to track and log performance metrics.
+    
+    Timings are also recorded in a metrics registry, as a histogram per
+    operation and label set with a "phase" label for the total and each
+    checkpoint. Labels should have few distinct values; identify the
+    instance in the operation's log span rather than in its labels.
+    """
     
-    def __init__(self, logger: logging.Logger, operation_name: str):
+    def __init__(
+        self, 
+        logger: logging.Logger, 
+        operation_name: str,
+        labels: Optional[Dict[str, Any]] = None,
+        registry: Optional[MetricsRegistry] = None
+    ):
         """
         Initialize the performance tracker.
         
         Args:
             logger: The logger to use
             operation_name: Name of the operation being tracked
+            labels: Optional labels for the recorded timings, e.g. {"model": "gemini-1.5-flash"}
+            registry: Metrics registry to record timings in (defaults to the global one)
         """
         self.logger = logger
         self.operation_name = operation_name
+        self.labels = labels or {}
+        self.registry = registry if registry is not None else metrics_registry
         self.start_time = None
         self.checkpoints = {}
         
@@ -337,9 +609,16 @@ class PerformanceTracker:
             "total_seconds": round(total_time, 4)
         }
         
+        if self.labels:
+            timing_data["labels"] = self.labels
+            
         if self.checkpoints:
             timing_data["checkpoints"] = {k: round(v, 4) for k, v in self.checkpoints.items()}
             
+        self.registry.observe(self.operation_name, total_time, {**self.labels, "phase": "total"})
+        for name, elapsed in self.checkpoints.items():
+            self.registry.observe(self.operation_name, elapsed, {**self.labels, "phase": name})
+            
         self.logger.log(
             log_level, 
             f"Performance: {self.operation_name} completed in {total_time:.4f}s", 
@@ -350,4 +629,7 @@ class PerformanceTracker:
 
 
 # Global logging configuration instance
-logging_config = LoggingConfig()
\ No newline at end of file
+logging_config = LoggingConfig()
+
+# Flush queued records when the process exits
+atexit.register(logging_config.shutdown)
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""
+In-process latency metrics.
+
+Timings are aggregated into fixed-bucket histograms per operation and label
+set, so percentiles can be read at any time without parsing logs. Recording a
+value is a bucket lookup and a few additions, and a snapshot only walks the
+bucket counts.
+
+Label values are bounded per metric: once a label has seen its maximum number
+of distinct values, new values are recorded as "other", so labels derived
+from instance IDs or other open-ended values can't grow the registry without
+limit.
+"""
+
+import math
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+# Bucket upper bounds in seconds, from fast local work to slow model calls
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+OVERFLOW_LABEL = "other"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Counts of observed values in fixed buckets.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Initialize the histogram.
+
+        Args:
+            buckets: Increasing bucket upper bounds; larger values go in an overflow bucket
+        """
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float) -> None:
+        """
+        Record a value.
+
+        Args:
+            value: The observed value
+        """
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Estimate a percentile by interpolating within its bucket.
+
+        Args:
+            fraction: The percentile as a fraction, e.g. 0.95
+
+        Returns:
+            The estimated value, or None if nothing was observed
+        """
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get summary statistics.
+
+        Returns:
+            Dictionary with the count, sum, mean, extremes and p50/p95/p99
+        """
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "mean": round(self.sum / self.count, 4),
+            "min": round(self.min, 4),
+            "max": round(self.max, 4),
+            "p50": round(self.percentile(0.5), 4),
+            "p95": round(self.percentile(0.95), 4),
+            "p99": round(self.percentile(0.99), 4)
+        }
+
+
+class MetricsRegistry:
+    """
+    Histograms per metric name and label set.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, max_label_values: int = 32):
+        """
+        Initialize the registry.
+
+        Args:
+            buckets: Bucket upper bounds for new histograms
+            max_label_values: Distinct values kept per label of a metric before collapsing to "other"
+        """
+        self.buckets = tuple(buckets)
+        self.max_label_values = max_label_values
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._label_values: Dict[Tuple[str, str], Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def _bound_labels(self, name: str, labels: Optional[Dict[str, Any]]) -> LabelKey:
+        if not labels:
+            return ()
+        bounded = []
+        for key, value in sorted(labels.items()):
+            value = str(value)
+            seen = self._label_values.setdefault((name, key), set())
+            if value not in seen:
+                if len(seen) >= self.max_label_values:
+                    value = OVERFLOW_LABEL
+                else:
+                    seen.add(value)
+            bounded.append((key, value))
+        return tuple(bounded)
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Record a value for a metric.
+
+        Args:
+            name: The metric name, e.g. an operation name
+            value: The observed value, in seconds for timings
+            labels: Optional labels, e.g. {"model": "gemini-1.5-flash"}
+        """
+        with self._lock:
+            label_key = self._bound_labels(name, labels)
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(label_key)
+            if histogram is None:
+                histogram = series[label_key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Get summary statistics of every metric.
+
+        Returns:
+            Dictionary mapping metric names to a list of series, each with its
+            labels and statistics
+        """
+        with self._lock:
+            return {
+                name: [{"labels": dict(label_key), **histogram.snapshot()} for label_key, histogram in series.items()]
+                for name, series in self._histograms.items()
+            }
+
+    def reset(self) -> None:
+        """Drop all recorded metrics."""
+        with self._lock:
+            self._histograms.clear()
+            self._label_values.clear()
+
+
+# Global metrics registry
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,171 @@
+"""
+Logging policy for prompts, responses and other large payloads.
+
+Payloads are logged as a short preview with their length and a content hash,
+so log files stay small while identical payloads can still be matched up.
+Each category of payload can be sampled at its own rate. Complete payloads
+are logged only when LOG_FULL_PAYLOADS is enabled for debugging.
+"""
+
+import hashlib
+import logging
+import random
+import threading
+from typing import Any, Dict, Optional
+
+from .config import config
+
+# Payload categories
+PROMPT = "prompt"
+RESPONSE = "response"
+COMMAND = "command"
+COMMAND_RESULT = "command_result"
+USER_INPUT = "user_input"
+
+
+class PayloadLogPolicy:
+    """
+    Decides whether and how much of a payload is logged.
+    """
+
+    def __init__(
+        self,
+        max_chars: int = 200,
+        hash_payloads: bool = True,
+        sample_rates: Optional[Dict[str, float]] = None,
+        full_payloads: bool = False
+    ):
+        """
+        Initialize the policy.
+
+        Args:
+            max_chars: Characters of each payload kept as a preview (0 for none)
+            hash_payloads: Whether to log a hash and length of each payload
+            sample_rates: Fraction of payloads logged per category, 1.0 for unlisted ones
+            full_payloads: Whether to log payloads in full, ignoring the other settings
+        """
+        self.max_chars = max_chars
+        self.hash_payloads = hash_payloads
+        self.sample_rates = sample_rates or {}
+        self.full_payloads = full_payloads
+        self.sampled_out: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def should_log(self, category: str) -> bool:
+        """
+        Sample whether a payload of a category is logged.
+
+        Args:
+            category: The payload category
+
+        Returns:
+            True if the payload should be logged
+        """
+        rate = self.sample_rates.get(category, 1.0)
+        if self.full_payloads or rate >= 1 or random.random() < rate:
+            return True
+        with self._lock:
+            self.sampled_out[category] = self.sampled_out.get(category, 0) + 1
+        return False
+
+    def describe(self, payload: Any) -> str:
+        """
+        Render a payload for a log message.
+
+        Args:
+            payload: The payload, converted to a string if needed
+
+        Returns:
+            The payload, or a preview with its length and hash
+        """
+        text = payload if isinstance(payload, str) else str(payload)
+        if self.full_payloads:
+            return text
+
+        parts = []
+        if self.max_chars:
+            preview = text[:self.max_chars]
+            parts.append(preview + ("..." if len(text) > self.max_chars else ""))
+        if self.hash_payloads:
+            parts.append(f"[{len(text)} chars, sha256:{payload_hash(text)}]")
+        elif len(text) > self.max_chars:
+            parts.append(f"[{len(text)} chars]")
+        return " ".join(parts)
+
+    def log(
+        self,
+        logger: logging.Logger,
+        category: str,
+        message: str,
+        payload: Any,
+        level: int = logging.INFO
+    ) -> None:
+        """
+        Log a message with a payload, following the policy.
+
+        Args:
+            logger: The logger to use
+            category: The payload category, e.g. "prompt" or "response"
+            message: The message logged before the payload
+            payload: The payload
+            level: The log level
+        """
+        if not logger.isEnabledFor(level) or not self.should_log(category):
+            return
+        logger.log(level, f"{message}: {self.describe(payload)}", extra={"data": {"payload_category": category}})
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the policy settings and how many payloads sampling skipped.
+
+        Returns:
+            Dictionary with the settings and skipped payloads per category
+        """
+        return {
+            "max_chars": self.max_chars,
+            "hash_payloads": self.hash_payloads,
+            "full_payloads": self.full_payloads,
+            "sampled_out": dict(self.sampled_out)
+        }
+
+
+def payload_hash(text: str) -> str:
+    """
+    Get a short content hash of a payload.
+
+    Args:
+        text: The payload text
+
+    Returns:
+        The first 12 hex digits of the payload's SHA-256
+    """
+    return hashlib.sha256(text.encode("utf-8", "replace")).hexdigest()[:12]
+
+
+# Global payload logging policy
+payload_log_policy = PayloadLogPolicy(
+    max_chars=config.get("LOG_PAYLOAD_MAX_CHARS", 200),
+    hash_payloads=config.get("LOG_PAYLOAD_HASH", True),
+    sample_rates=config.get_float_mapping("LOG_PAYLOAD_SAMPLE_RATES"),
+    full_payloads=config.get("LOG_FULL_PAYLOADS", False)
+)
+
+
+def log_payload(
+    logger: logging.Logger,
+    category: str,
+    message: str,
+    payload: Any,
+    level: int = logging.INFO
+) -> None:
+    """
+    Log a message with a payload, following the global payload policy.
+
+    Args:
+        logger: The logger to use
+        category: The payload category, e.g. "prompt" or "response"
+        message: The message logged before the payload
+        payload: The payload
+        level: The log level
+    """
+    payload_log_policy.log(logger, category, message, payload, level)
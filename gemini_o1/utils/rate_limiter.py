@@ -5,24 +5,32 @@ This module provides a flexible rate limiter that can be used for API calls
 with exponential backoff strategies for handling rate limit errors.
 """
 
+import re
 import time
 import random
 import asyncio
 import logging
+import threading
 from typing import Optional, Dict, Callable, Any, List
 from collections import deque
 
+from .config import config
 from .logging_config import logging_config
 
 logger = logging_config.get_logger(__name__)
 
+# Endpoint that every Gemini generation call is limited under
+GEMINI_ENDPOINT = "gemini_api"
+
 class TokenBucket:
     """
     Token bucket rate limiter implementation.
     
     This implements a token bucket algorithm where tokens are added at a fixed rate
     and can be consumed when making API calls. If insufficient tokens are available,
-    the call is delayed until enough tokens are available.
+    the call is delayed until enough tokens are available. Callers reserve their
+    tokens under a brief lock and then wait outside it, so waiters are served in
+    order at the refill rate without blocking one another.
     """
     
     def __init__(self, max_tokens: int, refill_rate: float):
@@ -37,10 +45,19 @@ class TokenBucket:
         self.refill_rate = refill_rate
         self.tokens = max_tokens
         self.last_refill = time.time()
-        self.lock = asyncio.Lock()
+        # Guards the token count for callers outside the event loop
+        self.thread_lock = threading.Lock()
+        
+    def _locked(self):
+        """Get the context manager that guards the bucket state."""
+        return self.thread_lock
         
     async def _refill(self) -> None:
         """Refill the token bucket based on elapsed time."""
+        self._refill_now()
+        
+    def _refill_now(self) -> None:
+        """Refill the token bucket based on elapsed time (synchronous version)."""
         now = time.time()
         elapsed = now - self.last_refill
         new_tokens = elapsed * self.refill_rate
@@ -49,6 +66,30 @@ class TokenBucket:
             self.tokens = min(self.max_tokens, self.tokens + new_tokens)
             self.last_refill = now
             
+    def reserve(self, tokens: int = 1) -> float:
+        """
+        Take tokens from the bucket and get how long to wait before using them.
+        
+        Tokens are taken immediately, so the balance goes negative when the
+        bucket is short. Each caller's slot time follows from the debt ahead
+        of it, and callers wait out their slot without holding the lock.
+        
+        Args:
+            tokens: Number of tokens to reserve
+            
+        Returns:
+            Seconds to wait before the reserved tokens may be used
+        """
+        if tokens > self.max_tokens:
+            raise ValueError(f"Requested tokens ({tokens}) exceeds maximum ({self.max_tokens})")
+            
+        with self._locked():
+            self._refill_now()
+            self.tokens -= tokens
+            if self.tokens >= 0 and self.last_refill <= time.time():
+                return 0.0
+            return self._wait_time(-min(self.tokens, 0))
+            
     async def acquire(self, tokens: int = 1) -> float:
         """
         Acquire tokens from the bucket, waiting if necessary.
@@ -59,30 +100,199 @@ class TokenBucket:
         Returns:
             The delay in seconds before tokens could be acquired
         """
-        if tokens > self.max_tokens:
-            raise ValueError(f"Requested tokens ({tokens}) exceeds maximum ({self.max_tokens})")
+        wait_time = self.reserve(tokens)
+        if wait_time > 0:
+            logger.debug(f"Rate limit: waiting {wait_time:.2f}s for {tokens} tokens")
+            try:
+                await asyncio.sleep(wait_time)
+            except asyncio.CancelledError:
+                # The reservation was never used, so hand it back
+                self.adjust(-tokens)
+                raise
+        return wait_time
+        
+    def acquire_blocking(self, tokens: int = 1) -> float:
+        """
+        Acquire tokens from the bucket, blocking the calling thread if necessary.
+        
+        For synchronous callers that run outside an event loop.
+        
+        Args:
+            tokens: Number of tokens to acquire
             
-        start_time = time.time()
+        Returns:
+            The delay in seconds before tokens could be acquired
+        """
+        wait_time = self.reserve(tokens)
+        if wait_time > 0:
+            logger.debug(f"Rate limit: blocking {wait_time:.2f}s for {tokens} tokens")
+            time.sleep(wait_time)
+        return wait_time
+
+    def try_acquire(self, tokens: int = 1) -> bool:
+        """
+        Take tokens from the bucket only if they are available right now.
         
-        async with self.lock:
-            await self._refill()
+        Args:
+            tokens: Number of tokens to take
             
-            # Calculate wait time if not enough tokens
-            if self.tokens < tokens:
-                deficit = tokens - self.tokens
-                wait_time = deficit / self.refill_rate
-                
-                # Log wait information
-                logger.debug(f"Rate limit: waiting {wait_time:.2f}s for {deficit:.2f} tokens")
-                
-                # Wait for tokens to refill
-                await asyncio.sleep(wait_time)
-                self.tokens = self.max_tokens - tokens
-                self.last_refill = time.time()
-            else:
+        Returns:
+            True if the tokens were taken
+        """
+        with self._locked():
+            self._refill_now()
+            if self.tokens >= tokens and self.last_refill <= time.time():
                 self.tokens -= tokens
-                
-        return time.time() - start_time
+                return True
+            return False
+            
+    def _wait_time(self, deficit: float) -> float:
+        """Get how long until a deficit is refilled, including any pause."""
+        paused_for = max(0.0, self.last_refill - time.time())
+        return paused_for + deficit / self.refill_rate
+        
+    def set_rate(self, refill_rate: float) -> None:
+        """
+        Change the refill rate, keeping the tokens accrued at the old rate.
+        
+        Args:
+            refill_rate: New rate at which tokens are added (tokens per second)
+        """
+        with self._locked():
+            self._refill_now()
+            self.refill_rate = refill_rate
+            
+    def pause(self, seconds: float) -> None:
+        """
+        Empty the bucket and stop refilling it for a while.
+        
+        Used to honor a server's retry-after hint.
+        
+        Args:
+            seconds: How long to stop refilling
+        """
+        with self._locked():
+            self._refill_now()
+            self.tokens = min(self.tokens, 0)
+            # Refilling resumes once this point in time is reached
+            self.last_refill = max(self.last_refill, time.time() + seconds)
+            
+    def adjust(self, delta: float) -> None:
+        """
+        Take extra tokens from the bucket, or give tokens back.
+        
+        Used to correct an acquisition once the real cost of a call is known.
+        The balance may go negative, which delays later acquisitions.
+        
+        Args:
+            delta: Tokens to take (positive) or return (negative)
+        """
+        with self._locked():
+            self._refill_now()
+            self.tokens = min(self.max_tokens, self.tokens - delta)
+
+class AIMDController:
+    """
+    Adapts a bucket's refill rate to rate limit feedback from the server.
+    
+    Rate limit errors cut the rate multiplicatively (at most once per
+    cooldown, so a burst of errors counts once), while runs of successful
+    calls raise it additively, letting the limiter settle near the real quota.
+    """
+    
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        min_factor: float = 0.1,
+        max_factor: float = 2.0,
+        decrease_factor: float = 0.5,
+        increase_factor: float = 0.05,
+        increase_after: int = 5,
+        cooldown: float = 1.0
+    ):
+        """
+        Initialize the controller.
+        
+        Args:
+            bucket: The bucket whose refill rate is controlled
+            min_factor: Lowest rate, as a multiple of the configured rate
+            max_factor: Highest rate, as a multiple of the configured rate
+            decrease_factor: Multiplier applied to the rate on a rate limit error
+            increase_factor: Step added to the rate, as a multiple of the configured rate
+            increase_after: Consecutive successes needed for each step up
+            cooldown: Minimum seconds between two decreases
+        """
+        self.bucket = bucket
+        self.base_rate = bucket.refill_rate
+        self.min_rate = self.base_rate * min_factor
+        self.max_rate = self.base_rate * max_factor
+        self.decrease_factor = decrease_factor
+        self.increase_step = self.base_rate * increase_factor
+        self.increase_after = increase_after
+        self.cooldown = cooldown
+        self.successes = 0
+        self.last_decrease = 0.0
+        
+    def on_success(self) -> None:
+        """Count a successful call, raising the rate after enough of them."""
+        self.successes += 1
+        if self.successes >= self.increase_after:
+            self.successes = 0
+            self.bucket.set_rate(min(self.max_rate, self.bucket.refill_rate + self.increase_step))
+            
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """
+        Cut the rate after a rate limit error.
+        
+        Args:
+            retry_after: Seconds the server asked clients to wait, if given
+        """
+        self.successes = 0
+        now = time.time()
+        if now - self.last_decrease >= self.cooldown:
+            self.last_decrease = now
+            new_rate = max(self.min_rate, self.bucket.refill_rate * self.decrease_factor)
+            self.bucket.set_rate(new_rate)
+            logger.warning(f"Rate limited by server: reducing rate to {new_rate:.3f}/s")
+            
+        if retry_after:
+            self.bucket.pause(retry_after)
+
+
+def retry_after_from_exception(error: Exception) -> Optional[float]:
+    """
+    Find the retry delay a server suggested in a rate limit error.
+    
+    Checks a Retry-After response header, RetryInfo error details, and
+    finally a "retry in Ns" hint in the error message.
+    
+    Args:
+        error: The rate limit error
+        
+    Returns:
+        The suggested delay in seconds, or None if there is no hint
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if "Retry-After" in headers:
+            return float(headers["Retry-After"])
+    except (TypeError, ValueError):
+        pass
+        
+    for detail in getattr(error, "details", None) or []:
+        if isinstance(detail, dict) and "retryDelay" in detail:
+            match = re.match(r"([\d.]+)s", str(detail["retryDelay"]))
+            if match:
+                return float(match.group(1))
+        retry_delay = getattr(detail, "retry_delay", None)
+        if retry_delay is not None and hasattr(retry_delay, "seconds"):
+            return retry_delay.seconds + getattr(retry_delay, "nanos", 0) / 1e9
+            
+    match = re.search(r"retry in ([\d.]+)\s*s", str(error), re.IGNORECASE)
+    if match:
+        return float(match.group(1))
+    return None
 
 class AdvancedRateLimiter:
     """
@@ -95,12 +305,26 @@ class AdvancedRateLimiter:
     # Default jitter range for backoff
     DEFAULT_JITTER = (0.9, 1.1)
     
-    def __init__(self):
-        """Initialize the advanced rate limiter."""
+    def __init__(self, store: Optional[Any] = None):
+        """
+        Initialize the advanced rate limiter.
+        
+        Args:
+            store: Optional SQLiteBucketStore to share buckets with other
+                processes; buckets are kept in memory without one
+        """
+        self.store = store
         self.limiters: Dict[str, TokenBucket] = {}
         self.retries: Dict[str, int] = {}
         self.history: Dict[str, deque] = {}
         self.max_history = 100
+        self.controllers: Dict[str, AIMDController] = {}
+        
+    def _create_bucket(self, key: str, max_tokens: int, refill_rate: float) -> TokenBucket:
+        """Create a bucket, in the shared store if there is one."""
+        if self.store is not None:
+            return self.store.bucket(key, max_tokens, refill_rate)
+        return TokenBucket(max_tokens, refill_rate)
         
     def configure_endpoint(
         self, 
@@ -118,28 +342,226 @@ class AdvancedRateLimiter:
             refill_rate: Rate at which tokens are added (tokens per second)
             max_retries: Maximum number of retries for this endpoint
         """
-        self.limiters[endpoint] = TokenBucket(max_tokens, refill_rate)
+        self.limiters[endpoint] = self._create_bucket(endpoint, max_tokens, refill_rate)
         self.retries[endpoint] = max_retries
         self.history[endpoint] = deque(maxlen=self.max_history)
         
         logger.info(f"Configured rate limiter for {endpoint}: {max_tokens} tokens, {refill_rate} refill rate")
         
-    async def wait_for_token(self, endpoint: str, tokens: int = 1) -> float:
+    @staticmethod
+    def model_key(endpoint: str, model: str) -> str:
+        """Get the bucket name for a model under an endpoint."""
+        return f"{endpoint}:{model}"
+        
+    def configure_model(
+        self, 
+        endpoint: str, 
+        model: str, 
+        max_tokens: int, 
+        refill_rate: float
+    ) -> None:
+        """
+        Configure a rate limiter for one model under an endpoint.
+        
+        Calls for the model must then pass both the endpoint's and the
+        model's bucket.
+        
+        Args:
+            endpoint: Name of the endpoint
+            model: Name of the model
+            max_tokens: Maximum number of tokens for this model
+            refill_rate: Rate at which tokens are added (tokens per second)
+        """
+        key = self.model_key(endpoint, model)
+        self.limiters[key] = self._create_bucket(key, max_tokens, refill_rate)
+        logger.info(f"Configured rate limiter for {key}: {max_tokens} tokens, {refill_rate} refill rate")
+        
+    @staticmethod
+    def token_key(endpoint: str, model: Optional[str] = None) -> str:
+        """Get the name of the token-per-minute bucket for an endpoint or model."""
+        return f"{endpoint}:{model}#tokens" if model else f"{endpoint}#tokens"
+        
+    def configure_token_limit(
+        self, 
+        endpoint: str, 
+        tokens_per_minute: int, 
+        model: Optional[str] = None
+    ) -> None:
+        """
+        Limit the number of model tokens per minute for an endpoint or model.
+        
+        Calls then acquire their estimated prompt tokens as well as a request
+        slot, and reconcile the estimate against the reported usage afterwards.
+        
+        Args:
+            endpoint: Name of the endpoint
+            tokens_per_minute: Maximum model tokens per minute
+            model: Optional model to limit instead of the whole endpoint
+        """
+        key = self.token_key(endpoint, model)
+        self.limiters[key] = self._create_bucket(key, tokens_per_minute, tokens_per_minute / 60)
+        logger.info(f"Configured token limit for {key}: {tokens_per_minute} tokens per minute")
+        
+    def _token_buckets_for(self, endpoint: str, model: Optional[str]) -> List[TokenBucket]:
+        """Get the token-per-minute buckets that apply to a call."""
+        keys = [self.token_key(endpoint)]
+        if model:
+            keys.append(self.token_key(endpoint, model))
+        return [self.limiters[key] for key in keys if key in self.limiters]
+        
+    @staticmethod
+    def _weight_for(bucket: TokenBucket, prompt_tokens: int) -> int:
+        """Clamp a prompt's token count to what a bucket can ever hold."""
+        if prompt_tokens > bucket.max_tokens:
+            logger.warning(f"Prompt of {prompt_tokens} tokens exceeds the per-minute limit of {bucket.max_tokens}")
+            return int(bucket.max_tokens)
+        return prompt_tokens
+        
+    def enable_adaptive(self, endpoint: str, **controller_options) -> None:
+        """
+        Adapt the request rate of an endpoint and its models to server feedback.
+        
+        Rate limit errors recorded for the endpoint then cut its rate and
+        honor any retry-after hint, and sustained success raises it again.
+        
+        Args:
+            endpoint: Name of the endpoint
+            **controller_options: Options passed to AIMDController
+        """
+        keys = [endpoint] + [
+            key for key in self.limiters
+            if key.startswith(f"{endpoint}:") and not key.endswith("#tokens")
+        ]
+        for key in keys:
+            if key in self.limiters:
+                self.controllers[key] = AIMDController(self.limiters[key], **controller_options)
+        logger.info(f"Enabled adaptive rate control for {endpoint}")
+        
+    def _buckets_for(self, endpoint: str, model: Optional[str]) -> List[TokenBucket]:
+        """Get the buckets a call must pass, warning if the endpoint has none."""
+        if endpoint not in self.limiters:
+            logger.warning(f"No rate limiter configured for {endpoint}, proceeding without rate limiting")
+            return []
+            
+        buckets = [self.limiters[endpoint]]
+        if model and self.model_key(endpoint, model) in self.limiters:
+            buckets.append(self.limiters[self.model_key(endpoint, model)])
+        return buckets
+        
+    async def wait_for_token(
+        self, 
+        endpoint: str, 
+        tokens: int = 1, 
+        model: Optional[str] = None,
+        prompt_tokens: int = 0
+    ) -> float:
         """
         Wait for tokens to become available for the given endpoint.
         
         Args:
             endpoint: Name of the endpoint
             tokens: Number of tokens to acquire
+            model: Optional model whose own bucket must also be passed
+            prompt_tokens: Estimated model tokens the call will use, charged
+                against any token-per-minute limits
             
         Returns:
             Delay in seconds
         """
-        if endpoint not in self.limiters:
-            logger.warning(f"No rate limiter configured for {endpoint}, proceeding without rate limiting")
-            return 0
+        delay = 0.0
+        for bucket in self._buckets_for(endpoint, model):
+            delay += await bucket.acquire(tokens)
+        if prompt_tokens > 0:
+            for bucket in self._token_buckets_for(endpoint, model):
+                delay += await bucket.acquire(self._weight_for(bucket, prompt_tokens))
+        return delay
+        
+    def try_acquire(
+        self, 
+        endpoint: str, 
+        tokens: int = 1, 
+        model: Optional[str] = None,
+        prompt_tokens: int = 0
+    ) -> bool:
+        """
+        Take tokens for a call only if every bucket can grant them without waiting.
+        
+        Used for optional calls that are only worth making with spare quota.
+        Nothing is taken unless all buckets have room.
+        
+        Args:
+            endpoint: Name of the endpoint
+            tokens: Number of tokens to acquire
+            model: Optional model whose own bucket must also be passed
+            prompt_tokens: Estimated model tokens the call will use
+            
+        Returns:
+            True if the tokens were taken
+        """
+        charges = [(bucket, tokens) for bucket in self._buckets_for(endpoint, model)]
+        if prompt_tokens > 0:
+            charges += [
+                (bucket, self._weight_for(bucket, prompt_tokens))
+                for bucket in self._token_buckets_for(endpoint, model)
+            ]
             
-        return await self.limiters[endpoint].acquire(tokens)
+        taken = []
+        for bucket, amount in charges:
+            if not bucket.try_acquire(amount):
+                for taken_bucket, taken_amount in taken:
+                    taken_bucket.adjust(-taken_amount)
+                return False
+            taken.append((bucket, amount))
+        return True
+        
+    def wait_for_token_blocking(
+        self, 
+        endpoint: str, 
+        tokens: int = 1, 
+        model: Optional[str] = None,
+        prompt_tokens: int = 0
+    ) -> float:
+        """
+        Wait for tokens to become available, blocking the calling thread.
+        
+        Args:
+            endpoint: Name of the endpoint
+            tokens: Number of tokens to acquire
+            model: Optional model whose own bucket must also be passed
+            prompt_tokens: Estimated model tokens the call will use, charged
+                against any token-per-minute limits
+            
+        Returns:
+            Delay in seconds
+        """
+        delay = 0.0
+        for bucket in self._buckets_for(endpoint, model):
+            delay += bucket.acquire_blocking(tokens)
+        if prompt_tokens > 0:
+            for bucket in self._token_buckets_for(endpoint, model):
+                delay += bucket.acquire_blocking(self._weight_for(bucket, prompt_tokens))
+        return delay
+        
+    def reconcile_tokens(
+        self, 
+        endpoint: str, 
+        estimated_tokens: int, 
+        actual_tokens: int,
+        model: Optional[str] = None
+    ) -> None:
+        """
+        Correct token-per-minute buckets once a call's real usage is known.
+        
+        Args:
+            endpoint: Name of the endpoint
+            estimated_tokens: The prompt tokens acquired before the call
+            actual_tokens: The total tokens the API reported for the call
+            model: Optional model the call was made to
+        """
+        for bucket in self._token_buckets_for(endpoint, model):
+            # Prompts larger than the bucket were only charged its capacity
+            charged = min(estimated_tokens, bucket.max_tokens)
+            bucket.adjust(actual_tokens - charged)
     
     def calculate_backoff_time(
         self, 
@@ -175,22 +597,48 @@ class AdvancedRateLimiter:
         logger.debug(f"Backoff for {endpoint}: Retry #{retry_count}, delay {delay:.2f}s")
         return delay
         
-    def record_call(self, endpoint: str, success: bool, status_code: Optional[int] = None) -> None:
+    def record_call(
+        self, 
+        endpoint: str, 
+        success: bool, 
+        status_code: Optional[int] = None,
+        model: Optional[str] = None,
+        tokens: Optional[int] = None,
+        retry_after: Optional[float] = None
+    ) -> None:
         """
         Record a call to an endpoint for monitoring.
         
+        With adaptive rate control enabled, the outcome also adjusts the
+        endpoint's and model's rates.
+        
         Args:
             endpoint: Name of the endpoint
             success: Whether the call was successful
             status_code: Optional status code for the response
+            model: Optional model the call was made to
+            tokens: Optional number of model tokens the call used
+            retry_after: Optional delay the server asked for before retrying
         """
+        keys = [endpoint, self.model_key(endpoint, model)] if model else [endpoint]
+        for key in keys:
+            controller = self.controllers.get(key)
+            if controller is None:
+                continue
+            if status_code == 429:
+                controller.on_rate_limited(retry_after)
+            elif success:
+                controller.on_success()
+            
         if endpoint not in self.history:
             self.history[endpoint] = deque(maxlen=self.max_history)
             
         self.history[endpoint].append({
             'timestamp': time.time(),
             'success': success,
-            'status_code': status_code
+            'status_code': status_code,
+            'model': model,
+            'tokens': tokens
         })
         
     def get_success_rate(self, endpoint: str, window_seconds: int = 300) -> float:
@@ -246,13 +694,24 @@ class AdvancedRateLimiter:
             success_calls = sum(1 for call in calls if call['success'])
             last_minute_calls = sum(1 for call in calls 
                                    if call['timestamp'] >= time.time() - 60)
+            last_minute_tokens = sum(call.get('tokens') or 0 for call in calls
+                                     if call['timestamp'] >= time.time() - 60)
+            
+            calls_by_model: Dict[str, int] = {}
+            for call in calls:
+                if call.get('model'):
+                    calls_by_model[call['model']] = calls_by_model.get(call['model'], 0) + 1
             
             metrics[ep] = {
                 'total_calls': total_calls,
                 'success_rate': (success_calls / total_calls) * 100 if total_calls else 100,
                 'calls_last_minute': last_minute_calls,
-                'most_recent': calls[-1]['timestamp'] if calls else None
+                'tokens_last_minute': last_minute_tokens,
+                'most_recent': calls[-1]['timestamp'] if calls else None,
+                'calls_by_model': calls_by_model
             }
+            if ep in self.limiters:
+                metrics[ep]['rate_per_second'] = self.limiters[ep].refill_rate
             
         return metrics
 
@@ -306,11 +765,13 @@ async def with_rate_limit(
         except Exception as e:
             # Check if it's a rate limit error
             is_rate_limit_error = any(error_text in str(e).lower() 
-                                     for error_text in ['rate limit', 'too many requests', '429'])
+                                     for error_text in ['rate limit', 'too many requests', '429', 'resource exhausted',
+                                                        'resource has been exhausted'])
             
             # Record failed call
             status_code = 429 if is_rate_limit_error else None
-            rate_limiter.record_call(endpoint, False, status_code)
+            retry_after = retry_after_from_exception(e) if is_rate_limit_error else None
+            rate_limiter.record_call(endpoint, False, status_code, retry_after=retry_after)
             
             # If not a rate limit error or max retries exceeded, re-raise
             if not is_rate_limit_error or retry_count >= max_retries:
@@ -320,6 +781,8 @@ async def with_rate_limit(
             # Calculate backoff time
             retry_count += 1
             backoff_time = rate_limiter.calculate_backoff_time(endpoint, retry_count)
+            if retry_after:
+                backoff_time = max(backoff_time, retry_after)
             
             logger.warning(
                 f"Rate limit error on {endpoint}, retry {retry_count}/{max_retries} "
@@ -329,5 +792,42 @@ async def with_rate_limit(
             # Wait before retry
             await asyncio.sleep(backoff_time)
             
+def configure_gemini_limits(limiter: AdvancedRateLimiter) -> None:
+    """
+    Configure the Gemini endpoint and per-model buckets from the settings.
+    
+    The endpoint allows RATE_LIMIT_MAX_CALLS calls per RATE_LIMIT_PERIOD, and
+    MODEL_RATE_LIMITS can cap individual models lower within that. Model
+    tokens per minute are limited by TOKEN_LIMIT_PER_MINUTE and, per model,
+    MODEL_TOKEN_LIMITS. ADAPTIVE_RATE_LIMIT turns on AIMD rate control, and
+    RATE_LIMIT_BACKEND=sqlite shares the buckets with other processes.
+    
+    Args:
+        limiter: The rate limiter to configure
+    """
+    if config.get("RATE_LIMIT_BACKEND", "memory").lower() == "sqlite" and limiter.store is None:
+        from .shared_rate_limiter import SQLiteBucketStore
+        limiter.store = SQLiteBucketStore(config.get("RATE_LIMIT_DB_PATH"))
+        
+    rate_limit_config = config.get_rate_limit_config()
+    period = rate_limit_config["period"]
+    limiter.configure_endpoint(
+        GEMINI_ENDPOINT,
+        rate_limit_config["max_calls"],
+        rate_limit_config["max_calls"] / period
+    )
+    
+    for model, max_calls in config.get_int_mapping("MODEL_RATE_LIMITS").items():
+        limiter.configure_model(GEMINI_ENDPOINT, model, max_calls, max_calls / period)
+    
+    tokens_per_minute = config.get("TOKEN_LIMIT_PER_MINUTE", 0)
+    if tokens_per_minute > 0:
+        limiter.configure_token_limit(GEMINI_ENDPOINT, tokens_per_minute)
+    for model, model_tokens_per_minute in config.get_int_mapping("MODEL_TOKEN_LIMITS").items():
+        limiter.configure_token_limit(GEMINI_ENDPOINT, model_tokens_per_minute, model=model)
+        
+    if config.get("ADAPTIVE_RATE_LIMIT", False):
+        limiter.enable_adaptive(GEMINI_ENDPOINT, max_factor=config.get("ADAPTIVE_RATE_CEILING", 2.0))
+
 # Global rate limiter instance
 rate_limiter = AdvancedRateLimiter()
\ No newline at end of file
@@ -1,41 +1,249 @@
 """
-Retry decorator for handling transient errors.
+Retry policies for handling transient errors.
 """
 
 import asyncio
 import functools
 import logging
-from typing import Callable, TypeVar, Any
+import random
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type, TypeVar
+
+from google.api_core import exceptions as google_exceptions
+
+from .config import config
+from .deadline import DeadlineExceeded, deadline, remaining, run_with_deadline
+from .rate_limiter import retry_after_from_exception
 
 logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
 
-def retry_on_exception(max_retries=5, initial_delay=1, backoff_factor=2):
+# Errors that may succeed when tried again; everything else fails at once
+RETRYABLE_EXCEPTIONS: Tuple[Type[BaseException], ...] = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.BadGateway,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.Aborted,
+    ConnectionError,
+    TimeoutError,
+    asyncio.TimeoutError,
+)
+
+
+class RetryBudget:
     """
-    Decorator that retries an async function on exception with exponential backoff.
-    
-    Args:
-        max_retries: Maximum number of retry attempts
-        initial_delay: Initial delay in seconds before first retry
-        backoff_factor: Multiplier for the delay between retries
-        
-    Returns:
-        Decorated function that will retry on exceptions
+    Limits retries to a fraction of all calls.
+
+    Every call adds ratio to the balance and every retry spends one, so
+    during an outage retries stop once they exceed the ratio instead of
+    multiplying the load on the API. The balance starts full so occasional
+    errors can always be retried.
     """
-    def decorator(func: Callable[..., T]) -> Callable[..., T]:
-        @functools.wraps(func)
-        async def wrapper(*args, **kwargs) -> Any:
-            delay = initial_delay
-            for attempt in range(1, max_retries + 1):
+
+    def __init__(self, ratio: float = 0.2, max_balance: float = 10.0):
+        """
+        Initialize the budget.
+
+        Args:
+            ratio: Retries allowed per call
+            max_balance: Most retries that can be saved up
+        """
+        self.ratio = ratio
+        self.max_balance = max_balance
+        self.balance = max_balance
+        self.retries = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        """Credit the budget for a new call."""
+        with self._lock:
+            self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def try_spend(self) -> bool:
+        """
+        Take one retry from the budget.
+
+        Returns:
+            True if the retry may go ahead
+        """
+        with self._lock:
+            if self.balance >= 1:
+                self.balance -= 1
+                self.retries += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Get budget usage statistics.
+
+        Returns:
+            Dictionary with the balance and retry counts
+        """
+        return {"balance": self.balance, "retries": self.retries, "rejected": self.rejected}
+
+
+class RetryPolicy:
+    """
+    Retries async calls that fail with transient errors.
+
+    Only retryable errors are retried, with exponential backoff and jitter,
+    waiting at least as long as any retry-after hint from the server. Each
+    attempt is cancelled after the attempt timeout, all attempts of one call
+    must finish within the policy's deadline and the request's deadline, and
+    retries draw on an optional budget shared between calls. The policy can
+    be applied as a decorator.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        initial_delay: float = 1.0,
+        max_delay: float = 20.0,
+        backoff_factor: float = 2.0,
+        deadline: Optional[float] = 120.0,
+        attempt_timeout: Optional[float] = None,
+        budget: Optional[RetryBudget] = None,
+        retryable: Tuple[Type[BaseException], ...] = RETRYABLE_EXCEPTIONS
+    ):
+        """
+        Initialize the retry policy.
+
+        Args:
+            max_attempts: Maximum number of attempts, including the first
+            initial_delay: Base delay in seconds before the first retry
+            max_delay: Largest base delay between attempts
+            backoff_factor: Multiplier for the base delay after each retry
+            deadline: Seconds all attempts of a call must finish within (None for no limit)
+            attempt_timeout: Seconds after which a single attempt is cancelled (None for no limit)
+            budget: Optional retry budget shared with other calls
+            retryable: Exception types worth retrying
+        """
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff_factor = backoff_factor
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.budget = budget
+        self.retryable = retryable
+
+    def is_retryable(self, error: BaseException) -> bool:
+        """
+        Check whether an error is worth retrying.
+
+        Args:
+            error: The error raised by an attempt
+
+        Returns:
+            True if the error is transient
+        """
+        return isinstance(error, self.retryable)
+
+    def delay_for(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """
+        Get the delay before the next attempt.
+
+        Half of the exponential base delay is fixed and half is random, so
+        callers that failed together don't retry together.
+
+        Args:
+            attempt: The number of the attempt that just failed
+            error: The error it failed with
+
+        Returns:
+            Seconds to wait
+        """
+        base = min(self.max_delay, self.initial_delay * self.backoff_factor ** (attempt - 1))
+        delay = base / 2 + random.uniform(0, base / 2)
+        retry_after = retry_after_from_exception(error) if error is not None else None
+        return max(delay, retry_after or 0.0)
+
+    async def call(self, func: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """
+        Call an async function, retrying transient errors.
+
+        Args:
+            func: The async function to call
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            The function's result
+
+        Raises:
+            DeadlineExceeded: If the call's or the request's deadline passed
+            Exception: The last error, once it can't or shouldn't be retried
+        """
+        name = getattr(func, "__name__", repr(func))
+        if self.budget:
+            self.budget.record_call()
+
+        with deadline(self.deadline):
+            attempt = 1
+            while True:
                 try:
-                    return await func(*args, **kwargs)
+                    return await run_with_deadline(func(*args, **kwargs), self.attempt_timeout)
+                except DeadlineExceeded:
+                    logger.error(f"Deadline reached for {name}.")
+                    raise
                 except Exception as e:
-                    if attempt == max_retries:
-                        logger.error(f"Max retries reached for {func.__name__}.")
+                    if not self.is_retryable(e):
                         raise
-                    logger.warning(f"{e} - Retrying {func.__name__} in {delay} seconds... (Attempt {attempt}/{max_retries})")
+                    if attempt >= self.max_attempts:
+                        logger.error(f"Max retries reached for {name}.")
+                        raise
+
+                    delay = self.delay_for(attempt, e)
+                    left = remaining()
+                    if left is not None and delay >= left:
+                        logger.error(f"Deadline reached for {name}, not retrying.")
+                        raise
+                    if self.budget and not self.budget.try_spend():
+                        logger.error(f"Retry budget exhausted, not retrying {name}.")
+                        raise
+
+                    logger.warning(f"{e} - Retrying {name} in {delay:.2f} seconds... (Attempt {attempt}/{self.max_attempts})")
                     await asyncio.sleep(delay)
-                    delay *= backoff_factor
+                    attempt += 1
+
+    def __call__(self, func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        """Decorate an async function to be called through this policy."""
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs) -> Any:
+            return await self.call(func, *args, **kwargs)
         return wrapper
-    return decorator
\ No newline at end of file
+
+
+def retry_on_exception(max_retries=5, initial_delay=1, backoff_factor=2):
+    """
+    Decorator that retries an async function on transient errors with exponential backoff.
+
+    Args:
+        max_retries: Maximum number of attempts
+        initial_delay: Initial delay in seconds before first retry
+        backoff_factor: Multiplier for the delay between retries
+
+    Returns:
+        Decorated function that will retry on transient errors
+    """
+    return RetryPolicy(max_attempts=max_retries, initial_delay=initial_delay, backoff_factor=backoff_factor)
+
+
+# Retries of Gemini calls share one budget, so an outage can't multiply the load
+gemini_retry_budget = RetryBudget(ratio=config.get("RETRY_BUDGET_RATIO", 0.2))
+
+gemini_retry_policy = RetryPolicy(
+    max_attempts=config.get("RETRY_MAX_ATTEMPTS", 5),
+    initial_delay=config.get("RETRY_INITIAL_DELAY", 1.0),
+    max_delay=config.get("RETRY_MAX_DELAY", 20.0),
+    deadline=config.get("RETRY_DEADLINE", 120.0) or None,
+    budget=gemini_retry_budget
+)
@@ -0,0 +1,140 @@
+"""
+Rate limit buckets shared by processes on the same host.
+
+Each web worker process has its own AdvancedRateLimiter, so in-memory buckets
+let every worker spend the full quota. Buckets created from a
+SQLiteBucketStore keep their state in a SQLite database in WAL mode instead,
+and every change happens in an immediate transaction, so all processes using
+the same database file draw from one set of buckets.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+from .logging_config import logging_config
+from .rate_limiter import TokenBucket
+
+logger = logging_config.get_logger(__name__)
+
+
+class SQLiteBucketStore:
+    """
+    SQLite database holding the state of shared token buckets.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        """
+        Initialize the store.
+
+        Args:
+            path: Path to the SQLite database file
+            timeout: Seconds to wait for another process's transaction
+        """
+        self.path = os.path.expanduser(path)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(
+            self.path, timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        # Buckets in this process share the connection
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, last_refill REAL NOT NULL, "
+                "refill_rate REAL NOT NULL, max_tokens REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Run statements in a transaction that locks out other writers.
+
+        Yields:
+            The database connection
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def bucket(self, key: str, max_tokens: int, refill_rate: float) -> "SQLiteTokenBucket":
+        """
+        Get a shared bucket, creating its state if no process has yet.
+
+        The configured size and rate replace any stored ones, while the stored
+        token balance is kept.
+
+        Args:
+            key: Name of the bucket
+            max_tokens: Maximum number of tokens in the bucket
+            refill_rate: Rate at which tokens are added (tokens per second)
+
+        Returns:
+            The shared bucket
+        """
+        return SQLiteTokenBucket(self, key, max_tokens, refill_rate)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """
+    Token bucket whose state lives in a SQLiteBucketStore.
+
+    Behaves like TokenBucket, including reservations, pauses and rate
+    changes, but each operation reads and writes the shared state.
+    """
+
+    def __init__(self, store: SQLiteBucketStore, key: str, max_tokens: int, refill_rate: float):
+        """
+        Initialize the bucket.
+
+        Args:
+            store: The store holding the bucket state
+            key: Name of the bucket
+            max_tokens: Maximum number of tokens in the bucket
+            refill_rate: Rate at which tokens are added (tokens per second)
+        """
+        super().__init__(max_tokens, refill_rate)
+        self.store = store
+        self.key = key
+
+        with self.thread_lock, store.transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO buckets (key, tokens, last_refill, refill_rate, max_tokens) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, self.tokens, self.last_refill, refill_rate, max_tokens)
+            )
+            conn.execute(
+                "UPDATE buckets SET refill_rate = ?, max_tokens = ?, tokens = MIN(tokens, ?) WHERE key = ?",
+                (refill_rate, max_tokens, max_tokens, key)
+            )
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Load the shared state for an operation and store it afterwards."""
+        with self.thread_lock, self.store.transaction() as conn:
+            self.tokens, self.last_refill, self.refill_rate = conn.execute(
+                "SELECT tokens, last_refill, refill_rate FROM buckets WHERE key = ?", (self.key,)
+            ).fetchone()
+            yield
+            conn.execute(
+                "UPDATE buckets SET tokens = ?, last_refill = ?, refill_rate = ? WHERE key = ?",
+                (self.tokens, self.last_refill, self.refill_rate, self.key)
+            )
@@ -0,0 +1,47 @@
+"""
+Token estimation helpers.
+
+Gemini models average roughly four characters per token for English text.
+These estimates are used for budgeting prompts locally, without an API call.
+"""
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text.
+
+    Args:
+        text: The text to measure
+
+    Returns:
+        The estimated token count
+    """
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = " [...]") -> str:
+    """
+    Shorten a text to fit within a token budget.
+
+    Args:
+        text: The text to shorten
+        max_tokens: The maximum number of tokens to keep, including the marker
+        marker: Appended to the text when it is cut
+
+    Returns:
+        The text, cut at a word boundary if it exceeded the budget
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    max_chars = max(max_tokens * CHARS_PER_TOKEN - len(marker), 0)
+    cut = text[:max_chars]
+    # Avoid ending in the middle of a word
+    boundary = cut.rfind(" ")
+    if boundary > max_chars // 2:
+        cut = cut[:boundary]
+    return cut.rstrip() + marker
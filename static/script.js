@@ -979,6 +979,127 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
     
+    // Clear image preview if exists
+    function clearImagePreview() {
+        const imagePreview = document.querySelector('.image-preview');
+        if (imagePreview) {
+            imagePreview.remove();
+            currentUploadedFile = null;
+        }
+    }
+
+    // Read a Server-Sent Events response, passing each event to the callback
+    async function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                const data = block
+                    .split('\n')
+                    .filter(line => line.startsWith('data: '))
+                    .map(line => line.slice(6))
+                    .join('\n');
+                if (data) {
+                    onEvent(JSON.parse(data));
+                }
+            }
+        }
+    }
+
+    // Create a handler that renders streamed network events as chat messages
+    function createStreamRenderer() {
+        const liveMessages = {};
+        let synthesisShown = false;
+
+        function messageData(event, content) {
+            return {
+                role: event.role || 'assistant',
+                content: content,
+                icon: event.icon,
+                type: event.stage === 'synthesis' ? 'synthesis' : 'specialist'
+            };
+        }
+
+        // Append partial text to the node's live message, creating it on first use
+        function updateLiveMessage(event) {
+            const key = `${event.stage}:${event.instance_id}`;
+            let live = liveMessages[key];
+            if (!live) {
+                const element = createMessageElement(messageData(event, ''));
+                messagesContainer.insertBefore(element, messagesContainer.firstChild);
+                live = liveMessages[key] = { element: element, text: '' };
+            }
+            live.text += event.text;
+            live.element.querySelector('.message-text').innerHTML = markdownToHtml(live.text);
+            scrollMessagesIntoView();
+        }
+
+        // Replace the live message with the final text and save it
+        function finishMessage(event) {
+            const key = `${event.stage}:${event.instance_id}`;
+            const data = messageData(event, event.text);
+            const live = liveMessages[key];
+            if (live) {
+                delete liveMessages[key];
+                live.element.querySelector('.message-text').innerHTML = markdownToHtml(event.text);
+                savedMessages.push(data);
+                localStorage.setItem('chatMessages', JSON.stringify(savedMessages));
+                scrollMessagesIntoView();
+            } else {
+                addMessageWithAnimation(createMessageElement(data), data);
+            }
+        }
+
+        return function handleEvent(event) {
+            // The planning output is internal to the scrum master
+            if (event.stage === 'planning') return;
+
+            switch (event.type) {
+                case 'partial':
+                    updateLiveMessage(event);
+                    break;
+                case 'task_completed':
+                    finishMessage(event);
+                    break;
+                case 'synthesis':
+                    finishMessage({ ...event, role: event.role || 'scrum_master' });
+                    synthesisShown = true;
+                    break;
+                case 'instance_created':
+                    fetchInstances();
+                    break;
+                case 'done':
+                    if (!synthesisShown && event.response) {
+                        finishMessage({
+                            stage: 'synthesis',
+                            instance_id: 'mother',
+                            role: 'scrum_master',
+                            text: event.response
+                        });
+                    }
+                    fetchInstances();
+                    break;
+                case 'error': {
+                    showErrorToast(event.error || 'Failed to process message');
+                    const errorElement = createMessageElement({
+                        error: event.error || 'Failed to process message'
+                    });
+                    addMessageWithAnimation(errorElement, { error: event.error });
+                    break;
+                }
+            }
+        };
+    }
+
     // Modify sendMessage function to include image if available
     async function sendMessage(content) {
         if (!content.trim() && !currentUploadedFile) return;
@@ -1001,7 +1122,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 requestBody.image_attached = true;
             }
             
-            const response = await fetch('/api/send_message', {
+            const streamResponse = await fetch('/api/send_message/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
@@ -1009,6 +1130,25 @@ document.addEventListener('DOMContentLoaded', () => {
                 body: JSON.stringify(requestBody)
             });
 
+            const contentType = streamResponse.headers.get('Content-Type') || '';
+            if (streamResponse.ok && streamResponse.body && contentType.startsWith('text/event-stream')) {
+                hideLoadingSpinner();
+                await readEventStream(streamResponse, createStreamRenderer());
+                clearImagePreview();
+                return;
+            }
+
+            // Fall back to the non-streaming endpoint when streaming isn't available
+            const response = streamResponse.status === 404 || streamResponse.status === 405
+                ? await fetch('/api/send_message', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    },
+                    body: JSON.stringify(requestBody)
+                })
+                : streamResponse;
+
             const data = await response.json();
             
             if (!response.ok) {
@@ -1037,12 +1177,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 updateInstances(data.instances);
             }
             
-            // Clear image preview if exists
-            const imagePreview = document.querySelector('.image-preview');
-            if (imagePreview) {
-                imagePreview.remove();
-                currentUploadedFile = null;
-            }
+            clearImagePreview();
 
         } catch (error) {
             console.error('Error sending message:', error);
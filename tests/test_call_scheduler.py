@@ -0,0 +1,62 @@
+import asyncio
+import os
+import pytest
+
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key-for-testing')
+
+from gemini_o1.communication.call_scheduler import (
+    BACKGROUND, INTERACTIVE, CallScheduler, current_lane, current_session, scheduling
+)
+
+
+class TestCallScheduler:
+    """Tests for lane priority and fair share between sessions."""
+
+    @pytest.mark.asyncio
+    async def test_lanes_go_first_and_sessions_share_fairly(self):
+        scheduler = CallScheduler(max_active=1)
+        order = []
+
+        async def call(name, session, lane=None):
+            with scheduling(session=session, lane=lane):
+                async with scheduler.admission():
+                    order.append(name)
+
+        async with scheduler.admission(session="heavy"):
+            tasks = [
+                asyncio.create_task(call("summary", "heavy", BACKGROUND)),
+                asyncio.create_task(call("heavy-1", "heavy")),
+                asyncio.create_task(call("heavy-2", "heavy")),
+                asyncio.create_task(call("heavy-3", "heavy")),
+                asyncio.create_task(call("light-1", "light")),
+                asyncio.create_task(call("synthesis", "light", INTERACTIVE)),
+            ]
+            await asyncio.sleep(0)
+            stats = scheduler.get_stats()["lanes"]
+            assert stats["default"]["queue_depth"] == 4
+            assert stats[INTERACTIVE]["queue_depth"] == 1
+
+        await asyncio.gather(*tasks)
+
+        # The heavy session already had its turn, so the light session's call
+        # goes ahead of its backlog
+        assert order == ["synthesis", "light-1", "heavy-1", "heavy-2", "heavy-3", "summary"]
+        stats = scheduler.get_stats()["lanes"]
+        assert stats[BACKGROUND]["admitted"] == 1
+        assert stats[BACKGROUND]["max_wait"] >= stats[INTERACTIVE]["max_wait"]
+        assert scheduler.active == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_the_queue(self):
+        scheduler = CallScheduler(max_active=1)
+
+        async with scheduler.admission():
+            waiter = asyncio.create_task(scheduler.admission().__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            assert scheduler.get_stats()["lanes"]["default"]["queue_depth"] == 0
+
+        assert scheduler.active == 0
+        assert current_lane() == "default" and current_session() == "default"
@@ -0,0 +1,157 @@
+import os
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key-for-testing')
+
+from gemini_o1.commands.command_parser import CommandParser, StreamingCommandParser
+from gemini_o1.commands.command_handlers import CommandHandler
+
+
+def make_network(instance_ids, delay=0.05):
+    """Create a stand-in network whose instances record concurrency and prompts."""
+    network = MagicMock()
+    network.normalize_instance_id.side_effect = lambda identifier: identifier.replace(" ", "-").lower()
+    network.instances = {}
+    for instance_id in instance_ids:
+        instance = MagicMock()
+        instance.instance_id = instance_id
+        network.instances[instance_id] = instance
+
+    state = {"running": 0, "max_running": 0, "prompts": {}, "order": []}
+
+    async def get_instance_response(instance, prompt, is_system=False):
+        state["running"] += 1
+        state["max_running"] = max(state["max_running"], state["running"])
+        state["prompts"][instance.instance_id] = prompt
+        await asyncio.sleep(delay)
+        state["running"] -= 1
+        state["order"].append(instance.instance_id)
+        return f"output of {instance.instance_id}"
+
+    network.get_instance_response = AsyncMock(side_effect=get_instance_response)
+    network.connect_instances = AsyncMock(return_value=True)
+    network.synthesize_with_mother_node = AsyncMock(return_value="synthesized")
+    return network, state
+
+
+class TestCommandParser:
+    """Tests for TO dependency parsing."""
+
+    def test_explicit_dependencies(self):
+        network, _ = make_network([])
+        parser = CommandParser(network)
+        commands = parser.parse_commands(
+            "TO writer: Draft it\nTO Reviewer [after writer, Fact Checker]: Review the draft"
+        )
+        assert commands[0]["depends_on"] == []
+        assert commands[1]["instance_id"] == "reviewer"
+        assert commands[1]["depends_on"] == ["writer", "fact-checker"]
+        assert commands[1]["prompt"] == "Review the draft"
+
+    def test_streaming_parser_matches_batch(self):
+        network, _ = make_network([])
+        parser = CommandParser(network)
+        response = (
+            "ANALYZE: Needs research and writing\n"
+            "CREATE: researcher | thinking | Find facts\n"
+            "writer | normal | Write the piece\n"
+            "\n"
+            "TO researcher: Collect facts\n"
+            "TO writer [after researcher]: Write it up\n"
+            "SYNTHESIZE"
+        )
+        for chunk_size in (1, 3, 7, len(response)):
+            streaming = StreamingCommandParser(parser)
+            emitted = []
+            for start in range(0, len(response), chunk_size):
+                emitted.extend(streaming.feed(response[start:start + chunk_size]))
+            emitted.extend(streaming.close())
+            assert emitted == parser.parse_commands(response)
+
+    def test_streaming_parser_emits_commands_early(self):
+        network, _ = make_network([])
+        streaming = StreamingCommandParser(CommandParser(network))
+        assert streaming.feed("CREATE: writer | normal\nTO wri") == []
+        assert [c["type"] for c in streaming.feed("ter: Draft it\n")] == ["CREATE", "TO"]
+
+
+class TestParallelCommands:
+    """Tests for concurrent execution of TO commands."""
+
+    @pytest.mark.asyncio
+    async def test_independent_tasks_run_concurrently(self):
+        network, state = make_network(["a", "b", "c"])
+        handler = CommandHandler(network)
+        commands = [
+            {"type": "TO", "instance_id": "a", "prompt": "task one", "depends_on": []},
+            {"type": "TO", "instance_id": "b", "prompt": "task two", "depends_on": []},
+            {"type": "TO", "instance_id": "c", "prompt": "task three", "depends_on": []},
+            {"type": "SYNTHESIZE"},
+        ]
+        result = await handler.handle_commands(commands)
+
+        assert state["max_running"] == 3
+        assert list(result["responses"]) == ["a", "b", "c", "synthesized"]
+        assert state["prompts"]["b"] == "task two"
+        node_outputs = network.synthesize_with_mother_node.call_args[0][0]
+        assert [instance_id for instance_id, _ in node_outputs] == ["a", "b", "c"]
+
+    @pytest.mark.asyncio
+    async def test_dependent_task_waits_and_chains_outputs(self):
+        network, state = make_network(["writer", "reviewer", "artist"])
+        handler = CommandHandler(network)
+        commands = [
+            {"type": "TO", "instance_id": "writer", "prompt": "Draft", "depends_on": []},
+            {"type": "TO", "instance_id": "reviewer", "prompt": "Review", "depends_on": ["writer"]},
+            {"type": "TO", "instance_id": "artist", "prompt": "Sketch", "depends_on": []},
+        ]
+        await handler.handle_commands(commands)
+
+        assert state["order"].index("writer") < state["order"].index("reviewer")
+        assert "writer: output of writer" in state["prompts"]["reviewer"]
+        assert state["prompts"]["artist"] == "Sketch"
+
+    @pytest.mark.asyncio
+    async def test_inferred_dependency_from_mention(self):
+        network, state = make_network(["researcher", "writer"])
+        handler = CommandHandler(network)
+        commands = [
+            {"type": "TO", "instance_id": "researcher", "prompt": "Collect facts", "depends_on": []},
+            {"type": "TO", "instance_id": "writer", "prompt": "Use the researcher findings", "depends_on": []},
+        ]
+        await handler.handle_commands(commands)
+
+        assert state["max_running"] == 1
+        assert "researcher: output of researcher" in state["prompts"]["writer"]
+
+    @pytest.mark.asyncio
+    async def test_create_block_runs_concurrently_in_order(self):
+        network, state = make_network([])
+        handler = CommandHandler(network)
+        delays = {"writer": 0.03, "fact-checker": 0.02, "editor": 0.01}
+
+        async def create_instance(role_description, model_type, initial_prompt, instance_id):
+            state["running"] += 1
+            state["max_running"] = max(state["max_running"], state["running"])
+            # Later lines finish first
+            await asyncio.sleep(delays[instance_id])
+            state["running"] -= 1
+            instance = MagicMock(instance_id=instance_id, role=role_description)
+            network.instances[instance_id] = instance
+            return instance
+
+        network.create_instance = AsyncMock(side_effect=create_instance)
+        commands = [{"type": "CREATE", "lines": [
+            "writer | normal | Write things",
+            "Fact Checker | thinking",
+            "editor",
+        ]}]
+        result = await handler.handle_commands(commands)
+
+        assert state["max_running"] == 3
+        assert [entry["id"] for entry in result["new_instances"]] == ["writer", "fact-checker", "editor"]
+        network.create_instance.assert_any_await(
+            role_description="Fact Checker", model_type="thinking", initial_prompt="", instance_id="fact-checker"
+        )
@@ -0,0 +1,53 @@
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key-for-testing')
+
+from gemini_o1.models.compaction import HistoryCompactor, TranscriptArchive
+from gemini_o1.models.instance import GeminiInstance
+
+
+def make_instance(turns):
+    instance = GeminiInstance(name="writer", role="writer", model_name="model-a", instance_id="writer", network=MagicMock())
+    for turn in range(turns):
+        instance.add_to_history(f"Turn {turn}. " + "words " * 100)
+    return instance
+
+
+class TestHistoryCompaction:
+    """Tests for rolling history compaction."""
+
+    @pytest.mark.asyncio
+    async def test_old_turns_are_summarized_and_archived(self, tmp_path):
+        archive = TranscriptArchive(str(tmp_path))
+        compactor = HistoryCompactor(max_tokens=300, keep_recent=2, summary_tokens=100, archive=archive)
+        instance = make_instance(8)
+
+        assert compactor.schedule(instance) is not None
+        # A second trigger while compacting is ignored
+        assert compactor.schedule(instance) is None
+        await compactor.wait()
+
+        assert len(instance.history) == len(instance.outputs) == 3
+        assert instance.history[0]["role"] == "summary"
+        assert instance.outputs[0].startswith("- Turn 0.")
+        assert instance.outputs[-1].startswith("Turn 7.")
+        assert instance.compacted_turns == 6
+        assert [entry["text"][:6] for entry in archive.load("writer")] == [f"Turn {i}" for i in range(6)]
+
+    @pytest.mark.asyncio
+    async def test_model_summary_with_fallback(self):
+        summarizer = AsyncMock(return_value="The writer drafted six sections.")
+        compactor = HistoryCompactor(max_tokens=300, keep_recent=2, summarizer=summarizer)
+        instance = make_instance(8)
+        await compactor.compact(instance)
+        assert instance.outputs[0] == "The writer drafted six sections."
+
+        # Growing again compacts the previous summary together with the new turns
+        for turn in range(8, 12):
+            instance.add_to_history(f"Turn {turn}. " + "words " * 100)
+        summarizer.side_effect = RuntimeError("quota exceeded")
+        await compactor.compact(instance)
+        assert instance.outputs[0].startswith("- The writer drafted six sections.")
+        assert instance.compacted_turns == 10
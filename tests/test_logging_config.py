@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+import logging.handlers
+import os
+import pytest
+from datetime import datetime
+
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key-for-testing')
+
+from gemini_o1.utils.logging_config import (
+    BoundedQueueHandler, RequestContextFilter, StructuredLogFormatter, current_request_id, log_span,
+    logging_config, request_context
+)
+from gemini_o1.utils.payload_logging import PayloadLogPolicy, payload_hash
+
+
+class RecordingHandler(logging.Handler):
+    """Handler that keeps the records it receives."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.addFilter(RequestContextFilter())
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestRequestContext:
+    """Tests for request and span IDs carried in context variables."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_spans_keep_their_own_ids(self):
+        logger = logging_config.get_logger("tests.request_context")
+        logger.setLevel(logging.INFO)
+        handler = RecordingHandler()
+        logger.addHandler(handler)
+
+        async def specialist(name):
+            with log_span(name):
+                logger.info(f"start {name}")
+                await asyncio.sleep(0.01)
+                logger.info(f"end {name}")
+
+        try:
+            with request_context("req-1"):
+                with log_span("mother"):
+                    await asyncio.gather(specialist("writer"), specialist("editor"))
+            logger.info("outside")
+        finally:
+            logger.removeHandler(handler)
+
+        ids = {record.getMessage(): (record.request_id, record.span_id) for record in handler.records}
+        assert ids["start writer"] == ids["end writer"] == ("req-1", "mother/writer")
+        assert ids["start editor"] == ids["end editor"] == ("req-1", "mother/editor")
+        assert ids["outside"] == ("-", "-")
+        assert current_request_id() is None
+        # Logging no longer rewrites filters on cached loggers
+        assert logger.filters == []
+
+
+class TestAsyncLogging:
+    """Tests for handing log records to a background writer."""
+
+    def _record(self, message):
+        return logging.LogRecord("tests.async", logging.INFO, __file__, 1, message, None, None)
+
+    def test_full_queue_applies_overflow_policy(self):
+        handler = BoundedQueueHandler(queue_size=2, overflow_policy="drop_new")
+        for i in range(5):
+            handler.handle(self._record(f"record {i}"))
+        assert [r.getMessage() for r in handler.queue.queue] == ["record 0", "record 1"]
+        assert handler.get_stats()["dropped"] == 3
+
+        handler = BoundedQueueHandler(queue_size=2, overflow_policy="drop_oldest")
+        for i in range(5):
+            handler.handle(self._record(f"record {i}"))
+        assert [r.getMessage() for r in handler.queue.queue] == ["record 3", "record 4"]
+        assert handler.get_stats()["dropped"] == 3
+
+    def test_listener_writes_records_with_their_context(self):
+        handler = BoundedQueueHandler(queue_size=100)
+        handler.addFilter(RequestContextFilter())
+        writer = RecordingHandler()
+        listener = logging.handlers.QueueListener(handler.queue, writer)
+        listener.start()
+
+        args = ["draft"]
+        with request_context("req-2"), log_span("writer"):
+            handler.handle(logging.LogRecord("tests.async", logging.INFO, __file__, 1, "wrote %s", (args,), None))
+        # The message is rendered before the arguments can change
+        args.append("edit")
+        listener.stop()
+
+        record, = writer.records
+        assert record.getMessage() == "wrote ['draft']"
+        assert (record.request_id, record.span_id) == ("req-2", "writer")
+
+
+class TestPayloadLogging:
+    """Tests for logging prompts and responses without their full text."""
+
+    def test_payloads_are_truncated_hashed_and_sampled(self):
+        logger = logging.getLogger("tests.payloads")
+        logger.setLevel(logging.INFO)
+        handler = RecordingHandler()
+        logger.addHandler(handler)
+        response = "word " * 1000
+
+        try:
+            policy = PayloadLogPolicy(max_chars=20, sample_rates={"prompt": 0})
+            policy.log(logger, "response", "Instance writer responded", response)
+            for _ in range(3):
+                policy.log(logger, "prompt", "Instance writer received", "Draft it")
+
+            PayloadLogPolicy(max_chars=20, full_payloads=True).log(logger, "response", "Full", response)
+        finally:
+            logger.removeHandler(handler)
+
+        short, full = [record.getMessage() for record in handler.records]
+        assert short == f"Instance writer responded: {response[:20]}... [5000 chars, sha256:{payload_hash(response)}]"
+        assert policy.get_stats()["sampled_out"] == {"prompt": 3}
+        assert full == f"Full: {response}"
+
+
+class TestStructuredLogFormatter:
+    """Tests for JSON log records built from cached fields."""
+
+    def test_records_from_one_site_keep_their_own_fields(self):
+        formatter = StructuredLogFormatter()
+        first = logging.LogRecord("tests.json", logging.INFO, "writer.py", 7, "wrote %s", ("a \"draft\"",), None)
+        first.request_id, first.span_id = "req-3", "writer"
+        first.data = {"tokens": 12}
+        second = logging.LogRecord("tests.json", logging.INFO, "writer.py", 7, "wrote %s", ("more",), None)
+        second.data = {"message": "replaced"}
+
+        fields = json.loads(formatter.format(first))
+        assert fields.pop("timestamp").startswith(datetime.fromtimestamp(int(first.created)).isoformat())
+        assert fields == {
+            "level": "INFO", "name": "tests.json", "message": 'wrote a "draft"', "module": "writer",
+            "function": None, "line": 7, "request_id": "req-3", "span_id": "writer", "tokens": 12
+        }
+        # Extra data may still replace the base fields
+        assert json.loads(formatter.format(second))["message"] == "replaced"
@@ -0,0 +1,39 @@
+import logging
+import os
+
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key-for-testing')
+
+from gemini_o1.utils.logging_config import PerformanceTracker
+from gemini_o1.utils.metrics import Histogram, MetricsRegistry
+
+
+class TestMetricsRegistry:
+    """Tests for latency histograms fed by performance trackers."""
+
+    def test_histogram_percentiles_stay_within_their_bucket(self):
+        histogram = Histogram(buckets=(0.1, 0.5, 1.0, 5.0))
+        for _ in range(90):
+            histogram.observe(0.2)
+        for _ in range(10):
+            histogram.observe(3.0)
+
+        stats = histogram.snapshot()
+        assert stats["count"] == 100
+        assert 0.2 <= stats["p50"] <= 0.5
+        assert 1.0 <= stats["p95"] <= 3.0
+        assert stats["max"] == 3.0
+
+    def test_trackers_record_phases_with_bounded_labels(self):
+        registry = MetricsRegistry(max_label_values=2)
+        logger = logging.getLogger("tests.metrics")
+
+        for instance_id in ("writer", "editor", "critic", "tester"):
+            perf = PerformanceTracker(logger, "instance_response", {"instance": instance_id}, registry=registry)
+            perf.start()
+            perf.checkpoint("first_chunk")
+            perf.stop()
+
+        series = registry.snapshot()["instance_response"]
+        totals = {s["labels"]["instance"]: s["count"] for s in series if s["labels"]["phase"] == "total"}
+        assert totals == {"writer": 1, "editor": 1, "other": 2}
+        assert sum(s["count"] for s in series if s["labels"]["phase"] == "first_chunk") == 4
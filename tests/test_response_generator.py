@@ -0,0 +1,401 @@
+import asyncio
+import os
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key-for-testing')
+
+from google.api_core.exceptions import ServiceUnavailable
+
+from gemini_o1.communication.circuit_breaker import HALF_OPEN, OPEN, CircuitBreakerRegistry, CircuitOpenError
+from gemini_o1.communication.context import ContextBuilder
+from gemini_o1.communication.hedging import HedgeBudget
+from gemini_o1.communication.model_cache import ModelCache
+from gemini_o1.communication.response_cache import MemoryResponseCache, SQLiteResponseCache
+from gemini_o1.models.network import GeminiNetwork
+from gemini_o1.models.instance import GeminiInstance
+from gemini_o1.utils.config import config
+from gemini_o1.utils.health_monitor import check_circuit_breakers
+from gemini_o1.utils.rate_limiter import GEMINI_ENDPOINT, AdvancedRateLimiter, TokenBucket, retry_after_from_exception
+from gemini_o1.utils.retry import RetryPolicy
+from gemini_o1.utils.shared_rate_limiter import SQLiteBucketStore
+
+
+class TestModelCache:
+    """Tests for sharing configured models between calls."""
+
+    def test_models_are_reused_and_evicted(self):
+        with patch('google.generativeai.GenerativeModel', side_effect=lambda *args, **kwargs: object()) as mock_model:
+            cache = ModelCache(max_size=2)
+            first = cache.get("model-a", "be helpful")
+            assert cache.get("model-a", "be helpful") is first
+            cache.get("model-a", "be brief")
+            cache.get("model-b")
+
+            assert mock_model.call_count == 3
+            mock_model.assert_any_call("model-a", system_instruction="be helpful")
+            assert cache.get_stats()["evictions"] == 1
+            # The least recently used model was evicted and is rebuilt
+            assert cache.get("model-a", "be helpful") is not first
+
+    def test_system_prompt_is_sent_as_instruction(self):
+        network = GeminiNetwork(api_key='fake-api-key-for-testing')
+        generator = network.response_generator
+        writer = GeminiInstance(name="writer", role="writer", model_name="model-a", instance_id="writer", network=network)
+        editor = GeminiInstance(name="editor", role="editor", model_name="model-a", instance_id="editor", network=network)
+
+        with patch('google.generativeai.GenerativeModel') as mock_model:
+            model, prompt = generator._build_request(writer, "Draft it")
+            other_model, _ = generator._build_request(editor, "Edit it")
+
+        assert prompt == "Draft it"
+        assert other_model is model
+        mock_model.assert_called_once_with(
+            "model-a", system_instruction=network.prompt_manager.get_prompt('Synthesis Prompt')
+        )
+
+
+class TestResponseCache:
+    """Tests for caching responses to identical requests."""
+
+    def test_memory_cache_lru_and_ttl(self):
+        cache = MemoryResponseCache(max_size=2, ttl=60)
+        cache.set("a", "first")
+        cache.set("b", "second")
+        assert cache.get("a") == "first"
+        cache.set("c", "third")
+
+        # "b" was least recently used
+        assert cache.get("b") is None
+        assert cache.get("c") == "third"
+        with patch('time.time', return_value=time.time() + 120):
+            assert cache.get("a") is None
+        assert cache.get_stats()["hits"] == 2
+
+    def test_sqlite_cache_persists(self, tmp_path):
+        path = str(tmp_path / "responses.db")
+        cache = SQLiteResponseCache(path, max_size=2, ttl=0)
+        cache.set("a", "first")
+        cache.set("b", "second")
+        cache.set("c", "third")
+        cache.close()
+
+        reopened = SQLiteResponseCache(path, max_size=2, ttl=0)
+        assert len(reopened) == 2
+        assert reopened.get("c") == "third"
+        assert reopened.get("a") is None
+
+    @pytest.mark.asyncio
+    async def test_identical_prompt_skips_api_call(self):
+        network = GeminiNetwork(api_key='fake-api-key-for-testing')
+        generator = network.response_generator
+        generator.response_cache = MemoryResponseCache()
+        network.rate_limiter = AdvancedRateLimiter()
+        instance = GeminiInstance(name="writer", role="writer", model_name="model-a", instance_id="writer", network=network)
+
+        with patch.object(generator, '_generate_text', AsyncMock(return_value="a draft")) as generate:
+            first = await generator.get_instance_response(instance, "Draft it", is_system=True)
+            second = await generator.get_instance_response(instance, "Draft it", is_system=True)
+            await generator.get_instance_response(instance, "Draft something else", is_system=True)
+
+        assert first == second == "a draft"
+        assert generate.await_count == 2
+        assert generator.response_cache.get_stats()["hits"] == 1
+
+
+class TestContextBuilder:
+    """Tests for token-budgeted prompt context."""
+
+    def test_small_context_keeps_original_layout(self):
+        builder = ContextBuilder(default_budget=1000)
+        context = builder.build("Edit the draft", "model-a", ["first", "second"], {"writer": "a draft"})
+
+        assert context.prompt == (
+            "Outputs from other instances:\nwriter: a draft\n\nTask:\n"
+            "Previous outputs:\nfirst\nsecond\n\nTask:\nEdit the draft"
+        )
+        assert context.dropped_tokens == 0
+
+    def test_budget_prefers_recent_and_relevant_pieces(self):
+        builder = ContextBuilder(default_budget=400, model_budgets={"big-model": 100000})
+        own_outputs = ["old " * 600, "latest summary of the plan"]
+        other_outputs = {"writer": "draft " * 300, "researcher": "facts about penguins"}
+        context = builder.build("Use the penguins facts", "model-a", own_outputs, other_outputs)
+
+        assert "latest summary of the plan" in context.prompt
+        assert "researcher: facts about penguins" in context.prompt
+        assert context.dropped_tokens > 0
+        assert context.used_tokens <= 400
+        assert context.get_stats()["pieces_dropped"] + context.get_stats()["pieces_truncated"] == 2
+
+        unbounded = builder.build("Use the penguins facts", "big-model", own_outputs, other_outputs)
+        assert unbounded.dropped_tokens == 0
+
+
+class TestSharedRateLimiter:
+    """Tests for routing every Gemini call through the shared limiter."""
+
+    @pytest.mark.asyncio
+    async def test_calls_use_endpoint_and_model_buckets(self):
+        network = GeminiNetwork(api_key='fake-api-key-for-testing')
+        generator = network.response_generator
+        limiter = AdvancedRateLimiter()
+        limiter.configure_endpoint(GEMINI_ENDPOINT, 10, 10)
+        limiter.configure_model(GEMINI_ENDPOINT, "model-a", 1, 0.5)
+        network.rate_limiter = limiter
+        instance = GeminiInstance(name="writer", role="writer", model_name="model-a", instance_id="writer", network=network)
+
+        with patch.object(generator, '_generate_text', AsyncMock(return_value="a draft")):
+            await generator.get_instance_response(instance, "Draft it", is_system=True)
+            # The model bucket is empty now, so the next call must wait for it
+            with patch('asyncio.sleep', AsyncMock()) as sleep:
+                await generator.get_instance_response(instance, "Draft it again", is_system=True)
+            assert sleep.await_count == 1
+
+        metrics = limiter.get_call_metrics(GEMINI_ENDPOINT)[GEMINI_ENDPOINT]
+        assert metrics["total_calls"] == 2
+        assert metrics["calls_by_model"] == {"model-a": 2}
+        assert limiter.limiters[GEMINI_ENDPOINT].tokens < 10
+
+    @pytest.mark.asyncio
+    async def test_token_limit_charges_estimate_and_reconciles_usage(self):
+        network = GeminiNetwork(api_key='fake-api-key-for-testing')
+        generator = network.response_generator
+        limiter = AdvancedRateLimiter()
+        limiter.configure_endpoint(GEMINI_ENDPOINT, 10, 10)
+        limiter.configure_token_limit(GEMINI_ENDPOINT, 6000)
+        network.rate_limiter = limiter
+        instance = GeminiInstance(name="writer", role="writer", model_name="model-a", instance_id="writer", network=network)
+
+        response = MagicMock(text="a draft")
+        response.usage_metadata.total_token_count = 5000
+        model = MagicMock()
+        model.generate_content_async = AsyncMock(return_value=response)
+        estimate = generator._estimate_request_tokens(instance, "Draft it")
+
+        with patch.object(generator.model_cache, 'get', return_value=model):
+            await generator.get_instance_response(instance, "Draft it", is_system=True)
+
+        bucket = limiter.limiters[limiter.token_key(GEMINI_ENDPOINT)]
+        # The estimate was charged up front and topped up to the reported usage
+        assert 5000 > estimate
+        assert bucket.tokens == pytest.approx(1000, abs=5)
+        assert limiter.get_call_metrics(GEMINI_ENDPOINT)[GEMINI_ENDPOINT]["tokens_last_minute"] == 5000
+
+        # The next large prompt has to wait for the bucket to refill
+        with patch('asyncio.sleep', AsyncMock()) as sleep:
+            await limiter.wait_for_token(GEMINI_ENDPOINT, prompt_tokens=2000)
+        assert sleep.await_args[0][0] == pytest.approx(10, abs=0.1)
+
+    def test_adaptive_rate_backs_off_on_429_and_recovers(self):
+        limiter = AdvancedRateLimiter()
+        limiter.configure_endpoint(GEMINI_ENDPOINT, 10, 1.0)
+        limiter.configure_model(GEMINI_ENDPOINT, "model-a", 5, 0.5)
+        limiter.enable_adaptive(GEMINI_ENDPOINT, increase_after=2, cooldown=60)
+        endpoint_bucket = limiter.limiters[GEMINI_ENDPOINT]
+        model_bucket = limiter.limiters[limiter.model_key(GEMINI_ENDPOINT, "model-a")]
+
+        error = Exception("429 Resource has been exhausted. Please retry in 12.5s.")
+        retry_after = retry_after_from_exception(error)
+        assert retry_after == 12.5
+
+        limiter.record_call(GEMINI_ENDPOINT, False, 429, model="model-a", retry_after=retry_after)
+        # A burst of errors within the cooldown only cuts the rate once
+        limiter.record_call(GEMINI_ENDPOINT, False, 429, model="model-a")
+        assert endpoint_bucket.refill_rate == pytest.approx(0.5)
+        assert model_bucket.refill_rate == pytest.approx(0.25)
+        # The retry-after hint empties the bucket until the server is ready
+        assert endpoint_bucket.tokens <= 0
+        assert endpoint_bucket._wait_time(1) == pytest.approx(12.5 + 2, abs=0.1)
+
+        for _ in range(4):
+            limiter.record_call(GEMINI_ENDPOINT, True, model="model-a")
+        assert endpoint_bucket.refill_rate == pytest.approx(0.6)
+        assert limiter.get_call_metrics(GEMINI_ENDPOINT)[GEMINI_ENDPOINT]["rate_per_second"] == pytest.approx(0.6)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_acquirers_wait_their_turn(self):
+        bucket = TokenBucket(5, 100)
+        start = time.time()
+        delays = await asyncio.gather(*(bucket.acquire() for _ in range(25)))
+
+        # Waiters sleep concurrently, each until its own slot, without over-granting
+        assert time.time() - start == pytest.approx(0.2, abs=0.08)
+        assert sorted(delays)[-1] == pytest.approx(0.2, abs=0.02)
+        assert sum(1 for delay in delays if delay == 0) == 5
+
+        # A cancelled waiter hands its reservation back
+        waiter = asyncio.create_task(bucket.acquire(5))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert bucket.reserve(1) < 0.05
+
+
+class TestHedging:
+    """Tests for duplicating calls that run past their model's p95 latency."""
+
+    @pytest.mark.asyncio
+    async def test_slow_call_is_hedged_and_loser_cancelled(self):
+        network = GeminiNetwork(api_key='fake-api-key-for-testing')
+        generator = network.response_generator
+        limiter = AdvancedRateLimiter()
+        limiter.configure_endpoint(GEMINI_ENDPOINT, 10, 0.1)
+        network.rate_limiter = limiter
+        generator.hedging = True
+        generator.hedge_budget = HedgeBudget(fraction=0.5)
+        for _ in range(generator.latency_tracker.min_samples):
+            generator.latency_tracker.record("model-a", 0.01)
+        instance = GeminiInstance(name="writer", role="writer", model_name="model-a", instance_id="writer", network=network)
+
+        cancelled = []
+
+        async def generate(prompt):
+            if not cancelled:
+                cancelled.append(False)
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled[0] = True
+                    raise
+            return MagicMock(text="fast answer")
+
+        model = MagicMock()
+        model.generate_content_async = AsyncMock(side_effect=generate)
+        # One earlier call leaves room for a hedge within the 50% budget
+        generator.hedge_budget.record_call()
+
+        with patch.object(generator.model_cache, 'get', return_value=model):
+            response = await generator.get_instance_response(instance, "Draft it", is_system=True)
+
+        assert response == "fast answer"
+        await asyncio.sleep(0)
+        assert cancelled == [True]
+        assert generator.get_hedging_stats()["hedge_wins"] == 1
+        # Only the hedge completed, so the cancelled call adds no latency sample
+        assert len(generator.latency_tracker._latencies["model-a"]) == generator.latency_tracker.min_samples + 1
+        # The hedge was charged to the rate limiter like any other call
+        assert limiter.limiters[GEMINI_ENDPOINT].tokens == pytest.approx(8, abs=0.1)
+
+
+class TestCircuitBreaker:
+    """Tests for refusing calls to a failing model."""
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_falls_back_and_recovers(self, monkeypatch):
+        network = GeminiNetwork(api_key='fake-api-key-for-testing')
+        generator = network.response_generator
+        network.rate_limiter = AdvancedRateLimiter()
+        breakers = CircuitBreakerRegistry(failure_threshold=2, reset_timeout=60)
+        generator.circuit_breakers = breakers
+        monkeypatch.setattr("gemini_o1.communication.circuit_breaker.circuit_breakers", breakers)
+        generator.response_cache = MemoryResponseCache()
+        thinking, default = config.get_model_name("thinking"), config.get_model_name("default")
+        instance = GeminiInstance(name="thinker", role="writer", model_name=thinking, instance_id="thinker", network=network)
+
+        thinking_model, default_model = MagicMock(), MagicMock()
+        thinking_model.generate_content_async = AsyncMock(side_effect=ServiceUnavailable("overloaded"))
+        default_model.generate_content_async = AsyncMock(return_value=MagicMock(text="fallback answer"))
+        models = {thinking: thinking_model, default: default_model}
+        # One attempt per call
+        generator.retry_policy = RetryPolicy(max_attempts=1)
+
+        with patch.object(generator.model_cache, 'get', side_effect=lambda name, system=None: models[name]):
+            for _ in range(2):
+                with pytest.raises(ServiceUnavailable):
+                    await generator.get_instance_response(instance, "Think", is_system=True)
+            assert breakers.get(thinking).get_state()["state"] == OPEN
+            assert (await check_circuit_breakers())["status"] == "degraded"
+
+            assert await generator.get_instance_response(instance, "Think", is_system=True) == "fallback answer"
+            assert thinking_model.generate_content_async.await_count == 2
+
+            generator.breaker_fallback = False
+            # The fallback answer isn't cached as the thinking model's
+            with pytest.raises(CircuitOpenError):
+                await generator.get_instance_response(instance, "Think", is_system=True)
+            assert thinking_model.generate_content_async.await_count == 2
+
+            # After the reset timeout a trial call goes through and closes the breaker
+            breakers.get(thinking).opened_at -= 60
+            thinking_model.generate_content_async = AsyncMock(return_value=MagicMock(text="deep answer"))
+            assert await generator.get_instance_response(instance, "Think", is_system=True) == "deep answer"
+            assert (await check_circuit_breakers())["status"] == "healthy"
+
+    @pytest.mark.asyncio
+    async def test_calls_fall_back_while_the_trial_call_is_in_flight(self):
+        network = GeminiNetwork(api_key='fake-api-key-for-testing')
+        generator = network.response_generator
+        network.rate_limiter = AdvancedRateLimiter()
+        breakers = CircuitBreakerRegistry(failure_threshold=1, reset_timeout=60)
+        generator.circuit_breakers = breakers
+        thinking, default = config.get_model_name("thinking"), config.get_model_name("default")
+        instance = GeminiInstance(name="thinker", role="writer", model_name=thinking, instance_id="thinker", network=network)
+
+        breaker = breakers.get(thinking)
+        breaker.record_failure()
+        breaker.opened_at -= 60
+        # Checking leaves the trial slot for the next call
+        assert breaker.would_allow() and breaker.would_allow()
+        assert breaker.allow_request()
+        assert breaker.get_state()["state"] == HALF_OPEN
+        assert not breaker.would_allow()
+
+        default_model = MagicMock()
+        default_model.generate_content_async = AsyncMock(return_value=MagicMock(text="fallback answer"))
+        with patch.object(generator.model_cache, 'get', side_effect=lambda name, system=None: {default: default_model}[name]):
+            assert await generator.get_instance_response(instance, "Think", is_system=True) == "fallback answer"
+        assert breaker.get_state()["rejected"] == 0
+
+    @pytest.mark.asyncio
+    async def test_hung_model_calls_count_as_failures(self):
+        network = GeminiNetwork(api_key='fake-api-key-for-testing')
+        generator = network.response_generator
+        limiter = AdvancedRateLimiter()
+        network.rate_limiter = limiter
+        breakers = CircuitBreakerRegistry(failure_threshold=2, reset_timeout=60)
+        generator.circuit_breakers = breakers
+        generator.breaker_fallback = False
+        generator.retry_policy = RetryPolicy(max_attempts=3, initial_delay=0.01)
+        generator.call_timeout = 0.02
+        instance = GeminiInstance(name="writer", role="writer", model_name="model-a", instance_id="writer", network=network)
+
+        async def hang(prompt):
+            await asyncio.sleep(10)
+
+        model = MagicMock()
+        model.generate_content_async = AsyncMock(side_effect=hang)
+        with patch.object(generator.model_cache, 'get', return_value=model), pytest.raises(CircuitOpenError):
+            await generator.get_instance_response(instance, "Draft it", is_system=True)
+
+        # Two timed-out calls opened the breaker, which refused the third attempt
+        assert model.generate_content_async.await_count == 2
+        assert breakers.get("model-a").get_state()["state"] == OPEN
+        metrics = limiter.get_call_metrics(GEMINI_ENDPOINT)[GEMINI_ENDPOINT]
+        assert metrics["total_calls"] == 2 and metrics["success_rate"] == 0
+
+
+class TestSQLiteBucketStore:
+    """Tests for rate limit buckets shared between processes."""
+
+    def test_limiters_on_one_database_share_the_quota(self, tmp_path):
+        path = str(tmp_path / "rate_limits.db")
+        # Two stores stand in for two worker processes
+        stores = [SQLiteBucketStore(path), SQLiteBucketStore(path)]
+        first, second = AdvancedRateLimiter(stores[0]), AdvancedRateLimiter(stores[1])
+        for limiter in (first, second):
+            limiter.configure_endpoint(GEMINI_ENDPOINT, 4, 0.1)
+
+        first.wait_for_token_blocking(GEMINI_ENDPOINT, tokens=3)
+        # Only one token is left for the other worker
+        assert second.limiters[GEMINI_ENDPOINT].reserve(1) == 0
+        assert second.limiters[GEMINI_ENDPOINT].reserve(1) == pytest.approx(10, abs=0.1)
+
+        # Rate changes, like those made by adaptive control, are shared as well
+        first.limiters[GEMINI_ENDPOINT].set_rate(1.0)
+        assert second.limiters[GEMINI_ENDPOINT].reserve(1) == pytest.approx(2, abs=0.1)
+
+        for store in stores:
+            store.close()
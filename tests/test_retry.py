@@ -0,0 +1,172 @@
+import asyncio
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key-for-testing')
+
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+
+from gemini_o1.models.instance import GeminiInstance
+from gemini_o1.models.network import GeminiNetwork
+from gemini_o1.utils.deadline import DeadlineExceeded, deadline
+from gemini_o1.utils.rate_limiter import GEMINI_ENDPOINT, AdvancedRateLimiter
+from gemini_o1.utils.retry import RetryBudget, RetryPolicy
+
+
+class TestRetryPolicy:
+    """Tests for exception-aware retries with deadlines and budgets."""
+
+    @pytest.mark.asyncio
+    async def test_only_transient_errors_are_retried(self):
+        policy = RetryPolicy(max_attempts=3)
+
+        invalid = AsyncMock(side_effect=ValueError("Invalid message format"))
+        with patch('asyncio.sleep', AsyncMock()) as sleep, pytest.raises(ValueError):
+            await policy.call(invalid)
+        assert invalid.await_count == 1
+        assert sleep.await_count == 0
+
+        flaky = AsyncMock(side_effect=[ServiceUnavailable("busy"), ServiceUnavailable("busy"), "ok"])
+        with patch('asyncio.sleep', AsyncMock()) as sleep:
+            assert await policy.call(flaky) == "ok"
+        # Jitter keeps each delay within half to all of the exponential base delay
+        delays = [call.args[0] for call in sleep.await_args_list]
+        assert 0.5 <= delays[0] <= 1.0 and 1.0 <= delays[1] <= 2.0
+
+    @pytest.mark.asyncio
+    async def test_deadline_and_budget_stop_retries(self):
+        # The server asks for more time than the deadline leaves
+        policy = RetryPolicy(max_attempts=5, deadline=10)
+        exhausted = AsyncMock(side_effect=ResourceExhausted("Quota exceeded. Please retry in 30s."))
+        with patch('asyncio.sleep', AsyncMock()) as sleep, pytest.raises(ResourceExhausted):
+            await policy.call(exhausted)
+        assert exhausted.await_count == 1
+        assert sleep.await_count == 0
+
+        budget = RetryBudget(ratio=0.1, max_balance=2)
+        policy = RetryPolicy(max_attempts=5, budget=budget)
+        failing = AsyncMock(side_effect=ServiceUnavailable("down"))
+        with patch('asyncio.sleep', AsyncMock()), pytest.raises(ServiceUnavailable):
+            await policy.call(failing)
+        # Two retries were saved up, so the call stops after three attempts
+        assert failing.await_count == 3
+        assert budget.get_stats()["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_retried_call_keeps_instance_messages(self):
+        network = GeminiNetwork(api_key='fake-api-key-for-testing')
+        network.rate_limiter = AdvancedRateLimiter()
+        generator = network.response_generator
+        generator.retry_policy = RetryPolicy(max_attempts=2, initial_delay=0.01)
+        instance = GeminiInstance(name="editor", role="editor", model_name="test-model", instance_id="editor", network=network)
+        await instance.message_queue.put({'from': 'writer', 'content': 'Draft attached'})
+
+        model = MagicMock()
+        model.generate_content_async = AsyncMock(side_effect=[ServiceUnavailable("busy"), MagicMock(text="edited")])
+        with patch.object(generator.model_cache, 'get', return_value=model):
+            assert await generator.get_instance_response(instance, "Edit it", is_system=True) == "edited"
+
+        prompts = [call.args[0] for call in model.generate_content_async.await_args_list]
+        assert len(prompts) == 2
+        assert all("Message from writer: Draft attached" in prompt for prompt in prompts)
+
+    @pytest.mark.asyncio
+    async def test_retried_stream_open_waits_for_quota_again(self):
+        network = GeminiNetwork(api_key='fake-api-key-for-testing')
+        limiter = AdvancedRateLimiter()
+        network.rate_limiter = limiter
+        generator = network.response_generator
+        generator.retry_policy = RetryPolicy(max_attempts=2, initial_delay=0.01)
+        instance = GeminiInstance(name="writer", role="writer", model_name="test-model", instance_id="writer", network=network)
+
+        async def chunks():
+            yield MagicMock(text="a ")
+            yield MagicMock(text="draft")
+
+        model = MagicMock()
+        model.generate_content_async = AsyncMock(side_effect=[ResourceExhausted("Quota exceeded"), chunks()])
+        with patch.object(generator.model_cache, 'get', return_value=model):
+            streamed = [chunk async for chunk in generator.stream_instance_response(instance, "Draft it")]
+
+        assert streamed == ["a ", "draft"]
+        # Each attempt went through the limiter, and the 429 was recorded
+        metrics = limiter.get_call_metrics(GEMINI_ENDPOINT)[GEMINI_ENDPOINT]
+        assert metrics["total_calls"] == 2
+        assert metrics["success_rate"] == 50
+
+
+class TestDeadlines:
+    """Tests for request deadlines reaching every call."""
+
+    @pytest.mark.asyncio
+    async def test_request_deadline_cancels_outstanding_calls(self):
+        network = GeminiNetwork(api_key='fake-api-key-for-testing')
+        network.mother_node = GeminiInstance(
+            name="mother_node", role="scrum_master", model_name="test-model", instance_id="mother", network=network
+        )
+        network.instances["writer"] = GeminiInstance(
+            name="writer", role="writer", model_name="test-model", instance_id="writer", network=network
+        )
+        cancelled = []
+
+        async def get_instance_response(instance, prompt, is_system=False, include_context=True):
+            if instance.instance_id == "mother":
+                return "TO writer: Draft it\nSYNTHESIZE:"
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(instance.instance_id)
+                raise
+
+        network.response_generator.get_instance_response = AsyncMock(side_effect=get_instance_response)
+
+        response = await network.handle_user_input("Write something", timeout=0.2)
+
+        assert "took too long" in response
+        assert cancelled == ["writer"]
+
+    @pytest.mark.asyncio
+    async def test_slow_attempts_time_out_within_the_request_deadline(self):
+        policy = RetryPolicy(max_attempts=5, initial_delay=0.01, attempt_timeout=0.05)
+        attempts = []
+
+        async def hang_once():
+            attempts.append(1)
+            if len(attempts) == 1:
+                await asyncio.sleep(10)
+            return "ok"
+
+        # A hung attempt is cancelled and retried
+        assert await policy.call(hang_once) == "ok"
+        assert len(attempts) == 2
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        with deadline(0.03), pytest.raises(DeadlineExceeded):
+            await policy.call(hang)
+
+    @pytest.mark.asyncio
+    async def test_call_timeout_does_not_cover_the_wait_for_quota(self):
+        network = GeminiNetwork(api_key='fake-api-key-for-testing')
+        limiter = AdvancedRateLimiter()
+        limiter.configure_endpoint(GEMINI_ENDPOINT, 1, 20)
+        network.rate_limiter = limiter
+        generator = network.response_generator
+        generator.call_timeout = 0.05
+        instances = [
+            GeminiInstance(name=f"writer{i}", role="writer", model_name="test-model", instance_id=f"writer{i}", network=network)
+            for i in range(4)
+        ]
+
+        model = MagicMock()
+        model.generate_content_async = AsyncMock(return_value=MagicMock(text="draft"))
+        with patch.object(generator.model_cache, 'get', return_value=model):
+            responses = await asyncio.gather(*(
+                generator.get_instance_response(instance, "Draft it", is_system=True) for instance in instances
+            ))
+
+        # The last call waits 0.15s for quota, longer than the call timeout
+        assert responses == ["draft"] * 4
+        assert model.generate_content_async.await_count == 4
@@ -0,0 +1,40 @@
+import os
+import pytest
+from unittest.mock import AsyncMock
+
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key-for-testing')
+
+from gemini_o1.models.network import GeminiNetwork
+from gemini_o1.models.instance import GeminiInstance
+
+
+@pytest.mark.asyncio
+async def test_stream_user_input_yields_events_then_response():
+    network = GeminiNetwork(api_key='fake-api-key-for-testing')
+    network.mother_node = GeminiInstance(
+        name="mother_node", role="scrum_master", model_name="test-model", instance_id="mother", network=network
+    )
+    network.instances["writer"] = GeminiInstance(
+        name="writer", role="writer", model_name="test-model", instance_id="writer", network=network
+    )
+
+    async def get_instance_response(instance, prompt, is_system=False, include_context=True):
+        if instance.instance_id == "writer":
+            return "a draft"
+        if "User request" in prompt:
+            return "TO writer: Draft it\nSYNTHESIZE:"
+        return "final answer"
+
+    network.response_generator.get_instance_response = AsyncMock(side_effect=get_instance_response)
+
+    events = [event async for event in network.stream_user_input("Write something")]
+    summary = [(event["type"], event["stage"], event.get("instance_id")) for event in events]
+
+    assert ("task_completed", "task", "writer") in summary
+    assert ("synthesis", "synthesis", "mother") in summary
+    assert summary.index(("task_completed", "task", "writer")) < summary.index(("synthesis", "synthesis", "mother"))
+    # The synthesis is reported once, so it is rendered once
+    rendered = [(event["type"], event["text"]) for event in events if event["type"] in ("task_completed", "synthesis")]
+    assert [entry for entry in rendered if entry[1] == "final answer"] == [("synthesis", "final answer")]
+    assert events[-1]["type"] == "done"
+    assert events[-1]["response"] == "final answer"
@@ -0,0 +1,37 @@
+import os
+import pytest
+from unittest.mock import AsyncMock
+
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key-for-testing')
+
+from gemini_o1.models.network import GeminiNetwork
+from gemini_o1.models.instance import GeminiInstance
+
+
+@pytest.mark.asyncio
+async def test_synthesis_uses_current_round_and_running_summary():
+    network = GeminiNetwork(api_key='fake-api-key-for-testing')
+    network.mother_node = GeminiInstance(
+        name="mother_node", role="scrum_master", model_name="test-model", instance_id="mother", network=network
+    )
+    writer = GeminiInstance(name="writer", role="writer", model_name="test-model", instance_id="writer", network=network)
+    writer.add_to_history("an old draft from an earlier request")
+    network.instances["writer"] = writer
+
+    network.response_generator.get_instance_response = AsyncMock(side_effect=["Round one answer.", "Round two answer."])
+
+    await network.synthesize_with_mother_node([("writer", "first draft")])
+    first_prompt = network.response_generator.get_instance_response.call_args_list[0][0][1]
+    assert "writer: first draft" in first_prompt
+    assert "an old draft" not in first_prompt
+
+    await network.synthesize_with_mother_node([("writer", "second draft")])
+    call = network.response_generator.get_instance_response.call_args_list[1]
+    second_prompt = call[0][1]
+    assert "first draft" not in second_prompt
+    assert "Summary of earlier rounds:\n- Round one answer." in second_prompt
+    assert "writer: second draft" in second_prompt
+    # Synthesis does not add the mother node's history as context
+    assert call[0][3] is False
+    assert network.last_synthesis_stats["earlier_rounds"] == 1
+    assert network.last_synthesis_stats["synthesis_input_tokens"] > 0
@@ -107,14 +107,17 @@ class RateLimiter:
 
     async def async_wait(self):
         """Wait if necessary to enforce rate limiting (asynchronous version)."""
-        current_time = time.time()
-        # Clean up old timestamps
-        while self.call_times and current_time - self.call_times[0] >= self.period:
-            self.call_times.popleft()
-        # If at capacity, wait until we can make another call
-        if len(self.call_times) >= self.max_calls:
+        while True:
+            current_time = time.time()
+            # Clean up old timestamps
+            while self.call_times and current_time - self.call_times[0] >= self.period:
+                self.call_times.popleft()
+            if len(self.call_times) < self.max_calls:
+                break
+            # At capacity: wait, then check again since concurrent callers may
+            # have taken the slot that freed up
             wait_time = self.period - (current_time - self.call_times[0])
             logger.info(f"Rate limit exceeded. Waiting {wait_time:.2f}s")
             await asyncio.sleep(wait_time)
         # Record this call
-        self.call_times.append(current_time)
+        self.call_times.append(time.time())
@@ -1,10 +1,11 @@
 import logging
 import sys
-from flask import Flask, send_from_directory, jsonify, request, url_for
+from flask import Flask, send_from_directory, jsonify, request, url_for, Response, stream_with_context
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import asyncio
+import concurrent.futures
 from beep import GeminiNetwork
 import os
 import threading
@@ -13,9 +14,10 @@ import markdown2
 import time
 import uuid
 from functools import partial
+from queue import Queue
 from threading import Thread
 from werkzeug.utils import secure_filename
-from config_file import RATE_LIMIT
+from config_file import RATE_LIMIT, REQUEST_TIMEOUT
 
 logging.getLogger('werkzeug').setLevel(logging.WARNING)
 logging.getLogger('flask_limiter').setLevel(logging.WARNING)
@@ -297,6 +299,43 @@ async def share_image_with_instances(message, image_url=None):
     except Exception as e:
         logger.error(f"Error sharing image: {str(e)}")
 
+def clean_final_response(final_response):
+    """Replace a leaked planning message with a synthesis of the specialist outputs."""
+    # Filter out any planning messages (ANALYZE, TO, SYNTHESIZE commands)
+    # Only keep the actual synthesis content
+    if "ANALYZE:" in final_response and "SYNTHESIZE" in final_response:
+        # This is a planning message, we need to create a more meaningful synthesis
+        # based on the specialist responses
+        
+        # Collect all specialist responses
+        specialist_insights = []
+        for instance_id, instance in network.instances.items():
+            if instance and instance.outputs:
+                specialist_insights.append(instance.outputs[-1])
+        
+        if specialist_insights:
+            # Create a synthesis based on specialist responses
+            synthesis = "Based on the analysis of the provided information:\n\n"
+            for insight in specialist_insights:
+                # Clean up the insight to remove any "please provide the image" type messages
+                if not any(phrase in insight.lower() for phrase in [
+                    "provide the image", "need the image", "need to see the image",
+                    "provide the screenshot", "need the screenshot", "need to see the screenshot"
+                ]):
+                    synthesis += f"- {insight}\n\n"
+            
+            if len(synthesis) > len("Based on the analysis of the provided information:\n\n"):
+                final_response = synthesis
+            else:
+                # If we couldn't extract meaningful content from specialist responses,
+                # provide a more helpful message
+                final_response = "I need more information to provide a complete analysis. Please provide the requested details or images so I can better assist you."
+        else:
+            # If there are no specialist insights, provide a more helpful message
+            final_response = "I need more information to provide a complete analysis. Please provide the requested details or images so I can better assist you."
+    
+    return final_response
+
 @app.route('/api/send_message', methods=['POST'])
 @limiter.limit("5 per minute")
 def send_message():
@@ -353,17 +392,16 @@ def send_message():
             if planning_response:
                 logger.info(f"scrum_master (planning): {planning_response}")
         
-        # Wait for all specialist nodes to complete their tasks
-        # This ensures we don't synthesize before all nodes have responded
-        all_specialists_complete = False
-        max_wait_time = 30  # Maximum wait time in seconds
-        wait_start = time.time()
-        
-        while not all_specialists_complete and (time.time() - wait_start) < max_wait_time:
-            all_specialists_complete = all(instance.task_completed for instance in network.instances.values())
-            if not all_specialists_complete:
-                # Wait a bit before checking again
-                time.sleep(0.5)
+        # Wait for the whole request, specialists and synthesis included. If it
+        # runs past the deadline, cancel it so it stops using API quota
+        timed_out = False
+        try:
+            final_response = future.result(timeout=REQUEST_TIMEOUT or None)
+        except concurrent.futures.TimeoutError:
+            timed_out = True
+            future.cancel()
+            logger.warning(f"Request did not finish within {REQUEST_TIMEOUT}s and was cancelled")
+            final_response = None
         
         # 2. Add all specialist node responses in order
         for instance_id, instance in network.instances.items():
@@ -376,55 +414,21 @@ def send_message():
                     'type': 'specialist'
                 })
         
-        # 3. Get and add mother node's final synthesis
-        # Only proceed with synthesis after all specialists have completed
-        if all_specialists_complete:
-            final_response = future.result()
-            if final_response:
-                # Filter out any planning messages (ANALYZE, TO, SYNTHESIZE commands)
-                # Only keep the actual synthesis content
-                if "ANALYZE:" in final_response and "SYNTHESIZE" in final_response:
-                    # This is a planning message, we need to create a more meaningful synthesis
-                    # based on the specialist responses
-                    
-                    # Collect all specialist responses
-                    specialist_insights = []
-                    for instance_id, instance in network.instances.items():
-                        if instance and instance.outputs:
-                            specialist_insights.append(instance.outputs[-1])
-                    
-                    if specialist_insights:
-                        # Create a synthesis based on specialist responses
-                        synthesis = "Based on the analysis of the provided information:\n\n"
-                        for insight in specialist_insights:
-                            # Clean up the insight to remove any "please provide the image" type messages
-                            if not any(phrase in insight.lower() for phrase in [
-                                "provide the image", "need the image", "need to see the image",
-                                "provide the screenshot", "need the screenshot", "need to see the screenshot"
-                            ]):
-                                synthesis += f"- {insight}\n\n"
-                        
-                        if len(synthesis) > len("Based on the analysis of the provided information:\n\n"):
-                            final_response = synthesis
-                        else:
-                            # If we couldn't extract meaningful content from specialist responses,
-                            # provide a more helpful message
-                            final_response = "I need more information to provide a complete analysis. Please provide the requested details or images so I can better assist you."
-                    else:
-                        # If there are no specialist insights, provide a more helpful message
-                        final_response = "I need more information to provide a complete analysis. Please provide the requested details or images so I can better assist you."
-                
-                responses.append({
-                    'role': 'scrum_master',
-                    'content': final_response,
-                    'icon': get_node_icon('scrum_master'),
-                    'type': 'synthesis'
-                })
-        else:
-            # If we timed out waiting for specialists, add a message indicating this
+        # 3. Add mother node's final synthesis
+        if final_response:
+            final_response = clean_final_response(final_response)
+            
+            responses.append({
+                'role': 'scrum_master',
+                'content': final_response,
+                'icon': get_node_icon('scrum_master'),
+                'type': 'synthesis'
+            })
+        elif timed_out:
+            # If we gave up on the request, say so rather than returning a partial synthesis
             responses.append({
                 'role': 'scrum_master',
-                'content': "I'm still processing your request. Some specialist nodes are still working on their analysis.",
+                'content': "Sorry, your request took too long to process. Please try again.",
                 'icon': get_node_icon('scrum_master'),
                 'type': 'synthesis'
             })
@@ -447,6 +451,100 @@ def send_message():
         logger.error("Error processing message: %r", e, exc_info=True)
         return jsonify({'error': f'Failed to process message: {str(e)}'}), 500
 
+async def stream_network_events(user_message, events):
+    """Run a message through the network, reporting each node's output as soon as it lands."""
+    task = asyncio.ensure_future(network.handle_user_input(user_message))
+    known_instances = set(network.instances)
+    seen_outputs = {instance_id: len(instance.outputs) for instance_id, instance in network.instances.items()}
+    
+    try:
+        while True:
+            finished = task.done()
+            
+            for instance_id, instance in list(network.instances.items()):
+                if instance_id not in known_instances:
+                    known_instances.add(instance_id)
+                    events.put({
+                        'type': 'instance_created',
+                        'instance_id': instance_id,
+                        'role': instance.role,
+                        'icon': get_node_icon(instance.role)
+                    })
+                    
+                for output in instance.outputs[seen_outputs.get(instance_id, 0):]:
+                    events.put({
+                        'type': 'task_completed',
+                        'stage': 'task',
+                        'instance_id': instance_id,
+                        'role': instance.role,
+                        'icon': get_node_icon(instance.role),
+                        'text': output
+                    })
+                seen_outputs[instance_id] = len(instance.outputs)
+                
+            if finished:
+                break
+            await asyncio.sleep(0.2)
+            
+        final_response = clean_final_response(task.result())
+        events.put({
+            'type': 'synthesis',
+            'stage': 'synthesis',
+            'instance_id': 'mother',
+            'role': 'scrum_master',
+            'icon': get_node_icon('scrum_master'),
+            'text': final_response
+        })
+        events.put({'type': 'done', 'response': final_response})
+    except Exception as e:
+        logger.error("Error streaming message: %r", e, exc_info=True)
+        events.put({'type': 'error', 'error': f'Failed to process message: {str(e)}'})
+    finally:
+        if not task.done():
+            task.cancel()
+        events.put(None)
+
+@app.route('/api/send_message/stream', methods=['POST'])
+@limiter.limit("5 per minute")
+def send_message_stream():
+    """Process a message, streaming per-node events as Server-Sent Events."""
+    if not is_initialized or not network:
+        logger.error("Attempted to send message before network initialization")
+        return jsonify({'error': 'System is still initializing. Please try again in a moment.'}), 503
+
+    data = request.get_json()
+    if not data or not data.get('message', '').strip():
+        return jsonify({'error': 'No data provided'}), 400
+
+    user_message = data.get('message', '').strip()
+    image_attached = data.get('image_attached', False)
+    
+    logger.info(f"Received streaming message: {user_message} (image attached: {image_attached})")
+    
+    if image_attached and current_upload:
+        asyncio.run_coroutine_threadsafe(share_image_with_instances(user_message), loop).result()
+        user_message = f"{user_message}\n\n[Image: {current_upload['url']}]"
+
+    def generate():
+        events = Queue()
+        future = asyncio.run_coroutine_threadsafe(stream_network_events(user_message, events), loop)
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    break
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            # Stop working on the request if the client went away
+            if not future.done():
+                future.cancel()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/clear', methods=['POST'])
 def clear_all():
     global current_upload